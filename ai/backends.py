@@ -0,0 +1,269 @@
+# ai/backends.py
+"""Giao diện backend LLM và các cài đặt (Gemini, local giả lập)"""
+
+import hashlib
+import json
+import random
+import time
+from abc import ABC, abstractmethod
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from ai.tools import Tool, execute_tool
+from ai.transport import ResilientTransport, RetryPolicy, get_shared_transport
+from src.config import (
+    AI_BACKEND, AI_MAX_TOOL_ROUNDS, AI_CASSETTE_PATH, AI_CASSETTE_MODE, AI_CASSETTE_LATENCY_SCALE,
+    GEMINI_MODEL, GEMINI_API_ENDPOINT, GEMINI_REQUEST_TIMEOUT,
+    LOCAL_AI_LATENCY, LOCAL_AI_JITTER, LOCAL_AI_RESPONSES_FILE
+)
+
+
+def _direct_request(fn: Callable[[], Any]) -> Any:
+    return fn()
+
+
+class LLMBackend(ABC):
+    """Giao diện chung cho các nhà cung cấp LLM"""
+
+    name = 'base'
+
+    @abstractmethod
+    def generate(self, prompt: str, generation_config: Dict) -> str:
+        """
+        Sinh nội dung từ prompt
+
+        Args:
+            prompt: Nội dung prompt
+            generation_config: Tham số sinh (temperature, max_output_tokens, ...)
+
+        Returns:
+            Văn bản phản hồi. Lỗi được raise để transport phân loại/retry
+        """
+
+    supports_tools = False
+
+    def generate_with_tools(self, prompt: str, tools: List[Tool], generation_config: Dict,
+                            request: Optional[Callable[[Callable[[], Any]], Any]] = None) -> Tuple[str, List[Dict]]:
+        """
+        Sinh nội dung, cho phép model gọi công cụ tính toán cục bộ
+
+        Mặc định (backend không hỗ trợ function calling): sinh văn bản thường.
+
+        Args:
+            prompt: Nội dung prompt
+            tools: Danh sách công cụ model được gọi
+            generation_config: Tham số sinh
+            request: Hàm thực hiện một request tới API (request(fn) trả về fn());
+                mỗi vòng gọi công cụ là một request riêng để transport tính
+                quota và retry từng vòng. Mặc định gọi thẳng fn
+
+        Returns:
+            (văn bản phản hồi, danh sách lời gọi công cụ {name, args, result})
+        """
+        request = request or _direct_request
+        return request(lambda: self.generate(prompt, generation_config)), []
+
+    def create_transport(self) -> ResilientTransport:
+        """Transport mặc định: dùng chung trong process theo tên backend"""
+        return get_shared_transport(self.name)
+
+
+class GeminiBackend(LLMBackend):
+    """Backend gọi Google Gemini qua google.generativeai"""
+
+    name = 'gemini'
+    supports_tools = True
+
+    # Tắt retry mặc định của SDK, transport tự quản lý retry
+    request_options = {'timeout': GEMINI_REQUEST_TIMEOUT, 'retry': None}
+
+    def __init__(self, api_key: str, model_name: str = GEMINI_MODEL,
+                 api_endpoint: str = GEMINI_API_ENDPOINT):
+        """
+        Khởi tạo backend Gemini
+
+        Args:
+            api_key: API key của Google Gemini
+            model_name: Tên model
+            api_endpoint: Endpoint tùy chỉnh (VD: server giả lập khi test)
+        """
+        import google.generativeai as genai
+
+        # Cấu hình API
+        if api_endpoint:
+            genai.configure(api_key=api_key, transport='rest',
+                            client_options={'api_endpoint': api_endpoint})
+        else:
+            genai.configure(api_key=api_key)
+
+        self._genai = genai
+        self.model_name = model_name
+        self.model = genai.GenerativeModel(model_name)
+        self._tool_models = {}
+
+    def generate(self, prompt: str, generation_config: Dict) -> str:
+        response = self.model.generate_content(
+            prompt,
+            generation_config=generation_config,
+            request_options=self.request_options
+        )
+        return response.text
+
+    def _get_tool_model(self, tools: List[Tool]):
+        """Model kèm khai báo công cụ, tạo một lần cho mỗi bộ công cụ"""
+        key = tuple(tool.name for tool in tools)
+        if key not in self._tool_models:
+            self._tool_models[key] = self._genai.GenerativeModel(
+                self.model_name,
+                tools=[{'function_declarations': [tool.declaration() for tool in tools]}]
+            )
+        return self._tool_models[key]
+
+    def generate_with_tools(self, prompt: str, tools: List[Tool], generation_config: Dict,
+                            request: Optional[Callable[[Callable[[], Any]], Any]] = None) -> Tuple[str, List[Dict]]:
+        request = request or _direct_request
+        protos = self._genai.protos
+        model = self._get_tool_model(tools)
+        contents = [protos.Content(role='user', parts=[protos.Part(text=prompt)])]
+        tool_calls = []
+
+        for _ in range(AI_MAX_TOOL_ROUNDS):
+            # contents chỉ được nối thêm sau khi vòng thành công: retry gửi lại đúng vòng lỗi
+            response = request(lambda: model.generate_content(
+                contents,
+                generation_config=generation_config,
+                request_options=self.request_options
+            ))
+            content = response.candidates[0].content
+            calls = [part.function_call for part in content.parts if 'function_call' in part]
+            if not calls:
+                return response.text, tool_calls
+
+            # Thực thi công cụ cục bộ rồi gửi kết quả lại cho model
+            contents.append(content)
+            response_parts = []
+            for call in calls:
+                args = dict(call.args)
+                result = execute_tool(tools, call.name, args)
+                tool_calls.append({'name': call.name, 'args': args, 'result': result})
+                response_parts.append(protos.Part(function_response=protos.FunctionResponse(
+                    name=call.name, response={'result': result}
+                )))
+            contents.append(protos.Content(role='user', parts=response_parts))
+
+        raise RuntimeError("Model gọi công cụ quá số vòng cho phép")
+
+
+DEFAULT_LOCAL_TEMPLATE = """**[Phản hồi giả lập - backend local]**
+
+Mã prompt: `{digest}` ({chars} ký tự)
+
+1. Tính khả thi: phương án có cơ sở, cần kiểm tra thêm chứng từ thu nhập.
+2. Rủi ro: theo dõi DSR và biến động lãi suất thả nổi.
+3. Khuyến nghị: chấp thuận có điều kiện, định giá lại TSBĐ định kỳ.
+
+Đoạn đầu prompt: {excerpt}
+"""
+
+
+class LocalBackend(LLMBackend):
+    """
+    Backend local tất định, không cần mạng/API key
+
+    Dùng để benchmark và load-test các tab AI. Phản hồi được chọn theo
+    thứ tự: câu trả lời soạn sẵn (khớp từ khóa trong prompt), sau đó
+    đến template điền theo prompt. Cùng prompt luôn cho cùng phản hồi.
+    """
+
+    name = 'local'
+
+    def __init__(self, latency: float = LOCAL_AI_LATENCY,
+                 jitter: float = LOCAL_AI_JITTER,
+                 responses: Optional[Dict[str, str]] = None,
+                 template: str = DEFAULT_LOCAL_TEMPLATE):
+        """
+        Khởi tạo backend local
+
+        Args:
+            latency: Độ trễ giả lập mỗi lời gọi (giây)
+            jitter: Biên dao động độ trễ (giây), tất định theo prompt
+            responses: Dictionary {từ khóa: câu trả lời soạn sẵn}
+            template: Template phản hồi mặc định
+        """
+        self.latency = latency
+        self.jitter = jitter
+        self.responses = responses or {}
+        self.template = template
+
+    @classmethod
+    def from_file(cls, path: str, **kwargs) -> 'LocalBackend':
+        """Tạo backend với câu trả lời soạn sẵn từ file JSON {từ khóa: câu trả lời}"""
+        with open(path, encoding='utf-8') as f:
+            return cls(responses=json.load(f), **kwargs)
+
+    def generate(self, prompt: str, generation_config: Dict) -> str:
+        digest = hashlib.sha256(prompt.encode('utf-8')).hexdigest()[:12]
+
+        delay = self.latency
+        if self.jitter > 0:
+            # Seed theo prompt để độ trễ cũng tất định
+            delay += random.Random(digest).uniform(-self.jitter, self.jitter)
+        if delay > 0:
+            time.sleep(delay)
+
+        for keyword, response in self.responses.items():
+            if keyword in prompt:
+                return response
+
+        if generation_config.get('response_mime_type') == 'application/json':
+            # Yêu cầu phản hồi có cấu trúc: không có câu trả lời soạn sẵn thì trả JSON rỗng
+            return '{}'
+
+        excerpt = next((line.strip() for line in prompt.splitlines() if line.strip()), "")
+        return self.template.format(digest=digest, chars=len(prompt), excerpt=excerpt[:200])
+
+    def create_transport(self) -> ResilientTransport:
+        # Không giới hạn tốc độ/ngắt mạch để đo throughput thực của ứng dụng
+        return ResilientTransport(retry_policy=RetryPolicy(max_attempts=1))
+
+
+def requires_api_key(backend_name: str = AI_BACKEND) -> bool:
+    """Backend có cần API key hay không"""
+    if AI_CASSETTE_PATH and AI_CASSETTE_MODE == 'replay':
+        return False
+    return backend_name == GeminiBackend.name
+
+
+def create_backend(api_key: str = "", backend_name: str = AI_BACKEND,
+                   model_name: str = GEMINI_MODEL) -> LLMBackend:
+    """
+    Tạo backend theo cấu hình (biến môi trường CADAP_AI_BACKEND)
+
+    Nếu đặt CADAP_AI_CASSETTE, backend được bọc bởi cassette ghi/phát lại.
+
+    Args:
+        api_key: API key (chỉ cần cho Gemini)
+        backend_name: 'gemini' hoặc 'local'
+        model_name: Tên model
+
+    Returns:
+        LLMBackend
+    """
+    if AI_CASSETTE_PATH:
+        from ai.cassette import CassetteBackend, MODE_RECORD
+
+        inner = None
+        if AI_CASSETTE_MODE == MODE_RECORD:
+            inner = _create_base_backend(api_key, backend_name, model_name)
+        return CassetteBackend(AI_CASSETTE_PATH, AI_CASSETTE_MODE, inner,
+                               AI_CASSETTE_LATENCY_SCALE)
+    return _create_base_backend(api_key, backend_name, model_name)
+
+
+def _create_base_backend(api_key: str, backend_name: str, model_name: str) -> LLMBackend:
+    if backend_name == LocalBackend.name:
+        if LOCAL_AI_RESPONSES_FILE:
+            return LocalBackend.from_file(LOCAL_AI_RESPONSES_FILE)
+        return LocalBackend()
+    if backend_name == GeminiBackend.name:
+        return GeminiBackend(api_key, model_name)
+    raise ValueError(f"Backend AI không hỗ trợ: {backend_name}")
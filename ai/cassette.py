@@ -0,0 +1,155 @@
+# ai/cassette.py
+"""Lớp ghi/phát lại (cassette) các lời gọi AI phục vụ test hồi quy và benchmark"""
+
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from ai.backends import LLMBackend
+from ai.tools import Tool
+from ai.transport import ResilientTransport, RetryPolicy
+
+MODE_RECORD = 'record'
+MODE_REPLAY = 'replay'
+
+
+class CassetteMissError(LookupError):
+    """Không tìm thấy phản hồi đã ghi cho prompt khi phát lại"""
+
+
+def cassette_key(prompt: str, generation_config: Dict) -> str:
+    """Khóa của một lời gọi: hash prompt + tham số sinh"""
+    payload = json.dumps([prompt, generation_config], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class CassetteBackend(LLMBackend):
+    """
+    Backend ghi/phát lại bọc quanh một backend khác
+
+    - record: gọi backend thật, ghi prompt → phản hồi kèm độ trễ vào file
+      JSON Lines nén gzip (mỗi lời gọi append một dòng)
+    - replay: trả lại phản hồi đã ghi với độ trễ gốc nhân hệ số
+      latency_scale (0 = trả ngay), không cần mạng
+    """
+
+    name = 'cassette'
+
+    def __init__(self, path: str, mode: str = MODE_REPLAY,
+                 inner: Optional[LLMBackend] = None,
+                 latency_scale: float = 1.0):
+        """
+        Khởi tạo cassette
+
+        Args:
+            path: Đường dẫn file cassette (.jsonl.gz)
+            mode: 'record' hoặc 'replay'
+            inner: Backend thật (bắt buộc khi record)
+            latency_scale: Hệ số nhân độ trễ khi replay
+        """
+        if mode not in (MODE_RECORD, MODE_REPLAY):
+            raise ValueError(f"Chế độ cassette không hợp lệ: {mode}")
+        if mode == MODE_RECORD and inner is None:
+            raise ValueError("Chế độ record cần backend thật")
+
+        self.path = path
+        self.mode = mode
+        self.inner = inner
+        self.latency_scale = latency_scale
+        self._lock = threading.Lock()
+        self._entries: Dict[str, List[Dict]] = defaultdict(list)
+        self._cursor: Dict[str, int] = defaultdict(int)
+
+        if mode == MODE_REPLAY:
+            self._load()
+
+    def _load(self):
+        """Đọc toàn bộ cassette vào bộ nhớ, nhóm theo khóa"""
+        if not os.path.exists(self.path):
+            raise FileNotFoundError(f"Không tìm thấy file cassette: {self.path}")
+        with gzip.open(self.path, 'rt', encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    entry = json.loads(line)
+                    self._entries[entry['key']].append(entry)
+
+    def __len__(self) -> int:
+        return sum(len(entries) for entries in self._entries.values())
+
+    @property
+    def supports_tools(self) -> bool:
+        if self.inner is not None:
+            return self.inner.supports_tools
+        return any('tool_calls' in entry
+                   for entries in self._entries.values() for entry in entries)
+
+    def generate(self, prompt: str, generation_config: Dict) -> str:
+        key = cassette_key(prompt, generation_config)
+        if self.mode == MODE_RECORD:
+            def produce():
+                return self.inner.generate(prompt, generation_config), None
+            return self._record(key, prompt, produce)['response']
+        return self._replay(key)['response']
+
+    def generate_with_tools(self, prompt: str, tools: List[Tool], generation_config: Dict,
+                            request: Optional[Callable[[Callable[[], Any]], Any]] = None) -> Tuple[str, List[Dict]]:
+        # Bộ công cụ là một phần của khóa: cùng prompt nhưng khác công cụ là lời gọi khác
+        key = cassette_key(prompt, {**generation_config, 'tools': [t.name for t in tools]})
+        if self.mode == MODE_RECORD:
+            def produce():
+                return self.inner.generate_with_tools(prompt, tools, generation_config, request)
+            entry = self._record(key, prompt, produce)
+        else:
+            entry = self._replay(key)
+        return entry['response'], entry.get('tool_calls', [])
+
+    def _record(self, key: str, prompt: str,
+                produce: Callable[[], Tuple[str, Optional[List[Dict]]]]) -> Dict:
+        start = time.perf_counter()
+        response, tool_calls = produce()
+        latency = time.perf_counter() - start
+
+        entry = {
+            'key': key,
+            'prompt': prompt,
+            'response': response,
+            'latency': round(latency, 4),
+            'backend': self.inner.name,
+            'recorded_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        }
+        if tool_calls is not None:
+            entry['tool_calls'] = tool_calls
+        line = json.dumps(entry, ensure_ascii=False, separators=(',', ':')) + '\n'
+        with self._lock:
+            # Mỗi lần append tạo một gzip member, gzip.open vẫn đọc liền mạch
+            with gzip.open(self.path, 'at', encoding='utf-8') as f:
+                f.write(line)
+            self._entries[key].append(entry)
+        return entry
+
+    def _replay(self, key: str) -> Dict:
+        with self._lock:
+            entries = self._entries.get(key)
+            if not entries:
+                raise CassetteMissError(
+                    f"Cassette {self.path} không có phản hồi cho prompt {key[:12]}"
+                )
+            # Cùng prompt được ghi nhiều lần thì phát lại lần lượt, hết thì quay vòng
+            entry = entries[self._cursor[key] % len(entries)]
+            self._cursor[key] += 1
+
+        delay = entry['latency'] * self.latency_scale
+        if delay > 0:
+            time.sleep(delay)
+        return entry
+
+    def create_transport(self) -> ResilientTransport:
+        if self.mode == MODE_RECORD:
+            return self.inner.create_transport()
+        # Phát lại không chạm tới API thật nên không cần rate limit/retry
+        return ResilientTransport(retry_policy=RetryPolicy(max_attempts=1))
@@ -0,0 +1,278 @@
+# ai/extraction.py
+"""Trích xuất lai: regex trước, AI chỉ cho các trường parser bỏ sót"""
+
+import json
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+from ai.transport import AIResult
+from src.config import (
+    AI_EXTRACTION_MIN_CONFIDENCE, AI_EXTRACTION_FIELD_CONFIDENCE,
+    AI_EXTRACTION_CONTEXT_PARAGRAPHS, AI_EXTRACTION_MAX_CHARS
+)
+from src.docx_parser_v2 import SOURCE_AI
+
+
+# Các trường có thể nhờ AI trích xuất: kiểu dữ liệu, mô tả và từ khóa
+# xác định đoạn văn liên quan trong phương án
+FIELD_SPECS: Dict[str, Dict[str, Any]] = {
+    'customer_info.name': {
+        'label': 'Họ tên khách hàng', 'type': 'string',
+        'description': 'Họ và tên người vay chính',
+        'keywords': ['Họ và tên', 'Bên vay', 'Khách hàng'],
+    },
+    'customer_info.cccd': {
+        'label': 'CCCD', 'type': 'string',
+        'description': 'Số CMND/CCCD của người vay chính (9 hoặc 12 chữ số)',
+        'keywords': ['CMND', 'CCCD', 'Căn cước'],
+    },
+    'customer_info.address': {
+        'label': 'Địa chỉ', 'type': 'string',
+        'description': 'Nơi cư trú của người vay chính',
+        'keywords': ['Nơi cư trú', 'Địa chỉ thường trú', 'Thường trú'],
+    },
+    'customer_info.phone': {
+        'label': 'Số điện thoại', 'type': 'string',
+        'description': 'Số điện thoại của người vay chính',
+        'keywords': ['điện thoại', 'SĐT', 'Di động'],
+    },
+    'loan_info.purpose': {
+        'label': 'Mục đích vay', 'type': 'string',
+        'description': 'Mục đích sử dụng vốn vay',
+        'keywords': ['Mục đích'],
+    },
+    'loan_info.total_need': {
+        'label': 'Tổng nhu cầu vốn', 'type': 'number',
+        'description': 'Tổng nhu cầu vốn (VND)',
+        'keywords': ['nhu cầu vốn'],
+    },
+    'loan_info.equity': {
+        'label': 'Vốn đối ứng', 'type': 'number',
+        'description': 'Vốn đối ứng/vốn tự có của khách hàng (VND)',
+        'keywords': ['đối ứng', 'tự có'],
+    },
+    'loan_info.loan_amount': {
+        'label': 'Số tiền vay', 'type': 'number',
+        'description': 'Số tiền đề nghị vay ngân hàng (VND)',
+        'keywords': ['Vốn vay', 'số tiền vay', 'Số tiền:'],
+    },
+    'loan_info.interest_rate': {
+        'label': 'Lãi suất', 'type': 'number',
+        'description': 'Lãi suất cho vay (%/năm)',
+        'keywords': ['Lãi suất'],
+    },
+    'loan_info.loan_term': {
+        'label': 'Thời hạn vay', 'type': 'integer',
+        'description': 'Thời hạn vay quy đổi ra tháng',
+        'keywords': ['Thời hạn'],
+    },
+    'collateral_info.asset_type': {
+        'label': 'Loại tài sản', 'type': 'string',
+        'description': 'Loại tài sản bảo đảm chính',
+        'keywords': ['Tài sản bảo đảm', 'Tài sản 1', 'thế chấp'],
+    },
+    'collateral_info.market_value': {
+        'label': 'Giá trị TSBĐ', 'type': 'number',
+        'description': 'Giá trị thị trường/định giá của tài sản bảo đảm (VND)',
+        'keywords': ['Giá trị', 'định giá'],
+    },
+    'collateral_info.asset_address': {
+        'label': 'Địa chỉ tài sản', 'type': 'string',
+        'description': 'Địa chỉ của tài sản bảo đảm',
+        'keywords': ['Tài sản 1', 'Địa chỉ:', 'tọa lạc'],
+    },
+    'collateral_info.ltv': {
+        'label': 'LTV', 'type': 'number',
+        'description': 'Tỷ lệ cho vay trên giá trị tài sản bảo đảm (%)',
+        'keywords': ['LTV', 'Tỷ lệ cho vay'],
+    },
+    'collateral_info.legal_docs': {
+        'label': 'Giấy tờ pháp lý', 'type': 'string',
+        'description': 'Giấy tờ pháp lý của tài sản bảo đảm',
+        'keywords': ['Giấy chứng nhận', 'Sổ đỏ', 'Sổ hồng'],
+    },
+    'financial_info.monthly_income': {
+        'label': 'Thu nhập tháng', 'type': 'number',
+        'description': 'Tổng thu nhập hàng tháng (VND)',
+        'keywords': ['thu nhập'],
+    },
+    'financial_info.monthly_expense': {
+        'label': 'Chi phí tháng', 'type': 'number',
+        'description': 'Tổng chi phí hàng tháng (VND)',
+        'keywords': ['chi phí'],
+    },
+}
+
+
+def _property_name(field: str) -> str:
+    """Tên thuộc tính trong schema (tránh dấu chấm)"""
+    return field.replace('.', '__')
+
+
+def fields_needing_extraction(field_meta: Dict[str, Dict],
+                              min_confidence: float = AI_EXTRACTION_MIN_CONFIDENCE) -> List[str]:
+    """
+    Các trường cần nhờ AI: parser không tìm thấy hoặc độ tin cậy thấp
+
+    Args:
+        field_meta: Nguồn gốc/độ tin cậy từng trường từ DocxParserV2
+        min_confidence: Ngưỡng độ tin cậy tối thiểu
+
+    Returns:
+        Danh sách trường (dạng 'loan_info.interest_rate')
+    """
+    return [field for field in FIELD_SPECS
+            if field_meta.get(field, {}).get('confidence', 0.0) < min_confidence]
+
+
+def collect_snippets(paragraphs: List[str], fields: List[str],
+                     context: int = AI_EXTRACTION_CONTEXT_PARAGRAPHS,
+                     max_chars: int = AI_EXTRACTION_MAX_CHARS) -> str:
+    """
+    Gom các đoạn văn liên quan tới các trường cần trích xuất
+
+    Chỉ lấy đoạn chứa từ khóa của trường (kèm vài đoạn lân cận), mỗi đoạn
+    chỉ gửi một lần dù liên quan tới nhiều trường.
+
+    Args:
+        paragraphs: Các đoạn văn của tài liệu
+        fields: Các trường cần trích xuất
+        context: Số đoạn lân cận lấy kèm mỗi phía
+        max_chars: Độ dài tối đa của trích đoạn
+
+    Returns:
+        Trích đoạn theo thứ tự trong tài liệu
+    """
+    keywords = [kw.lower() for field in fields for kw in FIELD_SPECS[field]['keywords']]
+    selected = set()
+    for i, para in enumerate(paragraphs):
+        lowered = para.lower()
+        if any(kw in lowered for kw in keywords):
+            selected.update(range(max(0, i - context), min(len(paragraphs), i + context + 1)))
+
+    excerpt = []
+    total = 0
+    for i in sorted(selected):
+        if total + len(paragraphs[i]) > max_chars:
+            break
+        excerpt.append(paragraphs[i])
+        total += len(paragraphs[i]) + 1
+    return "\n".join(excerpt)
+
+
+def build_response_schema(fields: List[str]) -> Dict[str, Any]:
+    """JSON schema cho phản hồi có cấu trúc (null khi không tìm thấy)"""
+    return {
+        'type': 'object',
+        'properties': {
+            _property_name(field): {
+                'type': FIELD_SPECS[field]['type'],
+                'description': FIELD_SPECS[field]['description'],
+                'nullable': True,
+            }
+            for field in fields
+        },
+    }
+
+
+def parse_extraction(text: str) -> Dict[str, Any]:
+    """Đọc JSON từ phản hồi (bỏ khung ```json nếu model vẫn thêm vào)"""
+    cleaned = re.sub(r'^```(?:json)?\s*|\s*```$', '', text.strip())
+    try:
+        data = json.loads(cleaned)
+    except ValueError:
+        return {}
+    return data if isinstance(data, dict) else {}
+
+
+def _coerce(value: Any, value_type: str) -> Optional[Any]:
+    """Chuẩn hóa giá trị AI trả về theo kiểu của trường, None nếu không dùng được"""
+    if value is None:
+        return None
+    try:
+        if value_type == 'number':
+            value = float(value)
+            return value if value > 0 else None
+        if value_type == 'integer':
+            value = int(float(value))
+            return value if value > 0 else None
+    except (TypeError, ValueError):
+        return None
+    value = str(value).strip()
+    return value or None
+
+
+def merge_extracted(parsed: Dict[str, Any], values: Dict[str, Any],
+                    fields: List[str]) -> List[str]:
+    """
+    Ghép giá trị AI trích xuất vào kết quả parse, ghi nguồn gốc 'ai'
+
+    Args:
+        parsed: Kết quả DocxParserV2.parse_full_document() (được cập nhật tại chỗ)
+        values: JSON AI trả về
+        fields: Các trường đã yêu cầu
+
+    Returns:
+        Danh sách trường đã được điền
+    """
+    filled = []
+    for field in fields:
+        value = _coerce(values.get(_property_name(field)), FIELD_SPECS[field]['type'])
+        if value is None:
+            continue
+        section, name = field.split('.', 1)
+        parsed[section][name] = value
+        parsed['field_meta'][field] = {
+            'source': SOURCE_AI,
+            'confidence': AI_EXTRACTION_FIELD_CONFIDENCE,
+            'snippet': '',
+        }
+        filled.append(field)
+
+    loan_info = parsed['loan_info']
+    if 'loan_info.equity' in filled or 'loan_info.total_need' in filled:
+        total_need = loan_info.get('total_need', 0)
+        loan_info['equity_ratio'] = (loan_info['equity'] / total_need * 100) if total_need > 0 else 0
+    return filled
+
+
+def plan_extraction(parsed: Dict[str, Any], paragraphs: List[str]) -> Tuple[List[str], str]:
+    """
+    Các trường cần nhờ AI trích xuất và đoạn trích gửi kèm
+
+    Returns:
+        (danh sách trường, đoạn trích); danh sách rỗng nếu không cần gọi AI
+    """
+    fields = fields_needing_extraction(parsed['field_meta'])
+    if not fields:
+        return [], ''
+
+    excerpt = collect_snippets(paragraphs, fields)
+    if not excerpt:
+        return [], ''
+    return fields, excerpt
+
+
+def fill_missing_fields(parsed: Dict[str, Any], paragraphs: List[str],
+                        client) -> Tuple[List[str], Optional[AIResult]]:
+    """
+    Nhờ AI điền các trường parser bỏ sót bằng một lời gọi gộp
+
+    Tài liệu đầy đủ (mọi trường đạt ngưỡng tin cậy) không gọi AI.
+
+    Args:
+        parsed: Kết quả DocxParserV2.parse_full_document() (được cập nhật tại chỗ)
+        paragraphs: Các đoạn văn của tài liệu
+        client: GeminiClient
+
+    Returns:
+        (các trường đã điền, AIResult hoặc None nếu không cần gọi)
+    """
+    fields, excerpt = plan_extraction(parsed, paragraphs)
+    if not fields:
+        return [], None
+
+    result = client.extract_fields(excerpt, build_response_schema(fields))
+    if not result.ok:
+        return [], result
+    return merge_extracted(parsed, parse_extraction(result.text), fields), result
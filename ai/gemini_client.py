@@ -1,30 +1,44 @@
 # ai/gemini_client.py
 """Module tích hợp Google Gemini API"""
 
-import google.generativeai as genai
-from typing import List, Dict, Optional
+import time
+from typing import Any, Callable, List, Dict, Optional
 import streamlit as st
+from ai.backends import LLMBackend, create_backend, requires_api_key
+from ai.tools import FINANCIAL_TOOLS
+from ai.transport import AIResult, ResilientTransport, classify_error
+from src.config import GEMINI_MODEL
+
+
+class _RoundFailed(Exception):
+    """Một vòng gọi công cụ thất bại sau khi transport đã retry"""
+    
+    def __init__(self, result: AIResult):
+        super().__init__(result.error.message)
+        self.result = result
 
 
 class GeminiClient:
-    """Client để tương tác với Gemini API"""
+    """Client để tương tác với Gemini API (hoặc backend LLM khác)"""
     
-    def __init__(self, api_key: str, model_name: str = "gemini-2.0-flash-exp"):
+    def __init__(self, api_key: str = "", model_name: str = GEMINI_MODEL,
+                 backend: Optional[LLMBackend] = None,
+                 transport: Optional[ResilientTransport] = None):
         """
         Khởi tạo Gemini client
         
         Args:
             api_key: API key của Google Gemini
             model_name: Tên model (mặc định: gemini-2.0-flash-exp)
+            backend: Backend LLM (mặc định: theo cấu hình CADAP_AI_BACKEND)
+            transport: Transport retry/rate limit (mặc định: theo backend)
         """
         self.api_key = api_key
         self.model_name = model_name
-        
-        # Cấu hình API
-        genai.configure(api_key=api_key)
-        
-        # Khởi tạo model
-        self.model = genai.GenerativeModel(model_name)
+        if backend is None:
+            backend = create_backend(api_key, model_name=model_name)
+        self.backend = backend
+        self.transport = transport or self.backend.create_transport()
         
         # Cấu hình generation
         self.generation_config = {
@@ -34,7 +48,13 @@ class GeminiClient:
             'max_output_tokens': 8192,
         }
     
-    def analyze_from_file(self, file_content: str) -> str:
+    def _generate(self, prompt: str) -> AIResult:
+        """Gửi prompt tới backend qua transport (retry, rate limit, circuit breaker)"""
+        return self.transport.call(
+            lambda: self.backend.generate(prompt, self.generation_config)
+        )
+    
+    def analyze_from_file(self, file_content: str) -> AIResult:
         """
         Phân tích phương án từ nội dung file
         
@@ -42,7 +62,7 @@ class GeminiClient:
             file_content: Nội dung file đã upload
             
         Returns:
-            Kết quả phân tích
+            AIResult chứa kết quả phân tích hoặc lỗi
         """
         prompt = f"""
 Bạn là chuyên gia thẩm định tín dụng ngân hàng. Hãy phân tích phương án sử dụng vốn sau đây một cách chuyên sâu và đưa ra đánh giá:
@@ -60,16 +80,9 @@ YÊU CẦU PHÂN TÍCH:
 Hãy trả lời một cách ngắn gọn, chuyên nghiệp nhưng đầy đủ các khía cạnh quan trọng.
 """
         
-        try:
-            response = self.model.generate_content(
-                prompt,
-                generation_config=self.generation_config
-            )
-            return response.text
-        except Exception as e:
-            return f"Lỗi khi phân tích: {str(e)}"
+        return self._generate(prompt)
     
-    def analyze_from_data(self, data: Dict) -> str:
+    def analyze_from_data(self, data: Dict) -> AIResult:
         """
         Phân tích phương án từ dữ liệu đã nhập/chỉnh sửa
         
@@ -77,7 +90,7 @@ Hãy trả lời một cách ngắn gọn, chuyên nghiệp nhưng đầy đủ
             data: Dictionary chứa dữ liệu đã nhập
             
         Returns:
-            Kết quả phân tích
+            AIResult chứa kết quả phân tích hoặc lỗi
         """
         prompt = f"""
 Bạn là chuyên gia thẩm định tín dụng ngân hàng. Hãy phân tích các chỉ số tài chính sau đây và đưa ra đánh giá chuyên sâu:
@@ -118,54 +131,121 @@ YÊU CẦU PHÂN TÍCH:
 Hãy trả lời một cách ngắn gọn nhưng chuyên sâu, tập trung vào các điểm quan trọng.
 """
         
-        try:
-            response = self.model.generate_content(
-                prompt,
-                generation_config=self.generation_config
-            )
-            return response.text
-        except Exception as e:
-            return f"Lỗi khi phân tích: {str(e)}"
+        return self._generate(prompt)
     
-    def chat(self, message: str, chat_history: Optional[List[Dict]] = None) -> str:
+    def extract_fields(self, excerpt: str, response_schema: Dict) -> AIResult:
+        """
+        Trích xuất có cấu trúc một nhóm trường từ trích đoạn phương án
+        
+        Args:
+            excerpt: Các đoạn văn liên quan (không phải toàn bộ file)
+            response_schema: JSON schema của phản hồi (mỗi thuộc tính là một trường)
+            
+        Returns:
+            AIResult với text là JSON theo schema hoặc lỗi
+        """
+        prompt = f"""
+Trích xuất các trường sau từ trích đoạn phương án vay vốn. Chỉ dùng thông tin có trong trích đoạn,
+trường nào không có thì trả về null. Số tiền ghi bằng VND (số nguyên, không dấu phân cách),
+lãi suất và tỷ lệ ghi theo %, thời hạn quy đổi ra tháng.
+
+CÁC TRƯỜNG CẦN TRÍCH XUẤT: {", ".join(response_schema['properties'])}
+
+TRÍCH ĐOẠN:
+{excerpt}
+"""
+        generation_config = {
+            **self.generation_config,
+            'temperature': 0.0,
+            'response_mime_type': 'application/json',
+            'response_schema': response_schema,
+        }
+        return self.transport.call(
+            lambda: self.backend.generate(prompt, generation_config)
+        )
+    
+    def chat(self, message: str, chat_history: Optional[List[Dict]] = None,
+             case_data: Optional[Dict] = None) -> AIResult:
         """
         Chat với Gemini
         
+        Nếu backend hỗ trợ function calling, các phép tính (lịch trả nợ, DSR,
+        LTV, số tiền vay tối đa) được model giao cho FinancialCalculator chạy
+        cục bộ thay vì tự tính trong câu trả lời.
+        
         Args:
             message: Tin nhắn từ người dùng
             chat_history: Lịch sử chat (optional)
+            case_data: Số liệu hồ sơ hiện tại để model điền tham số công cụ (optional)
             
         Returns:
-            Phản hồi từ Gemini
+            AIResult chứa phản hồi từ Gemini (kèm các lời gọi công cụ) hoặc lỗi
         """
-        try:
-            # Nếu có lịch sử chat, tạo context
-            if chat_history and len(chat_history) > 0:
-                context = "Lịch sử hội thoại:\n"
-                for msg in chat_history[-5:]:  # Lấy 5 tin nhắn gần nhất
-                    context += f"{msg['role']}: {msg['content']}\n"
-                context += f"\nTin nhắn hiện tại: {message}"
-                prompt = context
-            else:
-                prompt = message
-            
-            # Thêm system prompt
-            full_prompt = f"""
+        # Nếu có lịch sử chat, tạo context
+        if chat_history and len(chat_history) > 0:
+            context = "Lịch sử hội thoại:\n"
+            for msg in chat_history[-5:]:  # Lấy 5 tin nhắn gần nhất
+                context += f"{msg['role']}: {msg['content']}\n"
+            context += f"\nTin nhắn hiện tại: {message}"
+            prompt = context
+        else:
+            prompt = message
+        
+        if case_data:
+            case_context = "Số liệu hồ sơ hiện tại:\n"
+            for key, value in case_data.items():
+                case_context += f"- {key}: {value}\n"
+            prompt = f"{case_context}\n{prompt}"
+        
+        use_tools = self.backend.supports_tools
+        tool_hint = ""
+        if use_tools:
+            tool_hint = ("Khi câu hỏi cần tính toán (lịch trả nợ, DSR, LTV, số tiền vay tối đa), "
+                         "hãy gọi công cụ tương ứng thay vì tự tính, rồi trả lời ngắn gọn dựa trên kết quả.")
+        
+        # Thêm system prompt
+        full_prompt = f"""
 Bạn là trợ lý AI chuyên về thẩm định tín dụng và phân tích tài chính ngân hàng.
 Hãy trả lời câu hỏi một cách chuyên nghiệp, chính xác và hữu ích.
+{tool_hint}
 
 {prompt}
 """
+        
+        if not use_tools:
+            return self._generate(full_prompt)
+        
+        start = time.monotonic()
+        attempts = 0
+        
+        def request(fn: Callable[[], Any]) -> Any:
+            """Mỗi vòng gọi công cụ là một lời gọi transport (một token, retry riêng vòng đó)"""
+            nonlocal attempts
+            responses = []
             
-            response = self.model.generate_content(
-                full_prompt,
-                generation_config=self.generation_config
+            def send() -> str:
+                responses.append(fn())
+                return ""
+            
+            result = self.transport.call(send)
+            attempts += result.attempts
+            if not result.ok:
+                raise _RoundFailed(result)
+            return responses[0]
+        
+        try:
+            text, tool_calls = self.backend.generate_with_tools(
+                full_prompt, FINANCIAL_TOOLS, self.generation_config, request
             )
-            return response.text
+        except _RoundFailed as e:
+            return AIResult(error=e.result.error, attempts=attempts, elapsed=time.monotonic() - start)
         except Exception as e:
-            return f"Lỗi: {str(e)}"
+            # VD: model gọi công cụ quá số vòng cho phép
+            return AIResult(error=classify_error(e), attempts=attempts, elapsed=time.monotonic() - start)
+        return AIResult(text=text, attempts=attempts, elapsed=time.monotonic() - start,
+                        tool_calls=tool_calls)
     
-    def generate_report_summary(self, data: Dict) -> str:
+    def generate_report_summary(self, data: Dict) -> AIResult:
         """
         Tạo tóm tắt báo cáo thẩm định
         
@@ -173,7 +253,7 @@ Hãy trả lời câu hỏi một cách chuyên nghiệp, chính xác và hữu
             data: Dữ liệu phương án
             
         Returns:
-            Tóm tắt báo cáo
+            AIResult chứa tóm tắt báo cáo hoặc lỗi
         """
         prompt = f"""
 Hãy tạo một tóm tắt báo cáo thẩm định ngắn gọn (2-3 đoạn văn) cho phương án sau:
@@ -191,14 +271,7 @@ Tóm tắt nên bao gồm:
 3. Kết luận và khuyến nghị
 """
         
-        try:
-            response = self.model.generate_content(
-                prompt,
-                generation_config=self.generation_config
-            )
-            return response.text
-        except Exception as e:
-            return f"Không thể tạo tóm tắt: {str(e)}"
+        return self._generate(prompt)
 
 
 @st.cache_resource
@@ -212,7 +285,7 @@ def get_gemini_client(api_key: str) -> Optional[GeminiClient]:
     Returns:
         GeminiClient instance hoặc None nếu lỗi
     """
-    if not api_key or api_key.strip() == "":
+    if requires_api_key() and (not api_key or api_key.strip() == ""):
         return None
     
     try:
@@ -0,0 +1,181 @@
+# ai/tools.py
+"""Công cụ tính toán cục bộ cho chatbot (function calling)"""
+
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List
+
+from logic.financial_calculator import FinancialCalculator
+
+
+@dataclass
+class Tool:
+    """Một công cụ model có thể gọi: khai báo JSON schema + hàm Python"""
+    name: str
+    description: str
+    parameters: Dict[str, Any]
+    function: Callable[..., Dict[str, Any]]
+
+    def declaration(self) -> Dict[str, Any]:
+        """Khai báo function cho API (không kèm hàm Python)"""
+        return {
+            'name': self.name,
+            'description': self.description,
+            'parameters': self.parameters,
+        }
+
+
+def _number(description: str) -> Dict[str, str]:
+    return {'type': 'number', 'description': description}
+
+
+LOAN_PARAMETERS = {
+    'loan_amount': _number('Số tiền vay (VND)'),
+    'interest_rate': _number('Lãi suất năm (%)'),
+    'loan_term': _number('Thời hạn vay (tháng)'),
+}
+
+
+def _round(values: Dict[str, Any]) -> Dict[str, Any]:
+    """Làm tròn số tiền/tỷ lệ để phản hồi gọn, giảm token"""
+    return {k: round(v, 2) if isinstance(v, float) else v for k, v in values.items()}
+
+
+def _term(loan_term: float) -> int:
+    """Thời hạn vay (tháng, số nguyên) như FinancialCalculator dùng"""
+    term = int(loan_term)
+    if term <= 0:
+        raise ValueError("loan_term phải ít nhất 1 tháng")
+    return term
+
+
+def calculate_payment_schedule(loan_amount: float, interest_rate: float,
+                               loan_term: float) -> Dict[str, Any]:
+    """Lịch trả nợ dư nợ giảm dần: tóm tắt + vài kỳ đầu/cuối"""
+    term = _term(loan_term)
+    calc = FinancialCalculator(loan_amount, interest_rate, term)
+    schedule = calc.calculate_payment_schedule()
+    total_interest = sum(p['interest'] for p in schedule)
+    sample = schedule[:3] + schedule[-1:] if len(schedule) > 4 else schedule
+    return _round({
+        'first_payment': schedule[0]['total_payment'] if schedule else 0.0,
+        'last_payment': schedule[-1]['total_payment'] if schedule else 0.0,
+        'monthly_principal': loan_amount / term,
+        'total_interest': total_interest,
+        'total_payment': loan_amount + total_interest,
+        'periods': [_round(p) for p in sample],
+    })
+
+
+def calculate_dsr(loan_amount: float, interest_rate: float, loan_term: float,
+                  monthly_income: float, other_debt: float = 0) -> Dict[str, Any]:
+    """DSR theo kỳ trả nợ đầu tiên (cao nhất)"""
+    calc = FinancialCalculator(loan_amount, interest_rate, _term(loan_term),
+                               monthly_income=monthly_income, other_debt=other_debt)
+    capacity = calc.assess_repayment_capacity()
+    return _round({
+        'monthly_payment': calc.calculate_monthly_payment(),
+        'dsr': capacity['dsr'],
+        'assessment': capacity['assessment'],
+        'risk_level': capacity['risk_level'],
+    })
+
+
+def calculate_ltv(loan_amount: float, collateral_value: float) -> Dict[str, Any]:
+    """LTV = Số tiền vay / Giá trị tài sản"""
+    calc = FinancialCalculator(loan_amount, 0, 1)
+    return _round({'ltv': calc.calculate_ltv(collateral_value)})
+
+
+def calculate_max_loan(interest_rate: float, loan_term: float, monthly_income: float,
+                       other_debt: float = 0, max_dsr: float = 60,
+                       collateral_value: float = 0, max_ltv: float = 70) -> Dict[str, Any]:
+    """Số tiền vay tối đa theo DSR (và LTV nếu có tài sản)"""
+    calc = FinancialCalculator(0, interest_rate, int(loan_term),
+                               monthly_income=monthly_income, other_debt=other_debt)
+    max_loan = calc.calculate_max_loan_amount(max_dsr, collateral_value, max_ltv)
+    return _round({'max_loan_amount': max_loan, 'max_dsr': max_dsr})
+
+
+FINANCIAL_TOOLS: List[Tool] = [
+    Tool(
+        name='calculate_payment_schedule',
+        description='Tính lịch trả nợ theo phương thức dư nợ giảm dần (trả gốc đều): '
+                    'kỳ trả đầu/cuối, tổng lãi, tổng phải trả.',
+        parameters={
+            'type': 'object',
+            'properties': dict(LOAN_PARAMETERS),
+            'required': ['loan_amount', 'interest_rate', 'loan_term'],
+        },
+        function=calculate_payment_schedule,
+    ),
+    Tool(
+        name='calculate_dsr',
+        description='Tính DSR (tỷ lệ trả nợ/thu nhập, %) và đánh giá năng lực trả nợ.',
+        parameters={
+            'type': 'object',
+            'properties': {
+                **LOAN_PARAMETERS,
+                'monthly_income': _number('Thu nhập hàng tháng (VND)'),
+                'other_debt': _number('Nghĩa vụ nợ khác hàng tháng (VND)'),
+            },
+            'required': ['loan_amount', 'interest_rate', 'loan_term', 'monthly_income'],
+        },
+        function=calculate_dsr,
+    ),
+    Tool(
+        name='calculate_ltv',
+        description='Tính LTV (số tiền vay / giá trị tài sản bảo đảm, %).',
+        parameters={
+            'type': 'object',
+            'properties': {
+                'loan_amount': LOAN_PARAMETERS['loan_amount'],
+                'collateral_value': _number('Giá trị tài sản bảo đảm (VND)'),
+            },
+            'required': ['loan_amount', 'collateral_value'],
+        },
+        function=calculate_ltv,
+    ),
+    Tool(
+        name='calculate_max_loan',
+        description='Tính số tiền vay tối đa sao cho DSR không vượt ngưỡng '
+                    '(và LTV không vượt ngưỡng nếu có tài sản bảo đảm).',
+        parameters={
+            'type': 'object',
+            'properties': {
+                'interest_rate': LOAN_PARAMETERS['interest_rate'],
+                'loan_term': LOAN_PARAMETERS['loan_term'],
+                'monthly_income': _number('Thu nhập hàng tháng (VND)'),
+                'other_debt': _number('Nghĩa vụ nợ khác hàng tháng (VND)'),
+                'max_dsr': _number('DSR tối đa cho phép (%), mặc định 60'),
+                'collateral_value': _number('Giá trị tài sản bảo đảm (VND), 0 nếu không có'),
+                'max_ltv': _number('LTV tối đa cho phép (%), mặc định 70'),
+            },
+            'required': ['interest_rate', 'loan_term', 'monthly_income'],
+        },
+        function=calculate_max_loan,
+    ),
+]
+
+
+def execute_tool(tools: List[Tool], name: str, args: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Thực thi một lời gọi công cụ từ model
+
+    Lỗi được trả về dưới dạng {'error': ...} để model tự xử lý thay vì
+    làm hỏng cả lượt hội thoại.
+
+    Args:
+        tools: Danh sách công cụ được phép
+        name: Tên công cụ model yêu cầu
+        args: Tham số model truyền vào
+
+    Returns:
+        Kết quả dạng dictionary
+    """
+    tool = next((t for t in tools if t.name == name), None)
+    if tool is None:
+        return {'error': f"Không có công cụ {name}"}
+    try:
+        return tool.function(**args)
+    except (TypeError, ValueError, ZeroDivisionError) as e:
+        return {'error': str(e)}
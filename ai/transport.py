@@ -0,0 +1,339 @@
+# ai/transport.py
+"""Lớp truyền tải cho các lời gọi AI: retry, giới hạn tốc độ và ngắt mạch"""
+
+import random
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional
+
+from src.config import (
+    AI_RATE_LIMIT_PER_MINUTE, AI_RATE_LIMIT_BURST, AI_RATE_LIMIT_TIMEOUT,
+    AI_MAX_ATTEMPTS, AI_RETRY_BASE_DELAY, AI_RETRY_MAX_DELAY,
+    AI_CIRCUIT_FAILURE_THRESHOLD, AI_CIRCUIT_RECOVERY_SECONDS
+)
+
+
+# Các loại lỗi trả về cho tầng giao diện
+ERROR_RATE_LIMITED = 'rate_limited'
+ERROR_UNAVAILABLE = 'unavailable'
+ERROR_TIMEOUT = 'timeout'
+ERROR_CIRCUIT_OPEN = 'circuit_open'
+ERROR_INVALID_REQUEST = 'invalid_request'
+ERROR_AUTH = 'auth'
+ERROR_UNKNOWN = 'unknown'
+
+RETRYABLE_ERRORS = {ERROR_RATE_LIMITED, ERROR_UNAVAILABLE, ERROR_TIMEOUT}
+
+ERROR_MESSAGES = {
+    ERROR_RATE_LIMITED: "Gemini đang giới hạn số lượng yêu cầu (quota). Vui lòng thử lại sau ít phút.",
+    ERROR_UNAVAILABLE: "Dịch vụ Gemini tạm thời không khả dụng.",
+    ERROR_TIMEOUT: "Gemini không phản hồi trong thời gian cho phép.",
+    ERROR_CIRCUIT_OPEN: "Tạm ngừng gọi Gemini do lỗi liên tiếp. Hệ thống sẽ tự thử lại sau.",
+    ERROR_INVALID_REQUEST: "Yêu cầu gửi tới Gemini không hợp lệ.",
+    ERROR_AUTH: "API key không hợp lệ hoặc không có quyền truy cập.",
+    ERROR_UNKNOWN: "Lỗi không xác định khi gọi Gemini.",
+}
+
+
+@dataclass
+class AIError:
+    """Lỗi có phân loại từ lời gọi AI"""
+    kind: str
+    message: str
+    status_code: Optional[int] = None
+
+    @property
+    def retryable(self) -> bool:
+        return self.kind in RETRYABLE_ERRORS
+
+    @property
+    def user_message(self) -> str:
+        """Thông báo tiếng Việt để hiển thị cho người dùng"""
+        return ERROR_MESSAGES.get(self.kind, ERROR_MESSAGES[ERROR_UNKNOWN])
+
+
+@dataclass
+class AIResult:
+    """Kết quả một lời gọi AI: nội dung hoặc lỗi có phân loại"""
+    text: str = ""
+    error: Optional[AIError] = None
+    attempts: int = 0
+    elapsed: float = 0.0
+    tool_calls: List[Dict] = field(default_factory=list)
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+def classify_error(exc: Exception) -> AIError:
+    """
+    Phân loại exception từ SDK/HTTP thành AIError
+
+    Dựa vào mã HTTP (thuộc tính `code` của google.api_core.exceptions)
+    nên không phụ thuộc trực tiếp vào SDK.
+
+    Args:
+        exc: Exception phát sinh khi gọi API
+
+    Returns:
+        AIError tương ứng
+    """
+    code = getattr(exc, 'code', None)
+    if not isinstance(code, int):
+        code = getattr(exc, 'status_code', None)
+    message = str(exc)
+
+    if isinstance(code, int):
+        if code == 429:
+            return AIError(ERROR_RATE_LIMITED, message, code)
+        if code in (401, 403):
+            return AIError(ERROR_AUTH, message, code)
+        if code in (408, 504):
+            return AIError(ERROR_TIMEOUT, message, code)
+        if code >= 500:
+            return AIError(ERROR_UNAVAILABLE, message, code)
+        if code >= 400:
+            return AIError(ERROR_INVALID_REQUEST, message, code)
+
+    if isinstance(exc, TimeoutError):
+        return AIError(ERROR_TIMEOUT, message)
+    if isinstance(exc, ConnectionError):
+        return AIError(ERROR_UNAVAILABLE, message)
+    return AIError(ERROR_UNKNOWN, message, code if isinstance(code, int) else None)
+
+
+class TokenBucket:
+    """Bộ giới hạn tốc độ token bucket, an toàn giữa các thread"""
+
+    def __init__(self, rate_per_minute: float, capacity: int,
+                 clock: Callable[[], float] = time.monotonic,
+                 sleep: Callable[[float], None] = time.sleep):
+        """
+        Khởi tạo token bucket
+
+        Args:
+            rate_per_minute: Số yêu cầu được nạp lại mỗi phút
+            capacity: Số yêu cầu tối đa được phép dồn (burst)
+            clock: Hàm thời gian (thay được khi test)
+            sleep: Hàm sleep (thay được khi test)
+        """
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity
+        self._clock = clock
+        self._sleep = sleep
+        self._tokens = float(capacity)
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = self._clock()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, timeout: Optional[float] = None) -> bool:
+        """
+        Lấy 1 token, chờ nếu cần
+
+        Args:
+            timeout: Thời gian chờ tối đa (giây), None = chờ vô hạn
+
+        Returns:
+            True nếu lấy được token, False nếu hết thời gian chờ
+        """
+        deadline = None if timeout is None else self._clock() + timeout
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return True
+                wait = (1 - self._tokens) / self.rate if self.rate > 0 else float('inf')
+
+            if deadline is not None:
+                remaining = deadline - self._clock()
+                if remaining <= 0 or wait > remaining:
+                    return False
+            # Ngủ ngoài lock để các thread khác vẫn kiểm tra được
+            self._sleep(wait)
+
+    def release(self):
+        """Trả lại token đã lấy nhưng không dùng (VD: yêu cầu bị ngắt mạch chặn)"""
+        with self._lock:
+            self._refill()
+            self._tokens = min(self.capacity, self._tokens + 1)
+
+
+class CircuitBreaker:
+    """Bộ ngắt mạch: fail-fast khi API lỗi liên tiếp"""
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold: int, recovery_timeout: float,
+                 clock: Callable[[], float] = time.monotonic):
+        """
+        Khởi tạo circuit breaker
+
+        Args:
+            failure_threshold: Số lỗi liên tiếp để mở mạch
+            recovery_timeout: Thời gian (giây) trước khi cho thử lại
+            clock: Hàm thời gian (thay được khi test)
+        """
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self._clock = clock
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._state == self.OPEN and self._clock() - self._opened_at >= self.recovery_timeout:
+                return self.HALF_OPEN
+            return self._state
+
+    def allow_request(self) -> bool:
+        """Kiểm tra có được phép gửi yêu cầu hay không"""
+        with self._lock:
+            if self._state == self.CLOSED:
+                return True
+            if self._state == self.OPEN:
+                if self._clock() - self._opened_at < self.recovery_timeout:
+                    return False
+                self._state = self.HALF_OPEN
+                self._trial_in_flight = False
+            # Half-open: chỉ cho một yêu cầu thử
+            if self._trial_in_flight:
+                return False
+            self._trial_in_flight = True
+            return True
+
+    def record_success(self):
+        """Ghi nhận yêu cầu thành công"""
+        with self._lock:
+            self._state = self.CLOSED
+            self._failures = 0
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        """Ghi nhận yêu cầu lỗi"""
+        with self._lock:
+            self._failures += 1
+            self._trial_in_flight = False
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                self._state = self.OPEN
+                self._opened_at = self._clock()
+
+
+@dataclass
+class RetryPolicy:
+    """Chính sách retry với exponential backoff và full jitter"""
+    max_attempts: int = AI_MAX_ATTEMPTS
+    base_delay: float = AI_RETRY_BASE_DELAY
+    max_delay: float = AI_RETRY_MAX_DELAY
+
+    def backoff(self, attempt: int) -> float:
+        """Thời gian chờ trước lần thử thứ attempt + 1 (attempt bắt đầu từ 1)"""
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** (attempt - 1))))
+
+
+class ResilientTransport:
+    """Thực thi lời gọi AI qua rate limiter, circuit breaker và retry"""
+
+    def __init__(self, rate_limiter: Optional[TokenBucket] = None,
+                 circuit_breaker: Optional[CircuitBreaker] = None,
+                 retry_policy: Optional[RetryPolicy] = None,
+                 rate_limit_timeout: float = AI_RATE_LIMIT_TIMEOUT,
+                 sleep: Callable[[float], None] = time.sleep):
+        self.rate_limiter = rate_limiter
+        self.circuit_breaker = circuit_breaker
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.rate_limit_timeout = rate_limit_timeout
+        self._sleep = sleep
+
+    def call(self, fn: Callable[[], str]) -> AIResult:
+        """
+        Gọi fn với retry/backoff, trả về kết quả có phân loại lỗi
+
+        Args:
+            fn: Hàm không tham số thực hiện lời gọi API, trả về text
+
+        Returns:
+            AIResult
+        """
+        start = time.monotonic()
+        error = None
+        attempt = 0
+
+        while attempt < self.retry_policy.max_attempts:
+            # Kiểm tra nhanh trước để không phải chờ rate limiter khi mạch đang mở
+            circuit_open = (self.circuit_breaker is not None
+                            and self.circuit_breaker.state == CircuitBreaker.OPEN)
+
+            if not circuit_open and self.rate_limiter \
+                    and not self.rate_limiter.acquire(timeout=self.rate_limit_timeout):
+                error = AIError(ERROR_RATE_LIMITED, "Vượt giới hạn tốc độ phía client")
+                break
+
+            if circuit_open or (self.circuit_breaker and not self.circuit_breaker.allow_request()):
+                # Mạch nửa mở với lượt thử đang chạy: token vừa lấy chưa được dùng.
+                # (Không hỏi circuit breaker trước: lượt thử đã nhận mà rate limiter
+                # hết thời gian chờ thì mạch kẹt ở trạng thái nửa mở.)
+                if not circuit_open and self.rate_limiter:
+                    self.rate_limiter.release()
+                # Giữ lỗi thật từ API nếu mạch vừa mở trong chính lời gọi này
+                if error is None:
+                    error = AIError(ERROR_CIRCUIT_OPEN, "Circuit breaker đang mở")
+                break
+
+            attempt += 1
+            try:
+                text = fn()
+            except Exception as e:
+                error = classify_error(e)
+                if error.retryable:
+                    if self.circuit_breaker:
+                        self.circuit_breaker.record_failure()
+                    if attempt < self.retry_policy.max_attempts:
+                        self._sleep(self.retry_policy.backoff(attempt))
+                    continue
+                if self.circuit_breaker:
+                    # Lỗi do yêu cầu (không phải do API sập) không tính vào ngắt mạch
+                    self.circuit_breaker.record_success()
+                break
+            else:
+                if self.circuit_breaker:
+                    self.circuit_breaker.record_success()
+                return AIResult(text=text, attempts=attempt, elapsed=time.monotonic() - start)
+
+        return AIResult(error=error, attempts=attempt, elapsed=time.monotonic() - start)
+
+
+_transports: Dict[str, ResilientTransport] = {}
+_transports_lock = threading.Lock()
+
+
+def get_shared_transport(name: str = 'gemini') -> ResilientTransport:
+    """
+    Lấy transport dùng chung trong process (mọi session chia sẻ quota)
+
+    Args:
+        name: Tên nhóm transport (mỗi nhà cung cấp một nhóm)
+
+    Returns:
+        ResilientTransport dùng chung
+    """
+    with _transports_lock:
+        if name not in _transports:
+            _transports[name] = ResilientTransport(
+                rate_limiter=TokenBucket(AI_RATE_LIMIT_PER_MINUTE, AI_RATE_LIMIT_BURST),
+                circuit_breaker=CircuitBreaker(AI_CIRCUIT_FAILURE_THRESHOLD,
+                                               AI_CIRCUIT_RECOVERY_SECONDS),
+            )
+        return _transports[name]
@@ -0,0 +1,513 @@
+#!/usr/bin/env python3
+# api_server.py
+"""
+API HTTP không giao diện cho hệ thống khác gọi logic thẩm định (không cần trình duyệt)
+
+Các endpoint (dữ liệu hồ sơ dạng JSON như bản ghi xuất hàng loạt: customer_info,
+loan_info, collateral_info, financial_info, ai_analysis tùy chọn):
+    GET  /health                      Trạng thái server, số yêu cầu đang xử lý
+    POST /v1/parse                    Body là nội dung file .docx -> dữ liệu hồ sơ trích xuất
+    POST /v1/calculate                Hồ sơ -> chỉ tiêu (+ lịch trả nợ, ?schedule=0 để bỏ)
+    POST /v1/export/{pdf|docx|excel}  Hồ sơ -> file báo cáo/bảng kê
+                                      (?include_charts=0&include_schedule=0&yearly_subtotals=0)
+    POST /v1/analyze                  Hồ sơ -> phân tích AI
+
+Đọc DOCX và xuất file chạy trên process pool; lời gọi AI (chờ mạng) chạy trên
+thread pool riêng, không chiếm process. Mỗi loại có giới hạn số yêu cầu nhận
+vào (vượt thì trả 503 kèm Retry-After) và thời gian chờ tối đa (vượt thì 504).
+
+Chạy:
+    python api_server.py [--host 127.0.0.1] [--port 8502] [--workers N]
+"""
+
+import argparse
+import asyncio
+import io
+import math
+import multiprocessing
+import os
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from datetime import date
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import quote
+
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response
+from starlette.routing import Route
+
+from export.batch import KIND_DOCX, KIND_EXCEL, KIND_PDF, document_filename
+from logic.case_data import (
+    build_analysis_data, build_loan_info, build_report_data, compute_case, normalize_case
+)
+from src.artifact_cache import get_artifact_cache, make_cache_key
+from src.config import (
+    API_AI_CONCURRENCY, API_AI_MAX_PENDING, API_AI_TIMEOUT, API_HOST, API_MAX_LOAN_TERM, API_MAX_UPLOAD_BYTES,
+    API_PENDING_PER_WORKER, API_PORT, API_REQUEST_TIMEOUT, API_WORKERS
+)
+
+# Loại file xuất: (MIME, loại kết quả trong cache)
+EXPORT_KINDS = {
+    KIND_PDF: ('application/pdf', 'pdf_report'),
+    KIND_DOCX: ('application/vnd.openxmlformats-officedocument.wordprocessingml.document', 'docx_report'),
+    KIND_EXCEL: ('application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', 'excel_schedule'),
+}
+
+# Module process con nạp trước khi server khởi động (đọc DOCX, xuất file, vẽ biểu đồ báo cáo)
+WORKER_MODULES = (
+    'src.docx_parser_v2',
+    'export.pdf_exporter',
+    'export.report_charts',
+    'export.docx_exporter',
+    'export.excel_exporter',
+)
+
+RETRY_AFTER_SECONDS = 1
+
+
+class ApiError(Exception):
+    """Lỗi trả về cho client dạng JSON {'error': ...} với mã HTTP tương ứng"""
+
+    def __init__(self, status_code: int, message: str, headers: Optional[Dict[str, str]] = None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.message = message
+        self.headers = headers
+
+
+def _overloaded(what: str) -> ApiError:
+    return ApiError(503, f"Server đang quá tải ({what}), vui lòng thử lại sau",
+                    {'Retry-After': str(RETRY_AFTER_SECONDS)})
+
+
+# ----- Việc chạy trong process con -----
+
+def warm_worker() -> Dict[str, str]:
+    """Nạp trước module, font và cache của process con; trả về lỗi (nếu có) theo bước"""
+    from src.warmup import Warmup
+
+    warmup = Warmup(WORKER_MODULES)
+    warmup.run()
+    return warmup.errors
+
+
+def parse_document(content: bytes) -> Dict[str, Any]:
+    """
+    Trích xuất dữ liệu hồ sơ từ nội dung file .docx (chỉ regex, không gửi đi đâu)
+
+    Args:
+        content: Nội dung file
+
+    Returns:
+        Kết quả DocxParserV2.parse_full_document()
+
+    Raises:
+        ValueError: File không đọc được
+    """
+    from src.docx_parser_v2 import DocxParserV2
+
+    try:
+        parser = DocxParserV2(io.BytesIO(content))
+    except Exception as e:
+        raise ValueError(str(e)) from None
+    return parser.parse_full_document()
+
+
+def render_document(kind: str, report_data: Dict, schedule: List[Dict],
+                    loan_info: Dict, options: Dict[str, bool]) -> bytes:
+    """
+    Render một file xuất
+
+    Args:
+        kind: KIND_PDF, KIND_DOCX hoặc KIND_EXCEL
+        report_data: Dữ liệu báo cáo (build_report_data)
+        schedule: Lịch trả nợ
+        loan_info: Thông tin khoản vay cho bảng kê Excel (build_loan_info)
+        options: include_charts, include_schedule, yearly_subtotals
+
+    Returns:
+        Nội dung file
+    """
+    if kind == KIND_PDF:
+        from export.pdf_exporter import PDFExporter
+        from export.report_charts import render_report_charts
+
+        chart_images = None
+        if options['include_charts']:
+            # Đã ở trong process con: vẽ tuần tự, không mở thêm process pool
+            chart_images = render_report_charts(report_data, schedule, parallel=False)
+        return PDFExporter().create_assessment_report(
+            report_data, schedule if options['include_schedule'] else None,
+            chart_images, options['yearly_subtotals']
+        ).getvalue()
+    if kind == KIND_DOCX:
+        from export.docx_exporter import DocxExporter
+
+        return DocxExporter().create_assessment_report(
+            report_data, schedule if options['include_schedule'] else None,
+            options['yearly_subtotals']
+        ).getvalue()
+    from export.excel_exporter import ExcelExporter
+
+    return ExcelExporter().create_payment_schedule_excel(schedule, loan_info).getvalue()
+
+
+def template_version(kind: str) -> str:
+    """Phiên bản mẫu của exporter (một phần của khóa cache)"""
+    if kind == KIND_PDF:
+        from export.pdf_exporter import TEMPLATE_VERSION
+    elif kind == KIND_DOCX:
+        # Gồm cả file mẫu của ngân hàng và thời điểm sửa file đó
+        from export.docx_exporter import template_fingerprint
+        return template_fingerprint()
+    else:
+        from export.excel_exporter import TEMPLATE_VERSION
+    return TEMPLATE_VERSION
+
+
+# ----- Giới hạn tải -----
+
+class WorkerPool:
+    """
+    Process pool cho việc nặng CPU, có giới hạn số yêu cầu nhận vào
+
+    Một yêu cầu được tính là đang xử lý cho đến khi process con thực sự xong
+    (kể cả khi client đã nhận 504), để việc quá hạn vẫn còn chạy không bị
+    nhận thêm việc chồng lên. Chỉ dùng từ event loop của server.
+    """
+
+    def __init__(self, workers: int = API_WORKERS,
+                 max_pending: Optional[int] = None):
+        """
+        Khởi tạo
+
+        Args:
+            workers: Số process
+            max_pending: Số yêu cầu tối đa (đang chạy + chờ), mặc định
+                workers * API_PENDING_PER_WORKER
+        """
+        self.workers = workers
+        self.max_pending = max_pending or workers * API_PENDING_PER_WORKER
+        self.in_flight = 0
+        # 'spawn': không fork process server đang chạy event loop và nhiều thread
+        self.executor = ProcessPoolExecutor(max_workers=workers,
+                                            mp_context=multiprocessing.get_context('spawn'))
+
+    def _release(self, _future: Future):
+        self.in_flight -= 1
+
+    async def run(self, fn: Callable, *args: Any, timeout: float = API_REQUEST_TIMEOUT) -> Any:
+        """
+        Chạy fn(*args) trong process con
+
+        Raises:
+            ApiError: 503 khi đã đủ yêu cầu, 504 khi quá thời gian
+        """
+        if self.in_flight >= self.max_pending:
+            raise _overloaded('xử lý file')
+        loop = asyncio.get_running_loop()
+        self.in_flight += 1
+        future = self.executor.submit(fn, *args)
+        future.add_done_callback(lambda f: loop.call_soon_threadsafe(self._release, f))
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), timeout)
+        except asyncio.TimeoutError:
+            # Còn trong hàng chờ thì bỏ luôn; đang chạy thì process con tự xong
+            future.cancel()
+            raise ApiError(504, f"Quá thời gian xử lý ({timeout:.0f} giây)") from None
+
+    def warm(self) -> List[Future]:
+        """Khởi động sẵn mọi process con và nạp trước module (không chờ)"""
+        return [self.executor.submit(warm_worker) for _ in range(self.workers)]
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+class AIGate:
+    """
+    Đường chạy lời gọi AI: thread pool riêng, giới hạn số lời gọi đồng thời và đang chờ
+
+    Lời gọi AI chủ yếu chờ mạng nên chạy trên thread, event loop vẫn nhận
+    yêu cầu khác. Thread không hủy được: lời gọi quá hạn vẫn chạy (và giữ
+    lượt) tới khi transport trả về (có timeout riêng), chỉ client nhận 504 sớm.
+    """
+
+    def __init__(self, concurrency: int = API_AI_CONCURRENCY,
+                 max_pending: int = API_AI_MAX_PENDING):
+        self.concurrency = concurrency
+        self.max_pending = max_pending
+        self.in_flight = 0
+        self.waiting = 0
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self.executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='cadap-api-ai')
+
+    def _release(self, _future: Future):
+        self.in_flight -= 1
+        self._semaphore.release()
+
+    async def run(self, fn: Callable, *args: Any, timeout: float = API_AI_TIMEOUT) -> Any:
+        """
+        Chạy fn(*args) trên thread pool khi tới lượt
+
+        Raises:
+            ApiError: 503 khi hàng chờ đã đầy, 504 khi quá thời gian (tính cả thời gian chờ lượt)
+        """
+        if self._semaphore.locked() and self.waiting >= self.max_pending:
+            raise _overloaded('phân tích AI')
+        loop = asyncio.get_running_loop()
+
+        async def call():
+            self.waiting += 1
+            try:
+                await self._semaphore.acquire()
+            finally:
+                self.waiting -= 1
+            self.in_flight += 1
+            # Trả lượt khi thread thực sự xong, không phải khi client hết chờ:
+            # lời gọi quá hạn vẫn giữ lượt nên giới hạn đồng thời luôn đúng
+            future = self.executor.submit(fn, *args)
+            future.add_done_callback(lambda f: loop.call_soon_threadsafe(self._release, f))
+            return await asyncio.wrap_future(future)
+
+        try:
+            return await asyncio.wait_for(call(), timeout)
+        except asyncio.TimeoutError:
+            raise ApiError(504, f"Quá thời gian phân tích AI ({timeout:.0f} giây)") from None
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+def create_ai_client():
+    """GeminiClient dùng chung cho mọi yêu cầu (None nếu backend cần API key mà chưa đặt GEMINI_API_KEY)"""
+    from ai.backends import requires_api_key
+    from ai.gemini_client import GeminiClient
+
+    api_key = os.environ.get('GEMINI_API_KEY', '')
+    if requires_api_key() and not api_key.strip():
+        return None
+    return GeminiClient(api_key)
+
+
+# ----- Đọc yêu cầu -----
+
+def _flag(request: Request, name: str, default: bool = True) -> bool:
+    """Tham số bật/tắt trên query string (0/false/no là tắt)"""
+    value = request.query_params.get(name)
+    if value is None:
+        return default
+    return value.strip().lower() not in ('0', 'false', 'no', 'off', '')
+
+
+def _check_finite(case: Dict[str, Any]):
+    """
+    Mọi giá trị số của hồ sơ phải hữu hạn
+
+    Module json nhận NaN/Infinity; để lọt qua thì phép so sánh giới hạn
+    luôn sai và JSONResponse không mã hóa được kết quả (lỗi 500).
+
+    Raises:
+        ValueError: Khi có giá trị NaN hoặc vô cùng
+    """
+    for section, values in case.items():
+        if not isinstance(values, dict):
+            continue
+        for name, value in values.items():
+            if isinstance(value, float) and not math.isfinite(value):
+                raise ValueError(f"{section}.{name} phải là số hữu hạn")
+
+
+async def read_case(request: Request) -> Tuple[Dict[str, Any], Dict[str, Any], List[Dict[str, float]]]:
+    """
+    Đọc hồ sơ JSON từ body, chuẩn hóa và tính chỉ tiêu (nhanh, chạy ngay trên event loop)
+
+    Thời hạn vay bị giới hạn (API_MAX_LOAN_TERM) để lịch trả nợ luôn nhỏ,
+    một yêu cầu không thể giữ event loop lâu.
+
+    Returns:
+        (hồ sơ đã chuẩn hóa, tóm tắt chỉ tiêu, lịch trả nợ)
+
+    Raises:
+        ApiError: 400 khi dữ liệu không hợp lệ
+    """
+    try:
+        record = await request.json()
+    except ValueError:
+        raise ApiError(400, "Body phải là JSON") from None
+    if not isinstance(record, dict):
+        raise ApiError(400, "Hồ sơ phải là một đối tượng JSON")
+    try:
+        case = normalize_case(record)
+        _check_finite(case)
+        loan_info = case['loan_info']
+        if loan_info['loan_amount'] <= 0:
+            raise ValueError("loan_info.loan_amount phải lớn hơn 0")
+        if not 1 <= loan_info['loan_term'] <= API_MAX_LOAN_TERM:
+            raise ValueError(f"loan_info.loan_term phải từ 1 đến {API_MAX_LOAN_TERM} tháng")
+        if not 0 <= loan_info['interest_rate'] <= 100:
+            raise ValueError("loan_info.interest_rate phải từ 0 đến 100 (%/năm)")
+        summary, schedule = compute_case(case)
+    except (TypeError, ValueError, ZeroDivisionError) as e:
+        raise ApiError(400, f"Dữ liệu hồ sơ không hợp lệ: {e}") from None
+    return case, summary, schedule
+
+
+async def read_upload(request: Request, limit: int = API_MAX_UPLOAD_BYTES) -> bytes:
+    """
+    Đọc body file tải lên, dừng ngay khi vượt giới hạn dung lượng
+
+    Raises:
+        ApiError: 413 khi quá lớn, 400 khi rỗng
+    """
+    too_large = ApiError(413, f"File vượt quá {limit // (1024 * 1024)} MB")
+    declared = request.headers.get('content-length')
+    if declared and declared.isdigit() and int(declared) > limit:
+        raise too_large
+    chunks = []
+    size = 0
+    async for chunk in request.stream():
+        size += len(chunk)
+        if size > limit:
+            raise too_large
+        chunks.append(chunk)
+    if not size:
+        raise ApiError(400, "Body rỗng, cần gửi nội dung file .docx")
+    return b''.join(chunks)
+
+
+# ----- Endpoint -----
+
+async def health(request: Request) -> JSONResponse:
+    state = request.app.state
+    stats = get_artifact_cache().stats()
+    return JSONResponse({
+        'status': 'ok',
+        'workers': state.pool.workers,
+        'cpu_in_flight': state.pool.in_flight,
+        'cpu_max_pending': state.pool.max_pending,
+        'ai_in_flight': state.ai.in_flight,
+        'ai_waiting': state.ai.waiting,
+        'ai_enabled': state.ai_client is not None,
+        'cache_entries': stats.entries,
+        'cache_hits': stats.hits,
+    })
+
+
+async def parse(request: Request) -> JSONResponse:
+    content = await read_upload(request)
+    try:
+        parsed = await request.app.state.pool.run(parse_document, content)
+    except ValueError as e:
+        raise ApiError(400, str(e)) from None
+    if not _flag(request, 'include_text', default=False):
+        parsed.pop('raw_text', None)
+    return JSONResponse(parsed)
+
+
+async def calculate(request: Request) -> JSONResponse:
+    _, summary, schedule = await read_case(request)
+    result = {'summary': summary}
+    if _flag(request, 'schedule'):
+        result['schedule'] = schedule
+    return JSONResponse(result)
+
+
+async def export(request: Request) -> Response:
+    kind = request.path_params['kind']
+    if kind not in EXPORT_KINDS:
+        raise ApiError(404, f"Loại file không hỗ trợ: {kind} (chọn {', '.join(EXPORT_KINDS)})")
+    case, summary, schedule = await read_case(request)
+    media_type, cache_kind = EXPORT_KINDS[kind]
+    report_data = build_report_data(case, summary)
+    loan_info = build_loan_info(case)
+    options = {
+        'include_charts': _flag(request, 'include_charts'),
+        'include_schedule': _flag(request, 'include_schedule'),
+        'yearly_subtotals': _flag(request, 'yearly_subtotals'),
+    }
+
+    # Khóa gồm mọi đầu vào của file (như tab Xuất file), tra cache trước khi giao cho process con
+    if kind == KIND_EXCEL:
+        inputs = (schedule, loan_info)
+    else:
+        inputs = (report_data, schedule, options, date.today().isoformat())
+    cache = get_artifact_cache()
+    cache_key = make_cache_key(f'api_{cache_kind}', template_version(kind), *inputs)
+    content = cache.get(cache_key)
+    cached = content is not None
+    if not cached:
+        content = await request.app.state.pool.run(
+            render_document, kind, report_data, schedule, loan_info, options
+        )
+        cache.put(cache_key, content)
+
+    # Bỏ số thứ tự hồ sơ trong lô ở đầu tên file
+    filename = document_filename(1, case['customer_info']['name'], kind).split('_', 1)[1]
+    return Response(content, media_type=media_type, headers={
+        'Content-Disposition': f"attachment; filename*=UTF-8''{quote(filename)}",
+        'X-Cache': 'hit' if cached else 'miss',
+    })
+
+
+async def analyze(request: Request) -> JSONResponse:
+    client = request.app.state.ai_client
+    if client is None:
+        raise ApiError(503, "Chưa cấu hình AI (đặt GEMINI_API_KEY hoặc CADAP_AI_BACKEND=local)")
+    case, summary, _ = await read_case(request)
+    result = await request.app.state.ai.run(client.analyze_from_data, build_analysis_data(case, summary))
+    if not result.ok:
+        status = 503 if result.error.retryable else 502
+        raise ApiError(status, result.error.user_message)
+    return JSONResponse({'analysis': result.text, 'attempts': result.attempts,
+                         'elapsed': round(result.elapsed, 3)})
+
+
+async def handle_api_error(request: Request, exc: ApiError) -> JSONResponse:
+    return JSONResponse({'error': exc.message}, status_code=exc.status_code, headers=exc.headers)
+
+
+@asynccontextmanager
+async def lifespan(app: Starlette):
+    app.state.pool = WorkerPool(getattr(app.state, 'workers', API_WORKERS))
+    app.state.ai = AIGate()
+    app.state.ai_client = create_ai_client()
+    app.state.pool.warm()
+    try:
+        yield
+    finally:
+        app.state.ai.shutdown()
+        app.state.pool.shutdown()
+
+
+app = Starlette(
+    routes=[
+        Route('/health', health, methods=['GET']),
+        Route('/v1/parse', parse, methods=['POST']),
+        Route('/v1/calculate', calculate, methods=['POST']),
+        Route('/v1/export/{kind}', export, methods=['POST']),
+        Route('/v1/analyze', analyze, methods=['POST']),
+    ],
+    exception_handlers={ApiError: handle_api_error},
+    lifespan=lifespan,
+)
+
+
+def main():
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--host', default=API_HOST)
+    parser.add_argument('--port', type=int, default=API_PORT)
+    parser.add_argument('--workers', type=int, default=None,
+                        help='Số process đọc DOCX/xuất file (mặc định: CADAP_API_WORKERS hoặc số CPU)')
+    args = parser.parse_args()
+    if args.workers:
+        # Đọc trong lifespan khi tạo pool
+        app.state.workers = args.workers
+    uvicorn.run(app, host=args.host, port=args.port)
+
+
+if __name__ == '__main__':
+    main()
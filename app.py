@@ -10,15 +10,22 @@ import os
 # Thêm thư mục gốc vào Python path
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
-from src.config import DEFAULT_TEXTS
+from src.config import DEFAULT_TEXTS, AI_JOB_POLL_SECONDS, CASE_BRANCH
 from src.utils import format_number, parse_number, validate_phone, validate_cccd
-from src.docx_parser import DocxParser
-from logic.financial_calculator import FinancialCalculator
 from ai.gemini_client import get_gemini_client
-from export.excel_exporter import ExcelExporter
-from export.pdf_exporter import PDFExporter
-from ui.chart_generator import ChartGenerator
+from ai.backends import requires_api_key
+from src.jobs import get_job_runner, JobQueueFullError, STATUS_FAILED
+from logic.case_data import build_calculator
+from logic.case_model import CaseModel, DOCUMENT_SECTION
+from src.artifact_cache import get_artifact_cache, make_cache_key
+from src.case_store import get_case_store, analysis_basis, RISK_LEVELS
+from src.warmup import start_warmup
+from export.batch import generate_report_zip, KIND_PDF, KIND_DOCX, KIND_EXCEL
+# Các module nặng (matplotlib, altair, reportlab, openpyxl, python-docx, pyarrow) được
+# import trong hàm dùng đến chúng, và được nạp trước bằng luồng nền (src/warmup.py)
 import tempfile
+from datetime import date
+import json
 
 
 # Cấu hình trang
@@ -88,44 +95,42 @@ def initialize_session_state():
     if 'data_loaded' not in st.session_state:
         st.session_state.data_loaded = False
     
-    if 'raw_file_content' not in st.session_state:
-        st.session_state.raw_file_content = ""
-    
     if 'data_modified' not in st.session_state:
         st.session_state.data_modified = False
     
-    if 'customer_info' not in st.session_state:
-        st.session_state.customer_info = {
-            'name': '', 'cccd': '', 'address': '', 'phone': ''
-        }
-    
-    if 'loan_info' not in st.session_state:
-        st.session_state.loan_info = {
-            'purpose': 'Kinh doanh',
-            'total_need': 0.0,
-            'equity': 0.0,
-            'loan_amount': 0.0,
-            'equity_ratio': 0.0,
-            'interest_rate': 8.5,
-            'loan_term': 120,
-            'payment_frequency': 'Tháng'
-        }
+    # Hồ sơ và các giá trị dẫn xuất (chỉ tiêu, lịch trả nợ, dữ liệu báo cáo/AI)
+    if 'case_model' not in st.session_state:
+        st.session_state.case_model = CaseModel({
+            'customer_info': {
+                'name': '', 'cccd': '', 'address': '', 'phone': ''
+            },
+            'loan_info': {
+                'purpose': 'Kinh doanh',
+                'total_need': 0.0,
+                'equity': 0.0,
+                'loan_amount': 0.0,
+                'equity_ratio': 0.0,
+                'interest_rate': 8.5,
+                'loan_term': 120,
+                'payment_frequency': 'Tháng'
+            },
+            'collateral_info': {
+                'asset_type': 'Bất động sản',
+                'market_value': 0.0,
+                'asset_address': '',
+                'ltv': 70.0,
+                'legal_docs': 'Sổ đỏ'
+            },
+            'financial_info': {
+                'monthly_income': 0.0,
+                'monthly_expense': 0.0,
+                'other_debt': 0.0
+            },
+        })
     
-    if 'collateral_info' not in st.session_state:
-        st.session_state.collateral_info = {
-            'asset_type': 'Bất động sản',
-            'market_value': 0.0,
-            'asset_address': '',
-            'ltv': 70.0,
-            'legal_docs': 'Sổ đỏ'
-        }
-    
-    if 'financial_info' not in st.session_state:
-        st.session_state.financial_info = {
-            'monthly_income': 0.0,
-            'monthly_expense': 0.0,
-            'other_debt': 0.0
-        }
+    # Các nhóm dữ liệu là dictionary của case model (chỉ đọc, sửa qua case_model().set/load)
+    for section in ('customer_info', 'loan_info', 'collateral_info', 'financial_info'):
+        st.session_state[section] = st.session_state.case_model.sections[section]
     
     if 'chat_history' not in st.session_state:
         st.session_state.chat_history = []
@@ -135,6 +140,273 @@ def initialize_session_state():
     
     if 'data_analysis' not in st.session_state:
         st.session_state.data_analysis = ""
+    
+    # Job ID của các tác vụ AI đang chạy nền, theo loại tác vụ
+    if 'ai_jobs' not in st.session_state:
+        st.session_state.ai_jobs = {}
+    
+    if 'ai_errors' not in st.session_state:
+        st.session_state.ai_errors = {}
+    
+    # Revision của dữ liệu nguồn mà mỗi phân tích AI dựa vào (để biết phân tích đã cũ)
+    if 'ai_basis' not in st.session_state:
+        st.session_state.ai_basis = {}
+        st.session_state.ai_pending_basis = {}
+    
+    # Nguồn gốc/độ tin cậy từng trường trích xuất từ file
+    if 'field_meta' not in st.session_state:
+        st.session_state.field_meta = {}
+    
+    # Trích xuất bổ sung bằng AI: giá trị lúc gửi của các trường chờ AI điền, các trường AI đã điền
+    if 'extraction_pending' not in st.session_state:
+        st.session_state.extraction_pending = None
+        st.session_state.extraction_filled = []
+    
+    # ID hồ sơ trong kho (None: chưa lưu); hồ sơ đã lưu được tự động lưu khi sửa
+    if 'case_id' not in st.session_state:
+        st.session_state.case_id = None
+        st.session_state.case_store_error = ""
+
+
+def render_extraction_sources():
+    """Liệt kê các trường không trích xuất trực tiếp được từ file (mặc định/AI/độ tin cậy thấp)"""
+    from src.docx_parser_v2 import SOURCE_REGEX, SOURCE_AI
+    from ai.extraction import FIELD_SPECS
+    
+    field_meta = st.session_state.field_meta
+    rows = []
+    for field, spec in FIELD_SPECS.items():
+        meta = field_meta.get(field)
+        if meta is None or (meta['source'] == SOURCE_REGEX and meta['confidence'] >= 0.9):
+            continue
+        source = {SOURCE_REGEX: 'File', SOURCE_AI: 'AI'}.get(meta['source'], 'Mặc định')
+        rows.append({
+            'Trường': spec['label'],
+            'Nguồn': source,
+            'Độ tin cậy': f"{meta['confidence']:.0%}",
+            'Đoạn gốc': meta['snippet'][:120]
+        })
+    
+    if rows:
+        with st.expander(f"🔎 {len(rows)} trường cần kiểm tra lại (không trích xuất chắc chắn từ file)"):
+            st.dataframe(rows, use_container_width=True, hide_index=True)
+
+
+# Nút/đầu vào của case model mà mỗi loại phân tích AI dựa vào
+AI_ANALYSIS_BASIS = {
+    'file_analysis': f'{DOCUMENT_SECTION}.raw_text',
+    'data_analysis': 'analysis_data',
+}
+
+
+def case_model() -> CaseModel:
+    """Hồ sơ đang làm việc của session"""
+    return st.session_state.case_model
+
+
+def reset_case_widgets():
+    """Bỏ giá trị cũ của các ô nhập liệu để hiển thị hồ sơ vừa nạp"""
+    for key in [key for key in st.session_state if str(key).startswith('input_')]:
+        del st.session_state[key]
+
+
+def save_current_case(**fields):
+    """
+    Lưu hồ sơ đang làm việc vào kho (tạo mới nếu chưa lưu)
+    
+    Args:
+        **fields: branch, source_file (xem CaseStore.save)
+    """
+    model = case_model()
+    try:
+        st.session_state.case_id = get_case_store().save(
+            model.sections, model.get('summary'), case_id=st.session_state.case_id,
+            field_meta=st.session_state.field_meta, **fields
+        )
+        st.session_state.case_store_error = ""
+    except KeyError:
+        # Hồ sơ đã bị xóa khỏi kho: lưu thành hồ sơ mới
+        st.session_state.case_id = None
+        save_current_case(**fields)
+    except Exception as e:
+        st.session_state.case_store_error = str(e)
+
+
+def save_case_analysis(kind: str):
+    """Lưu phân tích AI vào hồ sơ đã lưu, kèm hash dữ liệu nguồn (rỗng nếu phân tích đã cũ)"""
+    if st.session_state.case_id is None:
+        return
+    basis = '' if is_analysis_stale(kind) else analysis_basis(case_model().value(AI_ANALYSIS_BASIS[kind]))
+    try:
+        get_case_store().save_analysis(st.session_state.case_id, kind, st.session_state[kind], basis)
+    except Exception as e:
+        st.session_state.case_store_error = str(e)
+
+
+def open_stored_case(case_id: int) -> bool:
+    """
+    Mở hồ sơ đã lưu thay cho hồ sơ đang làm việc
+    
+    Phân tích AI đã lưu được khôi phục; phân tích lưu từ dữ liệu khác dữ
+    liệu hiện tại được đánh dấu là đã cũ.
+    
+    Returns:
+        False nếu hồ sơ không còn trong kho
+    """
+    stored = get_case_store().load(case_id)
+    if stored is None:
+        return False
+    
+    model = case_model()
+    model.load({DOCUMENT_SECTION: {}, **stored.sections})
+    reset_case_widgets()
+    st.session_state.case_id = stored.id
+    st.session_state.field_meta = stored.field_meta
+    st.session_state.data_loaded = True
+    st.session_state.data_modified = False
+    st.session_state.chat_history = []
+    st.session_state.ai_jobs.pop('extraction', None)
+    st.session_state.ai_errors.pop('extraction', None)
+    st.session_state.extraction_pending = None
+    st.session_state.extraction_filled = []
+    
+    for kind, basis_name in AI_ANALYSIS_BASIS.items():
+        # Kết quả tác vụ AI của hồ sơ trước không áp vào hồ sơ này
+        st.session_state.ai_jobs.pop(kind, None)
+        st.session_state.ai_errors.pop(kind, None)
+        analysis = stored.analyses.get(kind)
+        st.session_state[kind] = analysis.text if analysis else ""
+        if analysis is None:
+            st.session_state.ai_basis.pop(kind, None)
+        elif analysis.basis and analysis.basis == analysis_basis(model.value(basis_name)):
+            st.session_state.ai_basis[kind] = model.revision(basis_name)
+        else:
+            st.session_state.ai_basis[kind] = -1
+    return True
+
+
+def submit_ai_job(kind: str, fn, *args):
+    """Đưa lời gọi AI vào hàng đợi chạy nền, lưu job ID vào session"""
+    try:
+        job_id = get_job_runner().submit(kind, fn, *args)
+    except JobQueueFullError as e:
+        st.error(f"❌ {str(e)}")
+        return False
+    
+    st.session_state.ai_jobs[kind] = job_id
+    st.session_state.ai_errors.pop(kind, None)
+    if kind in AI_ANALYSIS_BASIS:
+        st.session_state.ai_pending_basis[kind] = case_model().revision(AI_ANALYSIS_BASIS[kind])
+    return True
+
+
+def submit_extraction_job(parsed: dict, paragraphs: list, api_key: str):
+    """
+    Nhờ AI điền các trường parser bỏ sót bằng tác vụ chạy nền
+    
+    Chỉ gửi đoạn trích liên quan, file đầy đủ không gửi đi đâu. Giá trị
+    parser đọc được ghi lại để khi có kết quả chỉ điền vào trường người
+    dùng chưa sửa.
+    """
+    from ai.extraction import build_response_schema, plan_extraction
+    
+    st.session_state.ai_jobs.pop('extraction', None)
+    st.session_state.ai_errors.pop('extraction', None)
+    st.session_state.extraction_pending = None
+    st.session_state.extraction_filled = []
+    
+    client = get_gemini_client(api_key)
+    if not client:
+        return
+    fields, excerpt = plan_extraction(parsed, paragraphs)
+    if not fields:
+        return
+    
+    if submit_ai_job('extraction', client.extract_fields, excerpt, build_response_schema(fields)):
+        st.session_state.extraction_pending = {field: case_model().value(field) for field in fields}
+
+
+def apply_extracted_fields(result):
+    """Ghép kết quả tác vụ trích xuất vào hồ sơ, bỏ qua trường đã được sửa trong lúc chờ"""
+    from ai.extraction import FIELD_SPECS, merge_extracted, parse_extraction
+    
+    pending = st.session_state.extraction_pending or {}
+    st.session_state.extraction_pending = None
+    model = case_model()
+    fields = [field for field, value in pending.items() if model.value(field) == value]
+    if not fields:
+        return
+    
+    parsed = {section: dict(values) for section, values in model.sections.items()}
+    parsed['field_meta'] = dict(st.session_state.field_meta)
+    filled = merge_extracted(parsed, parse_extraction(result.text), fields)
+    for field in filled:
+        section, name = field.split('.', 1)
+        model.set(section, name, parsed[section][name])
+    if not filled:
+        return
+    
+    st.session_state.field_meta = parsed['field_meta']
+    st.session_state.extraction_filled = [FIELD_SPECS[field]['label'] for field in filled]
+    reset_case_widgets()
+    if st.session_state.case_id is not None:
+        save_current_case()
+
+
+def is_analysis_stale(kind: str) -> bool:
+    """Phân tích AI được tạo từ dữ liệu nay đã thay đổi"""
+    basis = st.session_state.ai_basis.get(kind)
+    return basis is not None and basis != case_model().revision(AI_ANALYSIS_BASIS[kind])
+
+
+def collect_ai_jobs():
+    """Chuyển kết quả các tác vụ AI đã xong vào session state"""
+    runner = get_job_runner()
+    
+    for kind, job_id in list(st.session_state.ai_jobs.items()):
+        job = runner.get(job_id)
+        if job is not None and not job.finished:
+            continue
+        
+        del st.session_state.ai_jobs[kind]
+        
+        if job is None:
+            st.session_state.ai_errors[kind] = "Kết quả tác vụ đã hết hạn, vui lòng chạy lại"
+        elif job.status == STATUS_FAILED:
+            st.session_state.ai_errors[kind] = job.error
+        elif not job.result.ok:
+            st.session_state.ai_errors[kind] = job.result.error.user_message
+        elif kind == 'extraction':
+            apply_extracted_fields(job.result)
+        elif kind == 'chat':
+            st.session_state.chat_history.append({
+                'role': 'assistant',
+                'content': job.result.text,
+                'tool_calls': job.result.tool_calls
+            })
+        else:
+            st.session_state[kind] = job.result.text
+            st.session_state.ai_basis[kind] = st.session_state.ai_pending_basis.get(kind)
+            save_case_analysis(kind)
+        
+        # Bỏ tin nhắn chưa được trả lời để người dùng gửi lại
+        if kind == 'chat' and kind in st.session_state.ai_errors:
+            if st.session_state.chat_history and st.session_state.chat_history[-1]['role'] == 'user':
+                st.session_state.chat_history.pop()
+
+
+@st.fragment(run_every=AI_JOB_POLL_SECONDS)
+def render_ai_job_monitor():
+    """Theo dõi tác vụ AI nền, tải lại giao diện khi có tác vụ hoàn tất"""
+    if not st.session_state.ai_jobs:
+        return
+    
+    running = set(st.session_state.ai_jobs)
+    collect_ai_jobs()
+    if set(st.session_state.ai_jobs) != running:
+        st.rerun()
+    
+    st.caption(f"⏳ Đang xử lý {len(running)} tác vụ AI chạy nền - bạn có thể tiếp tục làm việc ở các tab khác")
 
 
 def render_sidebar():
@@ -151,7 +423,9 @@ def render_sidebar():
         
         st.session_state.api_key = api_key
         
-        if api_key:
+        if not requires_api_key():
+            st.info("ℹ️ Đang dùng backend AI local (giả lập, không cần API key)")
+        elif api_key:
             st.success("✅ API key đã được cấu hình")
         else:
             st.warning("⚠️ Vui lòng nhập API key để sử dụng tính năng AI")
@@ -175,19 +449,31 @@ def render_sidebar():
                         tmp_path = tmp_file.name
                     
                     try:
+                        from src.docx_parser_v2 import DocxParserV2
+                        
                         # Parse file
-                        parser = DocxParser(tmp_path)
+                        parser = DocxParserV2(tmp_path)
                         parsed_data = parser.parse_full_document()
                         
-                        # Cập nhật session state
-                        st.session_state.customer_info = parsed_data['customer_info']
-                        st.session_state.loan_info = parsed_data['loan_info']
-                        st.session_state.collateral_info = parsed_data['collateral_info']
-                        st.session_state.financial_info = parsed_data['financial_info']
-                        st.session_state.raw_file_content = parsed_data['raw_text']
+                        # Cập nhật hồ sơ (các giá trị dẫn xuất tự tính lại khi được đọc)
+                        reset_case_widgets()
+                        case_model().load({
+                            'customer_info': parsed_data['customer_info'],
+                            'loan_info': parsed_data['loan_info'],
+                            'collateral_info': parsed_data['collateral_info'],
+                            'financial_info': parsed_data['financial_info'],
+                            DOCUMENT_SECTION: {'raw_text': parsed_data['raw_text']},
+                        })
+                        st.session_state.field_meta = parsed_data['field_meta']
                         st.session_state.data_loaded = True
                         st.session_state.data_modified = False
                         
+                        # Mỗi file tải lên là một hồ sơ mới trong kho
+                        st.session_state.case_id = None
+                        save_current_case(branch=st.session_state.get('case_branch', CASE_BRANCH),
+                                          source_file=uploaded_file.name)
+                        submit_extraction_job(parsed_data, parser.paragraphs, api_key)
+                        
                         st.success("✅ Đã trích xuất dữ liệu thành công!")
                         st.rerun()
                     except Exception as e:
@@ -197,6 +483,17 @@ def render_sidebar():
                         if os.path.exists(tmp_path):
                             os.unlink(tmp_path)
         
+        if 'extraction' in st.session_state.ai_jobs:
+            st.caption("⏳ AI đang điền các trường không đọc được từ file...")
+        elif 'extraction' in st.session_state.ai_errors:
+            st.warning(f"⚠️ Không trích xuất bổ sung được bằng AI: {st.session_state.ai_errors['extraction']}")
+        elif st.session_state.extraction_filled:
+            st.info(f"🤖 AI đã điền {len(st.session_state.extraction_filled)} trường: "
+                    f"{', '.join(st.session_state.extraction_filled)} - vui lòng kiểm tra lại")
+        
+        st.markdown("---")
+        render_case_store()
+        
         st.markdown("---")
         st.markdown("### ℹ️ Hướng Dẫn")
         st.info("""
@@ -208,6 +505,106 @@ def render_sidebar():
         """)
 
 
+@st.fragment(key='case_store')
+def render_case_store():
+    """Lưu hồ sơ đang làm việc, tìm và mở lại hồ sơ đã lưu"""
+    st.markdown("### 🗂️ Hồ Sơ Đã Lưu")
+    
+    if st.session_state.case_id is not None:
+        st.caption(f"Đang mở hồ sơ #{st.session_state.case_id} - mọi chỉnh sửa được lưu tự động")
+    st.text_input("Chi nhánh", value=CASE_BRANCH, key='case_branch')
+    if st.button("💾 Lưu hồ sơ", use_container_width=True):
+        save_current_case(branch=st.session_state.case_branch)
+        if not st.session_state.case_store_error:
+            st.success(f"✅ Đã lưu hồ sơ #{st.session_state.case_id}")
+    if st.session_state.case_store_error:
+        st.error(f"❌ Lỗi lưu hồ sơ: {st.session_state.case_store_error}")
+    
+    query = st.text_input("🔍 Tìm theo tên hoặc CCCD", key='case_search')
+    risk_level = st.selectbox("Mức rủi ro", ('Tất cả',) + RISK_LEVELS, key='case_search_risk')
+    try:
+        results = get_case_store().search(query, risk_level=None if risk_level == 'Tất cả' else risk_level)
+    except Exception as e:
+        st.error(f"❌ Không đọc được kho hồ sơ: {str(e)}")
+        return
+    
+    if not results:
+        st.caption("Không có hồ sơ phù hợp")
+        return
+    
+    selected = st.selectbox(
+        f"Kết quả ({len(results)})",
+        results,
+        format_func=lambda c: f"#{c.id} · {c.customer_name} · {c.cccd or '—'} · "
+                              f"{format_number(c.loan_amount)} đ · {c.updated_at[:10]}",
+        key='case_search_result'
+    )
+    if st.button("📂 Mở hồ sơ", use_container_width=True):
+        if open_stored_case(selected.id):
+            st.rerun()
+        st.error("❌ Hồ sơ không còn trong kho")
+
+
+# Fragment (khóa) phải chạy lại khi sửa một nhóm dữ liệu: tab chứa/hiển thị trực tiếp
+# các trường của nhóm, và tab hiển thị các nút dẫn xuất bị ảnh hưởng (case model)
+SECTION_FRAGMENTS = {
+    'customer_info': ('data_status', 'tab_customer'),
+    'loan_info': ('data_status', 'tab_loan', 'tab_collateral'),
+    'collateral_info': ('data_status', 'tab_collateral'),
+    'financial_info': ('data_status', 'tab_financial'),
+}
+NODE_FRAGMENTS = {
+    'summary': ('tab_financial',),
+    'chart_data': ('tab_charts',),
+    'analysis_data': ('tab_ai', 'tab_export'),
+}
+
+
+def on_case_field_change(section: str, field: str, widget_key: str):
+    """
+    Callback của các ô nhập liệu hồ sơ: cập nhật case model và chỉ chạy lại
+    các tab phụ thuộc vào trường vừa sửa
+    
+    Args:
+        section: Nhóm dữ liệu (VD: 'loan_info')
+        field: Trường trong nhóm
+        widget_key: Khóa widget chứa giá trị mới
+    """
+    model = case_model()
+    value = st.session_state[widget_key]
+    if value == model.sections[section].get(field):
+        return
+
+    had_results = model.get('summary') is not None
+    invalidated = model.set(section, field, value)
+    st.session_state.data_modified = True
+    if st.session_state.case_id is not None:
+        save_current_case()
+
+    if had_results != (model.get('summary') is not None):
+        # Chỉ tiêu vừa có/vừa mất: mọi tab dùng chỉ tiêu đều phải hiển thị lại
+        st.rerun()
+    
+    fragments = set(SECTION_FRAGMENTS[section])
+    for node in invalidated:
+        fragments.update(NODE_FRAGMENTS.get(node, ()))
+    st.rerun(sorted(fragments))
+
+
+@st.fragment(key='data_status')
+def render_data_status():
+    """Trạng thái dữ liệu đã tải/đã sửa"""
+    if not st.session_state.data_loaded:
+        return
+    
+    if st.session_state.data_modified:
+        st.info("ℹ️ Dữ liệu đã được thay đổi. Các chỉ tiêu sẽ được tính toán lại.")
+    else:
+        st.success("✅ Dữ liệu đã được tải từ file")
+    render_extraction_sources()
+
+
+@st.fragment(key='tab_customer')
 def render_tab_customer_info():
     """Tab 1: Thông tin định danh khách hàng"""
     st.markdown("### 👤 Thông Tin Định Danh Khách Hàng")
@@ -215,51 +612,48 @@ def render_tab_customer_info():
     col1, col2 = st.columns(2)
     
     with col1:
-        name = st.text_input(
+        st.text_input(
             "Họ và tên",
             value=st.session_state.customer_info['name'],
-            key='input_customer_name'
+            key='input_customer_name',
+            on_change=on_case_field_change,
+            args=('customer_info', 'name', 'input_customer_name')
         )
-        if name != st.session_state.customer_info['name']:
-            st.session_state.customer_info['name'] = name
-            st.session_state.data_modified = True
         
         cccd = st.text_input(
             "CCCD/CMND",
             value=st.session_state.customer_info['cccd'],
-            key='input_customer_cccd'
+            key='input_customer_cccd',
+            on_change=on_case_field_change,
+            args=('customer_info', 'cccd', 'input_customer_cccd')
         )
-        if cccd != st.session_state.customer_info['cccd']:
-            st.session_state.customer_info['cccd'] = cccd
-            st.session_state.data_modified = True
             
         if cccd and not validate_cccd(cccd):
             st.warning("⚠️ Số CCCD/CMND không hợp lệ (9 hoặc 12 số)")
     
     with col2:
-        address = st.text_area(
+        st.text_area(
             "Địa chỉ",
             value=st.session_state.customer_info['address'],
             height=100,
-            key='input_customer_address'
+            key='input_customer_address',
+            on_change=on_case_field_change,
+            args=('customer_info', 'address', 'input_customer_address')
         )
-        if address != st.session_state.customer_info['address']:
-            st.session_state.customer_info['address'] = address
-            st.session_state.data_modified = True
         
         phone = st.text_input(
             "Số điện thoại",
             value=st.session_state.customer_info['phone'],
-            key='input_customer_phone'
+            key='input_customer_phone',
+            on_change=on_case_field_change,
+            args=('customer_info', 'phone', 'input_customer_phone')
         )
-        if phone != st.session_state.customer_info['phone']:
-            st.session_state.customer_info['phone'] = phone
-            st.session_state.data_modified = True
             
         if phone and not validate_phone(phone):
             st.warning("⚠️ Số điện thoại không hợp lệ")
 
 
+@st.fragment(key='tab_loan')
 def render_tab_loan_info():
     """Tab 2: Thông tin tài chính"""
     st.markdown("### 💰 Thông Tin Khoản Vay")
@@ -267,14 +661,13 @@ def render_tab_loan_info():
     col1, col2 = st.columns(2)
     
     with col1:
-        purpose = st.text_input(
+        st.text_input(
             "Mục đích vay",
             value=st.session_state.loan_info['purpose'],
-            key='input_loan_purpose'
+            key='input_loan_purpose',
+            on_change=on_case_field_change,
+            args=('loan_info', 'purpose', 'input_loan_purpose')
         )
-        if purpose != st.session_state.loan_info['purpose']:
-            st.session_state.loan_info['purpose'] = purpose
-            st.session_state.data_modified = True
         
         total_need = st.number_input(
             "Tổng nhu cầu vốn (VND)",
@@ -282,11 +675,10 @@ def render_tab_loan_info():
             value=float(st.session_state.loan_info['total_need']),
             step=1000000.0,
             format="%.0f",
-            key='input_total_need'
+            key='input_total_need',
+            on_change=on_case_field_change,
+            args=('loan_info', 'total_need', 'input_total_need')
         )
-        if total_need != st.session_state.loan_info['total_need']:
-            st.session_state.loan_info['total_need'] = total_need
-            st.session_state.data_modified = True
         
         equity = st.number_input(
             "Vốn đối ứng (VND)",
@@ -294,11 +686,10 @@ def render_tab_loan_info():
             value=float(st.session_state.loan_info['equity']),
             step=1000000.0,
             format="%.0f",
-            key='input_equity'
+            key='input_equity',
+            on_change=on_case_field_change,
+            args=('loan_info', 'equity', 'input_equity')
         )
-        if equity != st.session_state.loan_info['equity']:
-            st.session_state.loan_info['equity'] = equity
-            st.session_state.data_modified = True
         
         loan_amount = st.number_input(
             "Số tiền vay (VND)",
@@ -306,46 +697,43 @@ def render_tab_loan_info():
             value=float(st.session_state.loan_info['loan_amount']),
             step=1000000.0,
             format="%.0f",
-            key='input_loan_amount'
+            key='input_loan_amount',
+            on_change=on_case_field_change,
+            args=('loan_info', 'loan_amount', 'input_loan_amount')
         )
-        if loan_amount != st.session_state.loan_info['loan_amount']:
-            st.session_state.loan_info['loan_amount'] = loan_amount
-            st.session_state.data_modified = True
     
     with col2:
         # Tính tỷ lệ vốn đối ứng
         if total_need > 0:
             equity_ratio = (equity / total_need) * 100
-            st.session_state.loan_info['equity_ratio'] = equity_ratio
+            case_model().set('loan_info', 'equity_ratio', equity_ratio)
         else:
             equity_ratio = 0
         
         st.metric("Tỷ lệ vốn đối ứng", f"{equity_ratio:.2f}%")
         
-        interest_rate = st.number_input(
+        st.number_input(
             "Lãi suất (%/năm)",
             min_value=0.0,
             max_value=100.0,
             value=float(st.session_state.loan_info['interest_rate']),
             step=0.1,
             format="%.2f",
-            key='input_interest_rate'
+            key='input_interest_rate',
+            on_change=on_case_field_change,
+            args=('loan_info', 'interest_rate', 'input_interest_rate')
         )
-        if interest_rate != st.session_state.loan_info['interest_rate']:
-            st.session_state.loan_info['interest_rate'] = interest_rate
-            st.session_state.data_modified = True
         
-        loan_term = st.number_input(
+        st.number_input(
             "Thời gian vay (tháng)",
             min_value=1,
             max_value=360,
             value=int(st.session_state.loan_info['loan_term']),
             step=12,
-            key='input_loan_term'
+            key='input_loan_term',
+            on_change=on_case_field_change,
+            args=('loan_info', 'loan_term', 'input_loan_term')
         )
-        if loan_term != st.session_state.loan_info['loan_term']:
-            st.session_state.loan_info['loan_term'] = loan_term
-            st.session_state.data_modified = True
         
         st.selectbox(
             "Kỳ trả nợ",
@@ -360,6 +748,7 @@ def render_tab_loan_info():
         st.warning(f"⚠️ Tổng vốn không khớp: {format_number(equity + loan_amount)} ≠ {format_number(total_need)}")
 
 
+@st.fragment(key='tab_collateral')
 def render_tab_collateral_info():
     """Tab 3: Tài sản bảo đảm"""
     st.markdown("### 🏠 Tài Sản Bảo Đảm")
@@ -367,14 +756,13 @@ def render_tab_collateral_info():
     col1, col2 = st.columns(2)
     
     with col1:
-        asset_type = st.text_input(
+        st.text_input(
             "Loại tài sản",
             value=st.session_state.collateral_info['asset_type'],
-            key='input_asset_type'
+            key='input_asset_type',
+            on_change=on_case_field_change,
+            args=('collateral_info', 'asset_type', 'input_asset_type')
         )
-        if asset_type != st.session_state.collateral_info['asset_type']:
-            st.session_state.collateral_info['asset_type'] = asset_type
-            st.session_state.data_modified = True
         
         market_value = st.number_input(
             "Giá trị thị trường (VND)",
@@ -382,21 +770,19 @@ def render_tab_collateral_info():
             value=float(st.session_state.collateral_info['market_value']),
             step=1000000.0,
             format="%.0f",
-            key='input_market_value'
+            key='input_market_value',
+            on_change=on_case_field_change,
+            args=('collateral_info', 'market_value', 'input_market_value')
         )
-        if market_value != st.session_state.collateral_info['market_value']:
-            st.session_state.collateral_info['market_value'] = market_value
-            st.session_state.data_modified = True
         
-        asset_address = st.text_area(
+        st.text_area(
             "Địa chỉ tài sản",
             value=st.session_state.collateral_info['asset_address'],
             height=100,
-            key='input_asset_address'
+            key='input_asset_address',
+            on_change=on_case_field_change,
+            args=('collateral_info', 'asset_address', 'input_asset_address')
         )
-        if asset_address != st.session_state.collateral_info['asset_address']:
-            st.session_state.collateral_info['asset_address'] = asset_address
-            st.session_state.data_modified = True
     
     with col2:
         # Tính LTV
@@ -407,28 +793,26 @@ def render_tab_collateral_info():
         
         st.metric("LTV tính toán", f"{ltv_calculated:.2f}%")
         
-        ltv = st.number_input(
+        st.number_input(
             "LTV mục tiêu (%)",
             min_value=0.0,
             max_value=100.0,
             value=float(st.session_state.collateral_info['ltv']),
             step=1.0,
             format="%.2f",
-            key='input_ltv'
+            key='input_ltv',
+            on_change=on_case_field_change,
+            args=('collateral_info', 'ltv', 'input_ltv')
         )
-        if ltv != st.session_state.collateral_info['ltv']:
-            st.session_state.collateral_info['ltv'] = ltv
-            st.session_state.data_modified = True
         
-        legal_docs = st.text_area(
+        st.text_area(
             "Giấy tờ pháp lý",
             value=st.session_state.collateral_info['legal_docs'],
             height=100,
-            key='input_legal_docs'
+            key='input_legal_docs',
+            on_change=on_case_field_change,
+            args=('collateral_info', 'legal_docs', 'input_legal_docs')
         )
-        if legal_docs != st.session_state.collateral_info['legal_docs']:
-            st.session_state.collateral_info['legal_docs'] = legal_docs
-            st.session_state.data_modified = True
     
     # Cảnh báo LTV
     if ltv_calculated > 80:
@@ -439,6 +823,7 @@ def render_tab_collateral_info():
         st.success(f"✅ LTV tốt ({ltv_calculated:.2f}%)")
 
 
+@st.fragment(key='tab_financial')
 def render_tab_financial_calculations():
     """Tab 4: Tính toán chỉ tiêu tài chính"""
     st.markdown("### 📊 Tính Toán Chỉ Tiêu Tài Chính")
@@ -448,58 +833,46 @@ def render_tab_financial_calculations():
     col1, col2, col3 = st.columns(3)
     
     with col1:
-        monthly_income = st.number_input(
+        st.number_input(
             "Thu nhập tháng (VND)",
             min_value=0.0,
             value=float(st.session_state.financial_info['monthly_income']),
             step=1000000.0,
             format="%.0f",
-            key='input_monthly_income'
+            key='input_monthly_income',
+            on_change=on_case_field_change,
+            args=('financial_info', 'monthly_income', 'input_monthly_income')
         )
-        if monthly_income != st.session_state.financial_info['monthly_income']:
-            st.session_state.financial_info['monthly_income'] = monthly_income
-            st.session_state.data_modified = True
     
     with col2:
-        monthly_expense = st.number_input(
+        st.number_input(
             "Chi phí tháng (VND)",
             min_value=0.0,
             value=float(st.session_state.financial_info['monthly_expense']),
             step=1000000.0,
             format="%.0f",
-            key='input_monthly_expense'
+            key='input_monthly_expense',
+            on_change=on_case_field_change,
+            args=('financial_info', 'monthly_expense', 'input_monthly_expense')
         )
-        if monthly_expense != st.session_state.financial_info['monthly_expense']:
-            st.session_state.financial_info['monthly_expense'] = monthly_expense
-            st.session_state.data_modified = True
     
     with col3:
-        other_debt = st.number_input(
+        st.number_input(
             "Nợ khác hàng tháng (VND)",
             min_value=0.0,
             value=float(st.session_state.financial_info['other_debt']),
             step=1000000.0,
             format="%.0f",
-            key='input_other_debt'
+            key='input_other_debt',
+            on_change=on_case_field_change,
+            args=('financial_info', 'other_debt', 'input_other_debt')
         )
-        if other_debt != st.session_state.financial_info['other_debt']:
-            st.session_state.financial_info['other_debt'] = other_debt
-            st.session_state.data_modified = True
     
     st.markdown("---")
     
-    # Tính toán
-    if st.session_state.loan_info['loan_amount'] > 0:
-        calc = FinancialCalculator(
-            loan_amount=st.session_state.loan_info['loan_amount'],
-            interest_rate=st.session_state.loan_info['interest_rate'],
-            loan_term=st.session_state.loan_info['loan_term'],
-            monthly_income=monthly_income,
-            monthly_expense=monthly_expense,
-            other_debt=other_debt
-        )
-        
-        summary = calc.get_summary(st.session_state.collateral_info['market_value'])
+    # Chỉ tiêu ghi nhớ trong case model, chỉ tính lại khi số liệu đầu vào đổi
+    summary = case_model().get('summary')
+    if summary is not None:
         
         # Hiển thị các chỉ tiêu
         st.markdown("#### Các chỉ tiêu chính")
@@ -589,24 +962,20 @@ def render_tab_financial_calculations():
         import pandas as pd
         df = pd.DataFrame(detail_data)
         st.dataframe(df, use_container_width=True, hide_index=True)
-        
-        # Lưu vào session state để dùng cho các tab khác
-        st.session_state.financial_summary = summary
-        st.session_state.payment_schedule = calc.calculate_payment_schedule()
     else:
         st.info("ℹ️ Vui lòng nhập thông tin khoản vay để tính toán")
 
 
+@st.fragment(key='tab_charts')
 def render_tab_charts():
     """Tab 5: Biểu đồ"""
     st.markdown("### 📈 Biểu Đồ Phân Tích")
     
-    if 'financial_summary' not in st.session_state:
+    chart_data = case_model().get('chart_data')
+    if chart_data is None:
         st.info("ℹ️ Vui lòng tính toán các chỉ tiêu tài chính trước")
         return
     
-    chart_gen = ChartGenerator()
-    
     # Chọn loại biểu đồ
     chart_type = st.selectbox(
         "Chọn loại biểu đồ",
@@ -618,50 +987,41 @@ def render_tab_charts():
             "Dư nợ giảm dần"
         ]
     )
+    interactive = st.toggle(
+        "Biểu đồ tương tác",
+        value=True,
+        help="Trình duyệt tự vẽ biểu đồ từ số liệu (phóng to, xem giá trị từng điểm). "
+             "Tắt để dùng ảnh tĩnh như trong báo cáo PDF."
+    )
+    
+    methods = {
+        "Lịch trả nợ hàng tháng": 'plot_payment_schedule',
+        "Phân tích dòng tiền": 'plot_cash_flow',
+        "Cơ cấu nguồn vốn": 'plot_capital_allocation',
+        "So sánh thu nhập và nghĩa vụ": 'plot_debt_ratio',
+        "Dư nợ giảm dần": 'plot_remaining_balance',
+    }
+    method = methods[chart_type]
+    args = chart_data[method]
     
     try:
-        if chart_type == "Lịch trả nợ hàng tháng":
-            chart_buf = chart_gen.plot_payment_schedule(st.session_state.payment_schedule)
-            st.image(chart_buf, use_container_width=True)
-        
-        elif chart_type == "Phân tích dòng tiền":
-            chart_buf = chart_gen.plot_cash_flow(
-                st.session_state.payment_schedule,
-                st.session_state.financial_info['monthly_income'],
-                st.session_state.financial_info['monthly_expense']
-            )
-            st.image(chart_buf, use_container_width=True)
-        
-        elif chart_type == "Cơ cấu nguồn vốn":
-            chart_buf = chart_gen.plot_capital_allocation(
-                st.session_state.loan_info['total_need'],
-                st.session_state.loan_info['equity'],
-                st.session_state.loan_info['loan_amount']
-            )
-            st.image(chart_buf, use_container_width=True)
-        
-        elif chart_type == "So sánh thu nhập và nghĩa vụ":
-            chart_buf = chart_gen.plot_debt_ratio(
-                st.session_state.financial_info['monthly_income'],
-                st.session_state.financial_summary['monthly_payment'],
-                st.session_state.financial_info['monthly_expense'],
-                st.session_state.financial_info['other_debt']
-            )
-            st.image(chart_buf, use_container_width=True)
-        
-        elif chart_type == "Dư nợ giảm dần":
-            chart_buf = chart_gen.plot_remaining_balance(st.session_state.payment_schedule)
-            st.image(chart_buf, use_container_width=True)
-        
+        if interactive:
+            from ui.interactive_charts import InteractiveChartGenerator
+            chart = getattr(InteractiveChartGenerator(), method)(*args)
+            st.altair_chart(chart, use_container_width=True)
+        else:
+            from ui.chart_generator import ChartGenerator
+            st.image(ChartGenerator().render(method, *args), use_container_width=True)
     except Exception as e:
         st.error(f"Lỗi khi vẽ biểu đồ: {str(e)}")
 
 
+@st.fragment(key='tab_ai')
 def render_tab_ai_analysis():
     """Tab 6: Phân tích AI"""
     st.markdown("### 🤖 Phân Tích AI - Gemini")
     
-    if not st.session_state.get('api_key'):
+    if requires_api_key() and not st.session_state.get('api_key'):
         st.warning("⚠️ Vui lòng nhập API key ở sidebar để sử dụng tính năng này")
         return
     
@@ -675,15 +1035,23 @@ def render_tab_ai_analysis():
     st.markdown("#### 📄 Phần 1: Phân tích từ File Upload")
     st.caption("Nguồn dữ liệu: File phương án khách hàng upload")
     
-    if st.button("🔍 Phân Tích File", use_container_width=True):
-        if st.session_state.raw_file_content:
-            with st.spinner("Đang phân tích file..."):
-                analysis = gemini_client.analyze_from_file(st.session_state.raw_file_content)
-                st.session_state.file_analysis = analysis
+    file_running = 'file_analysis' in st.session_state.ai_jobs
+    if st.button("🔍 Phân Tích File", use_container_width=True, disabled=file_running):
+        raw_text = case_model().sections[DOCUMENT_SECTION]['raw_text']
+        if raw_text:
+            if submit_ai_job('file_analysis', gemini_client.analyze_from_file, raw_text):
+                st.rerun()
         else:
             st.warning("⚠️ Chưa có file nào được upload")
     
+    if file_running:
+        st.info("⏳ Đang phân tích file (chạy nền)...")
+    elif 'file_analysis' in st.session_state.ai_errors:
+        st.error(f"❌ {st.session_state.ai_errors['file_analysis']}")
+    
     if st.session_state.file_analysis:
+        if is_analysis_stale('file_analysis'):
+            st.warning("⚠️ Đã tải file khác sau lần phân tích này - vui lòng phân tích lại")
         st.markdown(st.session_state.file_analysis)
     
     st.markdown("---")
@@ -692,42 +1060,33 @@ def render_tab_ai_analysis():
     st.markdown("#### ✏️ Phần 2: Phân tích từ Dữ Liệu Đã Nhập/Chỉnh Sửa")
     st.caption("Nguồn dữ liệu: Dữ liệu sau khi hiệu chỉnh tại giao diện")
     
-    if st.button("🔍 Phân Tích Dữ Liệu Hiện Tại", use_container_width=True):
-        if 'financial_summary' in st.session_state:
-            with st.spinner("Đang phân tích dữ liệu..."):
-                data_for_analysis = {
-                    'customer_name': st.session_state.customer_info['name'],
-                    'customer_cccd': st.session_state.customer_info['cccd'],
-                    'customer_address': st.session_state.customer_info['address'],
-                    'loan_purpose': st.session_state.loan_info['purpose'],
-                    'loan_amount': st.session_state.loan_info['loan_amount'],
-                    'interest_rate': st.session_state.loan_info['interest_rate'],
-                    'loan_term': st.session_state.loan_info['loan_term'],
-                    'monthly_payment': st.session_state.financial_summary['monthly_payment'],
-                    'monthly_income': st.session_state.financial_info['monthly_income'],
-                    'monthly_expense': st.session_state.financial_info['monthly_expense'],
-                    'net_cash_flow': st.session_state.financial_summary['net_cash_flow'],
-                    'dsr': st.session_state.financial_summary['dsr'],
-                    'safety_margin': st.session_state.financial_summary['safety_margin'],
-                    'collateral_type': st.session_state.collateral_info['asset_type'],
-                    'collateral_value': st.session_state.collateral_info['market_value'],
-                    'ltv': st.session_state.financial_summary.get('ltv', 0)
-                }
-                
-                analysis = gemini_client.analyze_from_data(data_for_analysis)
-                st.session_state.data_analysis = analysis
+    data_running = 'data_analysis' in st.session_state.ai_jobs
+    if st.button("🔍 Phân Tích Dữ Liệu Hiện Tại", use_container_width=True, disabled=data_running):
+        data_for_analysis = case_model().get('analysis_data')
+        if data_for_analysis is not None:
+            if submit_ai_job('data_analysis', gemini_client.analyze_from_data, data_for_analysis):
+                st.rerun()
         else:
             st.warning("⚠️ Vui lòng tính toán các chỉ tiêu tài chính trước")
     
+    if data_running:
+        st.info("⏳ Đang phân tích dữ liệu (chạy nền)...")
+    elif 'data_analysis' in st.session_state.ai_errors:
+        st.error(f"❌ {st.session_state.ai_errors['data_analysis']}")
+    
     if st.session_state.data_analysis:
+        if is_analysis_stale('data_analysis'):
+            st.warning("⚠️ Dữ liệu hồ sơ đã thay đổi sau lần phân tích này, nhận định dưới đây "
+                       "có thể không còn đúng - vui lòng phân tích lại")
         st.markdown(st.session_state.data_analysis)
 
 
+@st.fragment(key='tab_chatbot')
 def render_tab_chatbot():
     """Tab 7: Chatbot Gemini"""
     st.markdown("### 💬 Chatbox AI - Hỏi Đáp Với Gemini")
     
-    if not st.session_state.get('api_key'):
+    if requires_api_key() and not st.session_state.get('api_key'):
         st.warning("⚠️ Vui lòng nhập API key ở sidebar để sử dụng tính năng này")
         return
     
@@ -740,6 +1099,8 @@ def render_tab_chatbot():
     # Nút xóa lịch sử
     if st.button("🗑️ Xóa hội thoại", use_container_width=True):
         st.session_state.chat_history = []
+        st.session_state.ai_jobs.pop('chat', None)
+        st.session_state.ai_errors.pop('chat', None)
         st.rerun()
     
     # Hiển thị lịch sử chat
@@ -750,7 +1111,17 @@ def render_tab_chatbot():
                 st.markdown(f"**👤 Bạn:** {msg['content']}")
             else:
                 st.markdown(f"**🤖 Gemini:** {msg['content']}")
+                if msg.get('tool_calls'):
+                    with st.expander("🧮 Kết quả tính toán chính xác"):
+                        for call in msg['tool_calls']:
+                            st.markdown(f"`{call['name']}`")
+                            st.json(call['result'], expanded=False)
             st.markdown("---")
+        
+        if 'chat' in st.session_state.ai_jobs:
+            st.markdown("**🤖 Gemini:** _Đang suy nghĩ..._")
+        elif 'chat' in st.session_state.ai_errors:
+            st.error(f"❌ {st.session_state.ai_errors['chat']}")
     
     # Input box
     user_input = st.text_input(
@@ -761,7 +1132,8 @@ def render_tab_chatbot():
     
     col1, col2 = st.columns([6, 1])
     with col2:
-        send_button = st.button("📤 Gửi", use_container_width=True)
+        send_button = st.button("📤 Gửi", use_container_width=True,
+                                disabled='chat' in st.session_state.ai_jobs)
     
     if send_button and user_input:
         # Thêm tin nhắn người dùng
@@ -770,52 +1142,145 @@ def render_tab_chatbot():
             'content': user_input
         })
         
-        # Lấy phản hồi từ Gemini
-        with st.spinner("Đang suy nghĩ..."):
-            response = gemini_client.chat(user_input, st.session_state.chat_history)
+        # Số liệu hồ sơ để chatbot gọi công cụ tính toán
+        case_data = {
+            'loan_amount': st.session_state.loan_info['loan_amount'],
+            'interest_rate': st.session_state.loan_info['interest_rate'],
+            'loan_term': st.session_state.loan_info['loan_term'],
+            'monthly_income': st.session_state.financial_info['monthly_income'],
+            'monthly_expense': st.session_state.financial_info['monthly_expense'],
+            'other_debt': st.session_state.financial_info['other_debt'],
+            'collateral_value': st.session_state.collateral_info['market_value'],
+        }
         
-        # Thêm phản hồi
-        st.session_state.chat_history.append({
-            'role': 'assistant',
-            'content': response
-        })
+        # Lấy phản hồi từ Gemini (chạy nền, truyền bản sao lịch sử)
+        if submit_ai_job('chat', gemini_client.chat, user_input,
+                         list(st.session_state.chat_history), case_data):
+            st.rerun()
+        else:
+            st.session_state.chat_history.pop()
+
+
+def render_batch_export():
+    """Xuất báo cáo hàng loạt từ file JSON danh sách hồ sơ"""
+    st.markdown("#### 🗂️ Xuất Báo Cáo Hàng Loạt")
+    st.caption("File JSON là danh sách hồ sơ, mỗi hồ sơ gồm customer_info, loan_info, "
+               "collateral_info, financial_info (trường thiếu dùng giá trị mặc định)")
+    
+    cases_file = st.file_uploader("Chọn file danh sách hồ sơ (.json)", type=['json'], key='batch_cases_file')
+    kinds = st.multiselect(
+        "Tài liệu cần tạo",
+        options=[KIND_PDF, KIND_DOCX, KIND_EXCEL],
+        default=[KIND_PDF, KIND_EXCEL],
+        format_func=lambda kind: {
+            KIND_PDF: "Báo cáo thẩm định (PDF)",
+            KIND_DOCX: "Báo cáo thẩm định (Word)",
+            KIND_EXCEL: "Bảng kê trả nợ (Excel)"
+        }[kind]
+    )
+    
+    if cases_file is None or not kinds:
+        return
+    
+    if st.button("📥 Tạo File ZIP", use_container_width=True):
+        try:
+            cases = json.loads(cases_file.getvalue().decode('utf-8'))
+            if not isinstance(cases, list):
+                raise ValueError("File phải chứa một danh sách hồ sơ")
+        except ValueError as e:
+            st.error(f"❌ File danh sách hồ sơ không hợp lệ: {str(e)}")
+            return
         
-        st.rerun()
+        total = len(cases) * len(kinds)
+        progress = st.progress(0.0, text="Đang tạo báo cáo...")
+        done = []
+        
+        def on_progress(result):
+            done.append(result)
+            progress.progress(len(done) / total, text=f"Đã xử lý {len(done)}/{total} tài liệu")
+        
+        # Ghi ZIP ra file tạm thay vì giữ từng tài liệu trong bộ nhớ
+        with tempfile.NamedTemporaryFile(delete=False, suffix='.zip') as tmp_file:
+            zip_path = tmp_file.name
+        try:
+            report = generate_report_zip(cases, zip_path, kinds=tuple(kinds), on_progress=on_progress)
+            with open(zip_path, 'rb') as f:
+                zip_data = f.read()
+        finally:
+            os.unlink(zip_path)
+        
+        st.success(f"✅ Đã tạo {len(report.succeeded)}/{total} tài liệu trong {report.elapsed:.1f} giây")
+        if report.failed:
+            st.warning(f"⚠️ {len(report.failed)} tài liệu lỗi (chi tiết trong file ket_qua.csv)")
+            st.dataframe([
+                {'Hồ sơ': doc.case_index, 'Khách hàng': doc.customer_name, 'Loại': doc.kind, 'Lỗi': doc.error}
+                for doc in report.failed
+            ], use_container_width=True, hide_index=True)
+        
+        st.download_button(
+            label="⬇️ Tải xuống file ZIP",
+            data=zip_data,
+            file_name="Bao_cao_hang_loat.zip",
+            mime="application/zip",
+            use_container_width=True
+        )
+
+
+def build_export_report_data() -> dict:
+    """Dữ liệu báo cáo PDF/Word kèm phân tích AI (bỏ phân tích đã cũ so với dữ liệu hiện tại)"""
+    analysis = st.session_state.get('data_analysis', '')
+    if is_analysis_stale('data_analysis'):
+        analysis = ''
+    return {**case_model().get('report_data'), 'ai_analysis': analysis}
 
 
+def render_stale_analysis_notice():
+    """Cảnh báo phân tích AI đã cũ sẽ không được đưa vào báo cáo"""
+    if st.session_state.data_analysis and is_analysis_stale('data_analysis'):
+        st.warning("⚠️ Dữ liệu hồ sơ đã thay đổi sau lần phân tích AI gần nhất - báo cáo sẽ không kèm "
+                   "phân tích AI cho đến khi phân tích lại ở tab AI Phân tích")
+
+
+@st.fragment(key='tab_export')
 def render_tab_export():
     """Tab 8: Xuất file"""
     st.markdown("### 📥 Xuất Dữ Liệu")
     
-    if 'financial_summary' not in st.session_state:
-        st.info("ℹ️ Vui lòng tính toán các chỉ tiêu tài chính trước")
-        return
-    
     export_type = st.selectbox(
         "Chọn loại xuất dữ liệu",
         [
             "Xuất bảng kê kế hoạch trả nợ (Excel)",
-            "Xuất báo cáo thẩm định (PDF)"
+            "Xuất báo cáo thẩm định (PDF)",
+            "Xuất báo cáo thẩm định (Word)",
+            "Xuất lịch trả nợ dạng dữ liệu (CSV/JSONL/Parquet)",
+            "Xuất hàng loạt nhiều hồ sơ (ZIP)"
         ]
     )
     
+    if export_type == "Xuất hàng loạt nhiều hồ sơ (ZIP)":
+        render_batch_export()
+        return
+    
+    model = case_model()
+    if model.get('summary') is None:
+        st.info("ℹ️ Vui lòng tính toán các chỉ tiêu tài chính trước")
+        return
+    
     if export_type == "Xuất bảng kê kế hoạch trả nợ (Excel)":
         st.markdown("#### 📊 Bảng Kê Kế Hoạch Trả Nợ")
         
         if st.button("📥 Tạo File Excel", use_container_width=True):
             try:
-                exporter = ExcelExporter()
+                from export.excel_exporter import ExcelExporter, TEMPLATE_VERSION as EXCEL_TEMPLATE_VERSION
                 
-                loan_info = {
-                    'customer_name': st.session_state.customer_info['name'],
-                    'loan_amount': st.session_state.loan_info['loan_amount'],
-                    'interest_rate': st.session_state.loan_info['interest_rate'],
-                    'loan_term': st.session_state.loan_info['loan_term']
-                }
+                schedule = model.get('schedule')
+                loan_info = model.get('excel_loan_info')
                 
-                excel_file = exporter.create_payment_schedule_excel(
-                    st.session_state.payment_schedule,
-                    loan_info
+                # Cùng dữ liệu đã xuất trước đó (mọi session) thì lấy lại file cũ
+                cache_key = make_cache_key('excel_schedule', EXCEL_TEMPLATE_VERSION, schedule, loan_info)
+                excel_file, cached = get_artifact_cache().get_or_create(
+                    cache_key,
+                    lambda: ExcelExporter().create_payment_schedule_excel(schedule, loan_info).getvalue()
                 )
                 
                 st.download_button(
@@ -826,52 +1291,126 @@ def render_tab_export():
                     use_container_width=True
                 )
                 
-                st.success("✅ File Excel đã được tạo thành công!")
+                if cached:
+                    st.success("✅ Dữ liệu không đổi, dùng lại file Excel đã tạo")
+                else:
+                    st.success("✅ File Excel đã được tạo thành công!")
+            except Exception as e:
+                st.error(f"❌ Lỗi khi tạo file: {str(e)}")
+    
+    elif export_type == "Xuất báo cáo thẩm định (Word)":
+        st.markdown("#### 📝 Báo Cáo Thẩm Định (Word)")
+        render_stale_analysis_notice()
+        
+        col1, col2 = st.columns(2)
+        with col1:
+            include_schedule = st.checkbox("Kèm bảng kê trả nợ chi tiết", value=True)
+        with col2:
+            yearly_subtotals = st.checkbox("Cộng theo từng năm", value=True, disabled=not include_schedule)
+        
+        if st.button("📥 Tạo Báo Cáo Word", use_container_width=True):
+            try:
+                from export.docx_exporter import DocxExporter, template_fingerprint
+                
+                report_data = build_export_report_data()
+                schedule = model.get('schedule') if include_schedule else None
+                
+                cache_key = make_cache_key(
+                    'docx_report', template_fingerprint(), report_data, schedule,
+                    yearly_subtotals, date.today().isoformat()
+                )
+                docx_file, cached = get_artifact_cache().get_or_create(
+                    cache_key,
+                    lambda: DocxExporter().create_assessment_report(report_data, schedule, yearly_subtotals).getvalue()
+                )
+                
+                st.download_button(
+                    label="⬇️ Tải xuống Báo Cáo Word",
+                    data=docx_file,
+                    file_name=f"Bao_cao_tham_dinh_{st.session_state.customer_info['name'].replace(' ', '_')}.docx",
+                    mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+                    use_container_width=True
+                )
+                
+                if cached:
+                    st.success("✅ Dữ liệu không đổi, dùng lại báo cáo Word đã tạo")
+                else:
+                    st.success("✅ Báo cáo Word đã được tạo thành công!")
+            except Exception as e:
+                st.error(f"❌ Lỗi khi tạo báo cáo: {str(e)}")
+    
+    elif export_type == "Xuất lịch trả nợ dạng dữ liệu (CSV/JSONL/Parquet)":
+        st.markdown("#### 🧾 Lịch Trả Nợ Cho Hệ Thống Core Banking")
+        from export.schedule_data import ScheduleDataExporter, FORMATS, available_formats
+        
+        data_format = st.radio(
+            "Định dạng",
+            available_formats(),
+            format_func=lambda fmt: {'csv': 'CSV', 'jsonl': 'JSON Lines', 'parquet': 'Parquet'}[fmt],
+            horizontal=True
+        )
+        loan_id = st.text_input("Mã khoản vay (cột loan_id, để trống nếu không cần)", value="")
+        
+        if st.button("📥 Tạo File Dữ Liệu", use_container_width=True):
+            try:
+                arrays = build_calculator(model.sections).calculate_schedule_arrays()
+                data_file = ScheduleDataExporter(data_format).export_schedule(arrays, loan_id=loan_id or None)
+                extension, mime = FORMATS[data_format]
+                
+                st.download_button(
+                    label="⬇️ Tải xuống file dữ liệu",
+                    data=data_file,
+                    file_name=f"Lich_tra_no_{st.session_state.customer_info['name'].replace(' ', '_')}{extension}",
+                    mime=mime,
+                    use_container_width=True
+                )
+                
+                st.success(f"✅ Đã tạo file {len(arrays['month'])} kỳ trả nợ")
             except Exception as e:
                 st.error(f"❌ Lỗi khi tạo file: {str(e)}")
     
     elif export_type == "Xuất báo cáo thẩm định (PDF)":
         st.markdown("#### 📄 Báo Cáo Thẩm Định")
+        render_stale_analysis_notice()
+        
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            include_charts = st.checkbox("Kèm biểu đồ phân tích", value=True)
+        with col2:
+            include_schedule = st.checkbox("Kèm bảng kê trả nợ chi tiết", value=True)
+        with col3:
+            yearly_subtotals = st.checkbox("Cộng theo từng năm", value=True, disabled=not include_schedule)
         
         if st.button("📥 Tạo Báo Cáo PDF", use_container_width=True):
             try:
                 with st.spinner("Đang tạo báo cáo..."):
-                    pdf_exporter = PDFExporter()
+                    from export.pdf_exporter import PDFExporter, TEMPLATE_VERSION as PDF_TEMPLATE_VERSION
+                    from export.report_charts import render_report_charts
                     
                     # Chuẩn bị dữ liệu
-                    report_data = {
-                        'customer_name': st.session_state.customer_info['name'],
-                        'customer_cccd': st.session_state.customer_info['cccd'],
-                        'customer_address': st.session_state.customer_info['address'],
-                        'customer_phone': st.session_state.customer_info['phone'],
-                        'loan_purpose': st.session_state.loan_info['purpose'],
-                        'total_need': st.session_state.loan_info['total_need'],
-                        'equity': st.session_state.loan_info['equity'],
-                        'loan_amount': st.session_state.loan_info['loan_amount'],
-                        'interest_rate': st.session_state.loan_info['interest_rate'],
-                        'loan_term': st.session_state.loan_info['loan_term'],
-                        'monthly_payment': st.session_state.financial_summary['monthly_payment'],
-                        'collateral_type': st.session_state.collateral_info['asset_type'],
-                        'collateral_value': st.session_state.collateral_info['market_value'],
-                        'asset_address': st.session_state.collateral_info['asset_address'],
-                        'ltv': st.session_state.financial_summary.get('ltv', 0),
-                        'legal_docs': st.session_state.collateral_info['legal_docs'],
-                        'monthly_income': st.session_state.financial_info['monthly_income'],
-                        'monthly_expense': st.session_state.financial_info['monthly_expense'],
-                        'other_debt': st.session_state.financial_info['other_debt'],
-                        'net_cash_flow': st.session_state.financial_summary['net_cash_flow'],
-                        'dsr': st.session_state.financial_summary['dsr'],
-                        'safety_margin': st.session_state.financial_summary['safety_margin'],
-                        'assessment': st.session_state.financial_summary['assessment'],
-                        'risk_level': st.session_state.financial_summary['risk_level'],
-                        'can_repay': st.session_state.financial_summary['can_repay'],
-                        'ai_analysis': st.session_state.get('data_analysis', '')
-                    }
+                    report_data = build_export_report_data()
+                    schedule = model.get('schedule')
+                    
+                    def create_pdf() -> bytes:
+                        chart_images = None
+                        if include_charts:
+                            chart_images = render_report_charts(report_data, schedule)
+                        
+                        return PDFExporter().create_assessment_report(
+                            report_data,
+                            schedule if include_schedule else None,
+                            chart_images,
+                            yearly_subtotals
+                        ).getvalue()
                     
-                    pdf_file = pdf_exporter.create_assessment_report(
-                        report_data,
-                        st.session_state.payment_schedule
+                    # Khóa gồm mọi đầu vào của báo cáo: dữ liệu hồ sơ, lịch trả nợ, phân tích AI,
+                    # tùy chọn và ngày báo cáo (in trên trang đầu)
+                    cache_key = make_cache_key(
+                        'pdf_report', PDF_TEMPLATE_VERSION, report_data, schedule,
+                        include_charts, include_schedule, yearly_subtotals,
+                        date.today().isoformat()
                     )
+                    pdf_file, cached = get_artifact_cache().get_or_create(cache_key, create_pdf)
                     
                     st.download_button(
                         label="⬇️ Tải xuống Báo Cáo PDF",
@@ -881,16 +1420,107 @@ def render_tab_export():
                         use_container_width=True
                     )
                     
-                    st.success("✅ Báo cáo PDF đã được tạo thành công!")
+                    if cached:
+                        st.success("✅ Dữ liệu không đổi, dùng lại báo cáo PDF đã tạo")
+                    else:
+                        st.success("✅ Báo cáo PDF đã được tạo thành công!")
             except Exception as e:
                 st.error(f"❌ Lỗi khi tạo báo cáo: {str(e)}")
 
 
+@st.cache_resource(max_entries=1, show_spinner=False)
+def load_portfolio_columns(revision) -> dict:
+    """
+    Dữ liệu danh mục dạng cột, đọc từ kho một lần cho mỗi phiên bản dữ liệu
+    (dùng chung cho mọi session, đọc lại khi kho có thay đổi)
+    
+    Args:
+        revision: CaseStore.revision() (khóa cache)
+    """
+    from logic.portfolio import columns_from_rows
+    return columns_from_rows(get_case_store().portfolio_rows())
+
+
+@st.fragment(key='tab_portfolio')
+def render_tab_portfolio():
+    """Tab 9: Tổng hợp danh mục hồ sơ đã lưu"""
+    st.markdown("### 🗃️ Danh Mục Hồ Sơ Đã Lưu")
+    
+    try:
+        columns = load_portfolio_columns(get_case_store().revision())
+    except Exception as e:
+        st.error(f"❌ Không đọc được kho hồ sơ: {str(e)}")
+        return
+    
+    if not len(columns['loan_amount']):
+        st.info("ℹ️ Chưa có hồ sơ nào có khoản vay trong kho. Lưu hồ sơ ở sidebar để xem tổng hợp danh mục.")
+        return
+    
+    import numpy as np
+    import pandas as pd
+    from logic.portfolio import (
+        DSR_BINS, LTV_BINS, PORTFOLIO_RISK_LEVELS, distribution, exposure_summary,
+        filter_columns, month_dates, repayment_inflow, risk_mix
+    )
+    
+    branch = st.selectbox("Chi nhánh", ['Tất cả'] + np.unique(columns['branch']).tolist(), key='portfolio_branch')
+    if branch != 'Tất cả':
+        columns = filter_columns(columns, columns['branch'] == branch)
+    
+    summary = exposure_summary(columns)
+    months, principal, interest = repayment_inflow(columns)
+    today = date.today()
+    next_year = (months >= today.year * 12 + today.month - 1) & (months < today.year * 12 + today.month + 11)
+    
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.metric("Số hồ sơ", format_number(summary['count']))
+        st.metric("Tổng dư nợ", f"{format_number(summary['total_exposure'])} VND")
+    with col2:
+        st.metric("Lãi suất bình quân (gia quyền)", f"{summary['weighted_rate']:.2f}%")
+        st.metric("Dư nợ rủi ro cao", f"{summary['high_risk_share']:.1%}")
+    with col3:
+        st.metric("DSR trung vị", f"{summary['median_dsr']:.2f}%")
+        st.metric("Thu nợ 12 tháng tới", f"{format_number(principal[next_year].sum() + interest[next_year].sum())} VND")
+    
+    st.markdown("#### 📊 Phân bố DSR và LTV")
+    col1, col2 = st.columns(2)
+    for column, field, bins, title in ((col1, 'dsr', DSR_BINS, 'DSR'), (col2, 'ltv', LTV_BINS, 'LTV')):
+        labels, counts = distribution(columns[field], bins)
+        with column:
+            st.caption(f"{title} (trung vị {summary[f'median_{field}']:.2f}%)")
+            st.bar_chart(pd.DataFrame({'Nhóm': labels, 'Số hồ sơ': counts}),
+                         x='Nhóm', y='Số hồ sơ', sort=False)
+    
+    st.markdown("#### ⚠️ Cơ cấu mức rủi ro")
+    col1, col2 = st.columns(2)
+    for column, by, title in ((col1, 'branch', 'Theo chi nhánh'), (col2, 'purpose', 'Theo mục đích vay')):
+        groups, counts, exposure = risk_mix(columns, by)
+        with column:
+            st.caption(f"{title} (số hồ sơ)")
+            st.bar_chart(pd.DataFrame(counts, index=groups, columns=PORTFOLIO_RISK_LEVELS), horizontal=True)
+            with st.expander("Dư nợ theo mức rủi ro (VND)"):
+                st.dataframe(
+                    pd.DataFrame(exposure, index=groups, columns=PORTFOLIO_RISK_LEVELS).style.format(format_number),
+                    use_container_width=True
+                )
+    
+    st.markdown("#### 💵 Dòng tiền thu nợ dự kiến theo tháng")
+    st.caption("Cộng lịch trả nợ (gốc đều) của mọi khoản vay, kỳ đầu là tháng sau ngày tạo hồ sơ")
+    st.area_chart(
+        pd.DataFrame({'Gốc': principal, 'Lãi': interest}, index=month_dates(months)),
+        y_label='VND'
+    )
+
+
 def main():
     """Hàm main"""
     # Khởi tạo session state
     initialize_session_state()
     
+    # Lấy kết quả các tác vụ AI nền đã hoàn tất
+    collect_ai_jobs()
+    
     # Header
     st.markdown('<div class="main-header">🏦 HỆ THỐNG THẨM ĐỊNH PHƯƠNG ÁN KINH DOANH</div>', 
                 unsafe_allow_html=True)
@@ -899,11 +1529,9 @@ def main():
     render_sidebar()
     
     # Hiển thị trạng thái
-    if st.session_state.data_loaded:
-        if st.session_state.data_modified:
-            st.info("ℹ️ Dữ liệu đã được thay đổi. Các chỉ tiêu sẽ được tính toán lại.")
-        else:
-            st.success("✅ Dữ liệu đã được tải từ file")
+    render_data_status()
+    
+    render_ai_job_monitor()
     
     # Tabs
     tabs = st.tabs([
@@ -914,7 +1542,8 @@ def main():
         "📈 Biểu đồ",
         "🤖 AI Phân tích",
         "💬 Chatbot",
-        "📥 Xuất file"
+        "📥 Xuất file",
+        "🗃️ Danh mục"
     ])
     
     with tabs[0]:
@@ -940,6 +1569,12 @@ def main():
     
     with tabs[7]:
         render_tab_export()
+    
+    with tabs[8]:
+        render_tab_portfolio()
+    
+    # Trang đầu đã hiển thị: nạp trước thư viện của các tab/nút còn lại (chỉ chạy một lần mỗi process)
+    start_warmup()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+# batch_pipeline.py
+"""
+Xử lý hàng loạt file phương án (.docx) không qua giao diện: đọc → tính chỉ tiêu → xuất file
+
+Mỗi hồ sơ được ghi vào <output>/ho_so/ (dữ liệu JSON và các file xuất), kèm
+bảng tổng hợp danh mục <output>/danh_muc.csv. Tiến độ được ghi vào
+<output>/checkpoint.jsonl sau từng hồ sơ; chạy lại cùng lệnh sẽ tiếp tục từ
+chỗ dừng (bỏ qua file đã xử lý và chưa bị sửa).
+
+Chạy:
+    python batch_pipeline.py --input thu_muc_phuong_an --output ket_qua [--kinds pdf,excel]
+    python batch_pipeline.py --manifest danh_sach.txt --output ket_qua [--workers 4] [--retry-failed]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+from export.batch import DEFAULT_KINDS, KIND_DOCX, KIND_EXCEL, KIND_PDF
+from export.pipeline import CHECKPOINT_NAME, BatchPipeline, CaseItem, list_inputs
+from src.config import BATCH_MAX_WORKERS
+
+
+def print_progress(item: CaseItem, done: int, total: int, started: float):
+    """Một dòng tiến độ cho mỗi hồ sơ: thứ tự, kết quả, thời gian, ước lượng thời gian còn lại"""
+    elapsed = time.perf_counter() - started
+    remaining = elapsed / done * (total - done)
+    status = '✅' if item.ok else f'❌ {item.error}'
+    name = (item.record or {}).get('customer_info', {}).get('name', '')
+    print(f"[{done}/{total}] {item.source} {name} {status} "
+          f"({sum(item.timings.values()):.1f}s, còn ~{remaining:.0f}s)", flush=True)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--input', help='Thư mục chứa file .docx (tìm cả thư mục con)')
+    parser.add_argument('--manifest', help='File danh sách đường dẫn .docx, mỗi dòng một file')
+    parser.add_argument('--output', required=True, help='Thư mục kết quả')
+    parser.add_argument('--kinds', default=','.join(DEFAULT_KINDS),
+                        help=f'Loại file xuất, cách nhau bởi dấu phẩy ({KIND_PDF},{KIND_DOCX},{KIND_EXCEL}); '
+                             f'để trống để chỉ tính chỉ tiêu')
+    parser.add_argument('--workers', type=int, default=BATCH_MAX_WORKERS, help='Số process đọc/xuất file')
+    parser.add_argument('--retry-failed', action='store_true', help='Xử lý lại các file lần trước bị lỗi')
+    parser.add_argument('--restart', action='store_true', help='Bỏ checkpoint, xử lý lại từ đầu')
+    parser.add_argument('--quiet', action='store_true', help='Không in tiến độ từng hồ sơ')
+    args = parser.parse_args()
+
+    if not args.input and not args.manifest:
+        parser.error('cần --input hoặc --manifest')
+    kinds = tuple(kind.strip() for kind in args.kinds.split(',') if kind.strip())
+    unknown = [kind for kind in kinds if kind not in (KIND_PDF, KIND_DOCX, KIND_EXCEL)]
+    if unknown:
+        parser.error(f"loại file không hỗ trợ: {', '.join(unknown)}")
+
+    inputs = list_inputs(args.input, args.manifest)
+    if not inputs:
+        print("Không tìm thấy file .docx nào", file=sys.stderr)
+        return 1
+
+    checkpoint_path = os.path.join(args.output, CHECKPOINT_NAME)
+    if args.restart and os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+
+    started = time.perf_counter()
+    pipeline = BatchPipeline(
+        args.output, kinds=kinds, max_workers=max(1, args.workers), retry_failed=args.retry_failed,
+        on_progress=None if args.quiet else lambda item, done, total: print_progress(item, done, total, started)
+    )
+    report = pipeline.run(inputs)
+
+    processed = len(report.processed)
+    print()
+    print(f"Đã xử lý {processed} hồ sơ trong {report.elapsed:.1f}s"
+          f"{f' ({processed / report.elapsed:.2f} hồ sơ/s)' if processed and report.elapsed else ''}, "
+          f"bỏ qua {report.skipped} hồ sơ đã xử lý trước đó, lỗi {len(report.failed)}")
+    print(f"Bảng tổng hợp: {pipeline.portfolio_path}")
+    return 1 if report.failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+"""
+Benchmark throughput của API không giao diện (api_server.py) với backend AI giả lập
+
+Khởi động server trong một process riêng (CADAP_AI_BACKEND=local, độ trễ AI
+cố định) rồi gửi đồng thời nhiều yêu cầu tới từng endpoint; mỗi yêu cầu dùng
+một hồ sơ khác nhau để không trúng cache file xuất. In số yêu cầu/giây,
+độ trễ p50/p95 và số yêu cầu bị từ chối (503) hoặc lỗi.
+
+Chạy:
+    python benchmarks/bench_api.py [--requests 40] [--concurrency 16] [--ai-latency 0.5] [--no-check]
+"""
+
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+import requests
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from src.config import API_AI_CONCURRENCY  # noqa: E402
+
+SERVER_START_TIMEOUT = 60  # giây
+
+# (tên, đường dẫn, tỷ lệ số yêu cầu so với --requests)
+SCENARIOS = (
+    ('calculate', '/v1/calculate', 5),
+    ('analyze (AI)', '/v1/analyze', 2),
+    ('parse (DOCX)', '/v1/parse', 1),
+    ('export excel', '/v1/export/excel', 1),
+    ('export docx', '/v1/export/docx', 1),
+    ('export pdf', '/v1/export/pdf', 0.5),
+)
+
+
+def make_case(index: int) -> Dict:
+    """Hồ sơ mẫu, số tiền vay khác nhau theo index"""
+    return {
+        'customer_info': {'name': f'Khách hàng {index}', 'cccd': f'{index:012d}',
+                          'address': 'Hà Nội', 'phone': '0900000000'},
+        'loan_info': {'purpose': 'Mua nhà', 'total_need': 3_000_000_000,
+                      'equity': 1_000_000_000, 'loan_amount': 2_000_000_000 + index * 1_000_000,
+                      'interest_rate': 8.5, 'loan_term': 240},
+        'collateral_info': {'asset_type': 'Nhà ở', 'market_value': 4_000_000_000},
+        'financial_info': {'monthly_income': 60_000_000, 'monthly_expense': 20_000_000,
+                           'other_debt': 0},
+    }
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_server(port: int, ai_latency: float, workers: Optional[int]) -> subprocess.Popen:
+    """Chạy api_server.py với backend AI giả lập, chờ tới khi /health trả lời"""
+    env = {**os.environ, 'CADAP_AI_BACKEND': 'local', 'CADAP_LOCAL_AI_LATENCY': str(ai_latency),
+           'CADAP_LOCAL_AI_JITTER': '0'}
+    command = [sys.executable, os.path.join(ROOT, 'api_server.py'), '--port', str(port)]
+    if workers:
+        command += ['--workers', str(workers)]
+    server = subprocess.Popen(command, cwd=ROOT, env=env,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + SERVER_START_TIMEOUT
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"api_server.py dừng khi khởi động (mã {server.returncode})")
+        try:
+            requests.get(f'http://127.0.0.1:{port}/health', timeout=1).raise_for_status()
+            return server
+        except requests.RequestException:
+            time.sleep(0.2)
+    server.kill()
+    raise RuntimeError("api_server.py không khởi động kịp")
+
+
+def run_scenario(base_url: str, path: str, bodies: List, concurrency: int) -> Dict:
+    """
+    Gửi các yêu cầu song song (mỗi thread một session HTTP)
+
+    Returns:
+        Dictionary: elapsed (giây), latencies (giây, yêu cầu thành công), rejected, errors
+    """
+    local = threading.local()
+    statuses = []
+    latencies = []
+
+    def send(body) -> None:
+        session = getattr(local, 'session', None)
+        if session is None:
+            session = local.session = requests.Session()
+        started = time.perf_counter()
+        if isinstance(body, bytes):
+            response = session.post(base_url + path, data=body)
+        else:
+            response = session.post(base_url + path, json=body)
+        response.content
+        elapsed = time.perf_counter() - started
+        statuses.append(response.status_code)
+        if response.status_code == 200:
+            latencies.append(elapsed)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(send, bodies))
+    return {
+        'elapsed': time.perf_counter() - started,
+        'latencies': latencies,
+        'rejected': statuses.count(503),
+        'errors': sum(1 for status in statuses if status not in (200, 503)),
+    }
+
+
+def percentile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--requests', type=int, default=40, help='Số yêu cầu cơ sở mỗi endpoint')
+    parser.add_argument('--concurrency', type=int, default=16, help='Số client gửi đồng thời')
+    parser.add_argument('--ai-latency', type=float, default=0.5, help='Độ trễ backend AI giả lập (giây)')
+    parser.add_argument('--workers', type=int, default=None, help='Số process của server')
+    parser.add_argument('--no-check', action='store_true', help='Chỉ in kết quả, không kiểm tra')
+    args = parser.parse_args()
+
+    port = free_port()
+    base_url = f'http://127.0.0.1:{port}'
+    server = start_server(port, args.ai_latency, args.workers)
+    try:
+        # File .docx mẫu cho endpoint parse: báo cáo Word do chính API tạo
+        sample_docx = requests.post(base_url + '/v1/export/docx', json=make_case(0)).content
+
+        print(f"{'Endpoint':<16}{'Yêu cầu':>9}{'OK':>6}{'503':>6}{'Lỗi':>6}"
+              f"{'Req/s':>9}{'p50 (ms)':>10}{'p95 (ms)':>10}")
+        print('-' * 72)
+        results = {}
+        for name, path, share in SCENARIOS:
+            count = max(1, int(args.requests * share))
+            if path == '/v1/parse':
+                bodies = [sample_docx] * count
+            else:
+                # Hồ sơ khác nhau giữa các endpoint và các yêu cầu (không trúng cache)
+                offset = len(results) * 100_000
+                bodies = [make_case(offset + i + 1) for i in range(count)]
+            result = run_scenario(base_url, path, bodies, args.concurrency)
+            results[name] = result
+            ok = len(result['latencies'])
+            print(f"{name:<16}{count:>9}{ok:>6}{result['rejected']:>6}{result['errors']:>6}"
+                  f"{ok / result['elapsed']:>9.1f}"
+                  f"{statistics.median(result['latencies']) * 1000 if ok else 0:>10.0f}"
+                  f"{percentile(result['latencies'], 0.95) * 1000:>10.0f}")
+    finally:
+        server.terminate()
+        server.wait(timeout=10)
+
+    if args.no_check:
+        return 0
+
+    print()
+    failed = False
+    errors = {name: r['errors'] for name, r in results.items() if r['errors']}
+    if errors:
+        print(f"❌ Có yêu cầu lỗi: {errors}")
+        failed = True
+    # Lời gọi AI chạy song song trên đường async: throughput phải gần
+    # min(số client, API_AI_CONCURRENCY) / độ trễ, không phải 1 / độ trễ
+    ai = results['analyze (AI)']
+    expected = min(args.concurrency, API_AI_CONCURRENCY) / args.ai_latency
+    throughput = len(ai['latencies']) / ai['elapsed']
+    if throughput < expected / 2:
+        print(f"❌ Throughput AI {throughput:.1f} req/s, kỳ vọng ≥ {expected / 2:.1f} req/s")
+        failed = True
+    else:
+        print(f"✅ Throughput AI {throughput:.1f} req/s (tối đa lý thuyết {expected:.1f} req/s)")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
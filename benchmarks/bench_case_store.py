@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Benchmark kho hồ sơ: thời gian tìm kiếm và mở hồ sơ trên một kho nhiều nghìn hồ sơ
+
+Tạo kho SQLite tạm với hồ sơ ngẫu nhiên (tất định theo seed), đo trung vị và
+p95 của từng loại truy vấn, so với ngân sách và in kế hoạch truy vấn để thấy
+chỉ mục nào được dùng.
+
+Chạy:
+    python benchmarks/bench_case_store.py [--cases 5000] [--repeat 200] [--no-check]
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from src.case_store import CaseStore  # noqa: E402
+
+QUERY_BUDGET_MS = 10
+
+FAMILY_NAMES = ['Nguyễn', 'Trần', 'Lê', 'Phạm', 'Hoàng', 'Huỳnh', 'Phan', 'Vũ', 'Võ', 'Đặng', 'Bùi', 'Đỗ']
+MIDDLE_NAMES = ['Văn', 'Thị', 'Hữu', 'Đức', 'Minh', 'Ngọc', 'Thanh', 'Quốc']
+GIVEN_NAMES = ['An', 'Bình', 'Cường', 'Dũng', 'Hà', 'Hải', 'Hạnh', 'Hùng', 'Lan', 'Linh',
+               'Long', 'Mai', 'Nam', 'Phương', 'Quân', 'Sơn', 'Tâm', 'Thảo', 'Trang', 'Tuấn']
+RISK_LEVELS = ['Thấp', 'Trung bình', 'Cao']
+PURPOSES = ['Kinh doanh', 'Mua nhà', 'Mua xe', 'Tiêu dùng']
+
+
+def make_case(rng: random.Random):
+    """Hồ sơ ngẫu nhiên: (sections, summary)"""
+    loan_amount = rng.randrange(100, 5000) * 1_000_000
+    sections = {
+        'customer_info': {
+            'name': f'{rng.choice(FAMILY_NAMES)} {rng.choice(MIDDLE_NAMES)} {rng.choice(GIVEN_NAMES)}',
+            'cccd': f'{rng.randrange(10 ** 11, 10 ** 12)}', 'address': 'Hà Nội', 'phone': '0900000000',
+        },
+        'loan_info': {'purpose': rng.choice(PURPOSES), 'total_need': loan_amount * 1.4, 'equity': loan_amount * 0.4,
+                      'loan_amount': loan_amount, 'interest_rate': 8.5, 'loan_term': rng.choice([60, 120, 240])},
+        'collateral_info': {'asset_type': 'Bất động sản', 'market_value': loan_amount * 1.6},
+        'financial_info': {'monthly_income': 50_000_000, 'monthly_expense': 20_000_000, 'other_debt': 0},
+        'document': {'raw_text': 'PHƯƠNG ÁN SỬ DỤNG VỐN\n' * 200},
+    }
+    summary = {'monthly_payment': loan_amount / 120, 'net_cash_flow': 10_000_000,
+               'dsr': rng.uniform(10, 80), 'ltv': rng.uniform(30, 90), 'risk_level': rng.choice(RISK_LEVELS)}
+    return sections, summary
+
+
+def timed_ms(fn, repeat: int):
+    """(trung vị, p95) thời gian gọi fn (ms)"""
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    samples.sort()
+    return statistics.median(samples), samples[min(len(samples) - 1, int(0.95 * len(samples)))]
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--cases', type=int, default=5000, help='Số hồ sơ trong kho')
+    parser.add_argument('--repeat', type=int, default=200, help='Số lần đo mỗi truy vấn')
+    parser.add_argument('--no-check', action='store_true', help='Chỉ in kết quả, không so ngân sách')
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    with tempfile.TemporaryDirectory() as tmp:
+        store = CaseStore(os.path.join(tmp, 'cases.db'))
+        started = time.perf_counter()
+        ids = [store.save(*make_case(rng)) for _ in range(args.cases)]
+        insert_ms = (time.perf_counter() - started) * 1000 / args.cases
+        sample_cccd = store.load(ids[len(ids) // 2]).sections['customer_info']['cccd']
+
+        queries = [
+            ('Danh sách mới nhất', {}),
+            ('Tên "nguyen van an"', {'query': 'nguyen van an'}),
+            ('Tên "Hùng"', {'query': 'Hùng'}),
+            ('CCCD (đầu số)', {'query': sample_cccd[:6]}),
+            ('CCCD (đủ số)', {'query': sample_cccd}),
+            ('Rủi ro "Cao"', {'risk_level': 'Cao'}),
+            ('Vay 1-2 tỷ', {'min_amount': 1e9, 'max_amount': 2e9}),
+            ('Cập nhật từ hôm nay', {'date_from': time.strftime('%Y-%m-%d')}),
+        ]
+        results = []  # (tên, trung vị, p95, kế hoạch)
+        for name, filters in queries:
+            median, p95 = timed_ms(lambda: store.search(**filters), args.repeat)
+            results.append((name, median, p95, '; '.join(store.explain(**filters))))
+        median, p95 = timed_ms(lambda: store.load(rng.choice(ids)), args.repeat)
+        results.append(('Mở hồ sơ (theo ID)', median, p95, ''))
+        store.close()
+
+    print(f"Kho {args.cases} hồ sơ, ghi trung bình {insert_ms:.2f} ms/hồ sơ")
+    print(f"{'Truy vấn':<26}{'Trung vị (ms)':>15}{'p95 (ms)':>10}   Kế hoạch")
+    print('-' * 100)
+    over = []
+    for name, median, p95, plan in results:
+        mark = ''
+        if p95 > QUERY_BUDGET_MS:
+            mark = ' ❌'
+            over.append(name)
+        print(f"{name:<26}{median:>15.2f}{p95:>10.2f}{mark}   {plan}")
+
+    if args.no_check:
+        return 0
+    print()
+    if over:
+        print(f"❌ Vượt ngân sách {QUERY_BUDGET_MS} ms (p95): {', '.join(over)}")
+        return 1
+    print(f"✅ Mọi truy vấn dưới {QUERY_BUDGET_MS} ms (p95)")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
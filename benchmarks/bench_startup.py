@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Benchmark khởi động: thời gian import của app.py và của từng module nạp khi dùng đến
+
+Mỗi phép đo chạy trong một process Python mới (cache import trống, như lần
+khởi động thật); lấy trung vị của nhiều lần chạy và so với ngân sách.
+
+Chạy:
+    python benchmarks/bench_startup.py [--repeat 5] [--no-check]
+"""
+
+import argparse
+import ast
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from src.warmup import LAZY_MODULES  # noqa: E402
+
+# Ngân sách (ms, trung vị) cho phần import lúc khởi động của app.py và cho
+# chi phí thêm của từng module nạp khi dùng đến (sau khi app đã import xong)
+APP_IMPORT_BUDGET_MS = 800
+LAZY_IMPORT_BUDGET_MS = {
+    'ui.interactive_charts': 600,
+    'ui.chart_generator': 600,
+    'export.excel_exporter': 500,
+    'export.pdf_exporter': 500,
+    'export.report_charts': 500,
+    'export.docx_exporter': 400,
+    'export.schedule_data': 400,
+    'src.docx_parser_v2': 300,
+    'ai.extraction': 300,
+}
+WARMUP_BUDGET_MS = 4000
+
+# Không được nạp khi khởi động (chỉ khi mở tab/bấm nút tương ứng)
+HEAVY_MODULES = ('matplotlib', 'altair', 'reportlab', 'openpyxl', 'docx', 'pyarrow',
+                 'pandas', 'google.generativeai')
+
+
+def app_startup_imports() -> str:
+    """Các câu lệnh import ở cấp module của app.py (nguồn Python)"""
+    with open(os.path.join(ROOT, 'app.py'), encoding='utf-8') as f:
+        tree = ast.parse(f.read())
+    nodes = [node for node in tree.body if isinstance(node, (ast.Import, ast.ImportFrom))]
+    return '\n'.join(ast.unparse(node) for node in nodes)
+
+
+def run_timed(setup: str, statement: str) -> float:
+    """
+    Đo thời gian chạy statement (sau setup) trong một process mới
+
+    Returns:
+        Thời gian (ms)
+    """
+    code = '\n'.join([
+        'import sys, time',
+        f'sys.path.insert(0, {ROOT!r})',
+        setup,
+        'started = time.perf_counter()',
+        statement,
+        'print(repr((time.perf_counter() - started) * 1000))',
+    ])
+    output = subprocess.run([sys.executable, '-c', code], cwd=ROOT, check=True,
+                            capture_output=True, text=True).stdout
+    return float(output.strip().splitlines()[-1])
+
+
+def median_ms(setup: str, statement: str, repeat: int) -> float:
+    return statistics.median(run_timed(setup, statement) for _ in range(repeat))
+
+
+def leaked_heavy_modules(imports: str) -> list:
+    """Các module nặng bị nạp ngay khi import app.py"""
+    code = '\n'.join([
+        'import sys',
+        f'sys.path.insert(0, {ROOT!r})',
+        imports,
+        f'print(",".join(m for m in {HEAVY_MODULES!r} if m in sys.modules))',
+    ])
+    output = subprocess.run([sys.executable, '-c', code], cwd=ROOT, check=True,
+                            capture_output=True, text=True).stdout
+    return [m for m in output.strip().split(',') if m]
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=5, help='Số lần đo mỗi mục (lấy trung vị)')
+    parser.add_argument('--no-check', action='store_true', help='Chỉ in kết quả, không so ngân sách')
+    args = parser.parse_args()
+
+    imports = app_startup_imports()
+    results = []  # (tên, ms, ngân sách)
+
+    results.append(('app.py (import khi khởi động)', median_ms('', imports, args.repeat), APP_IMPORT_BUDGET_MS))
+    for module in LAZY_MODULES:
+        ms = median_ms(imports, f'import {module}', args.repeat)
+        results.append((f'  + {module}', ms, LAZY_IMPORT_BUDGET_MS.get(module)))
+    warmup = median_ms(imports, 'from src.warmup import Warmup\nWarmup().run()', args.repeat)
+    results.append(('warmup (toàn bộ, luồng nền)', warmup, WARMUP_BUDGET_MS))
+
+    print(f"{'Mục':<45}{'Trung vị (ms)':>15}{'Ngân sách':>12}")
+    print('-' * 72)
+    over = []
+    for name, ms, budget in results:
+        mark = ''
+        if budget is not None and ms > budget:
+            mark = '  ❌'
+            over.append(name.strip())
+        print(f"{name:<45}{ms:>15.1f}{budget if budget is not None else '-':>12}{mark}")
+
+    leaked = leaked_heavy_modules(imports)
+    print()
+    if leaked:
+        print(f"❌ app.py nạp module nặng ngay khi khởi động: {', '.join(leaked)}")
+    else:
+        print("✅ app.py không nạp module nặng khi khởi động")
+
+    if args.no_check:
+        return 0
+    if over:
+        print(f"❌ Vượt ngân sách: {', '.join(over)}")
+    return 1 if over or leaked else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""
+Kiểm tra transport AI trên server Gemini giả lập: retry/backoff, token bucket, circuit breaker
+
+Chạy một HTTP server local trả mã lỗi theo kịch bản (429, 503, 200...) và gọi
+qua GeminiBackend thật (GEMINI_API_ENDPOINT trỏ tới server đó). Đồng hồ của
+token bucket/circuit breaker và hàm sleep của transport là giả lập, nên các
+kịch bản chạy ngay, kết quả tất định và kiểm tra được thời gian chờ.
+
+Chạy:
+    python benchmarks/check_transport.py
+"""
+
+import json
+import os
+import sys
+import threading
+import warnings
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, List, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from ai.transport import (  # noqa: E402
+    ERROR_CIRCUIT_OPEN, ERROR_RATE_LIMITED, ERROR_UNAVAILABLE,
+    CircuitBreaker, ResilientTransport, RetryPolicy, TokenBucket
+)
+
+GENERATION_CONFIG = {'temperature': 0.0, 'max_output_tokens': 64}
+
+
+class FakeGemini(BaseHTTPRequestHandler):
+    """Server giả lập generateContent: trả lần lượt các mã trong plan (hết plan thì 200)"""
+
+    plan: List[int] = []
+    requests = 0
+    lock = threading.Lock()
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        with FakeGemini.lock:
+            FakeGemini.requests += 1
+            code = FakeGemini.plan.pop(0) if FakeGemini.plan else 200
+        if code == 200:
+            payload = {'candidates': [{'content': {'role': 'model', 'parts': [{'text': 'OK'}]},
+                                       'finishReason': 'STOP'}]}
+        else:
+            status = 'RESOURCE_EXHAUSTED' if code == 429 else 'UNAVAILABLE'
+            payload = {'error': {'code': code, 'message': 'fake error', 'status': status}}
+        data = json.dumps(payload).encode('utf-8')
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    @classmethod
+    def reset(cls, plan: List[int]):
+        with cls.lock:
+            cls.plan = list(plan)
+            cls.requests = 0
+
+
+class FakeClock:
+    """Đồng hồ giả lập cho token bucket/circuit breaker"""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+    def advance(self, seconds: float):
+        self.now += seconds
+
+
+def available_tokens(bucket: TokenBucket) -> float:
+    """Số token hiện có (sau khi nạp lại theo đồng hồ)"""
+    with bucket._lock:
+        bucket._refill()
+        return bucket._tokens
+
+
+def make_transport(clock: FakeClock, sleeps: List[float], max_attempts: int = 3,
+                   failure_threshold: int = 3, recovery: float = 30.0,
+                   rate_per_minute: float = 600, burst: int = 10) -> ResilientTransport:
+    """Transport với đồng hồ giả lập; sleep chỉ ghi lại thời gian chờ"""
+    return ResilientTransport(
+        rate_limiter=TokenBucket(rate_per_minute, burst, clock=clock, sleep=lambda seconds: None),
+        circuit_breaker=CircuitBreaker(failure_threshold, recovery, clock=clock),
+        retry_policy=RetryPolicy(max_attempts=max_attempts, base_delay=1.0, max_delay=8.0),
+        rate_limit_timeout=0,
+        sleep=sleeps.append,
+    )
+
+
+def scenario_backoff(call: Callable) -> List[Tuple[str, bool]]:
+    """429 được retry với backoff tăng dần; hết lượt thử thì trả lỗi rate_limited"""
+    clock, sleeps = FakeClock(), []
+    transport = make_transport(clock, sleeps)
+    FakeGemini.reset([429, 429])
+    result = call(transport)
+    checks = [
+        ('429, 429, 200 → thành công ở lần thử 3', result.ok and result.attempts == 3),
+        ('server nhận đúng 3 request', FakeGemini.requests == 3),
+        ('chờ trước lần thử 2 và 3, trong giới hạn backoff (1s, 2s)',
+         len(sleeps) == 2 and 0 <= sleeps[0] <= 1.0 and 0 <= sleeps[1] <= 2.0),
+    ]
+
+    sleeps.clear()
+    FakeGemini.reset([429, 429, 429])
+    result = call(transport)
+    checks.append(('429 liên tiếp → lỗi rate_limited sau 3 lần thử',
+                   not result.ok and result.error.kind == ERROR_RATE_LIMITED and result.attempts == 3))
+    return checks
+
+
+def scenario_circuit(call: Callable) -> List[Tuple[str, bool]]:
+    """Mạch mở sau lỗi liên tiếp, fail-fast, nửa mở sau thời gian hồi phục rồi đóng/mở lại"""
+    clock, sleeps = FakeClock(), []
+    transport = make_transport(clock, sleeps, max_attempts=1, failure_threshold=2, recovery=30)
+    breaker = transport.circuit_breaker
+    FakeGemini.reset([503, 503])
+    first, second = call(transport), call(transport)
+    checks = [
+        ('2 lỗi 503 → mạch mở', first.error.kind == ERROR_UNAVAILABLE
+         and second.error.kind == ERROR_UNAVAILABLE and breaker.state == CircuitBreaker.OPEN),
+    ]
+
+    FakeGemini.reset([])
+    result = call(transport)
+    checks.append(('mạch mở → circuit_open, không gửi request',
+                   result.error.kind == ERROR_CIRCUIT_OPEN and FakeGemini.requests == 0))
+
+    clock.advance(30)
+    checks.append(('sau thời gian hồi phục → nửa mở', breaker.state == CircuitBreaker.HALF_OPEN))
+    FakeGemini.reset([503])
+    result = call(transport)
+    checks.append(('lượt thử nửa mở lỗi → mở lại',
+                   not result.ok and FakeGemini.requests == 1 and breaker.state == CircuitBreaker.OPEN))
+
+    clock.advance(30)
+    FakeGemini.reset([])
+    result = call(transport)
+    checks.append(('lượt thử nửa mở thành công → đóng mạch',
+                   result.ok and breaker.state == CircuitBreaker.CLOSED))
+    return checks
+
+
+def scenario_tokens(call: Callable) -> List[Tuple[str, bool]]:
+    """Token bucket chặn khi hết quota; token được trả lại khi circuit breaker từ chối"""
+    clock, sleeps = FakeClock(), []
+    transport = make_transport(clock, sleeps, max_attempts=1, failure_threshold=1,
+                               recovery=30, rate_per_minute=60, burst=2)
+    bucket = transport.rate_limiter
+    FakeGemini.reset([])
+    call(transport), call(transport)
+    result = call(transport)
+    checks = [
+        ('burst 2 → lời gọi thứ 3 bị rate_limited, không gửi request',
+         result.error.kind == ERROR_RATE_LIMITED and FakeGemini.requests == 2),
+    ]
+
+    clock.advance(2)  # nạp lại 2 token
+    breaker = transport.circuit_breaker
+    breaker.record_failure()
+    clock.advance(30)
+    trial = breaker.allow_request()  # một lượt thử nửa mở khác đang chạy
+    tokens = available_tokens(bucket)
+    FakeGemini.reset([])
+    results = [call(transport) for _ in range(3)]
+    checks.append(('nửa mở, lượt thử đang chạy → circuit_open, không gửi request',
+                   trial and all(r.error and r.error.kind == ERROR_CIRCUIT_OPEN for r in results)
+                   and FakeGemini.requests == 0))
+    checks.append(('token được trả lại khi bị ngắt mạch từ chối', available_tokens(bucket) == tokens))
+    return checks
+
+
+def main() -> int:
+    warnings.filterwarnings('ignore')
+    from ai.backends import GeminiBackend
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), FakeGemini)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    backend = GeminiBackend('fake-key', api_endpoint=f'http://127.0.0.1:{server.server_port}')
+
+    def call(transport: ResilientTransport):
+        return transport.call(lambda: backend.generate('ping', GENERATION_CONFIG))
+
+    failed = 0
+    try:
+        for title, scenario in (('Retry/backoff', scenario_backoff),
+                                ('Circuit breaker', scenario_circuit),
+                                ('Token bucket', scenario_tokens)):
+            print(title)
+            for name, ok in scenario(call):
+                print(f"  {'✅' if ok else '❌'} {name}")
+                failed += not ok
+    finally:
+        server.shutdown()
+
+    print()
+    if failed:
+        print(f"❌ {failed} kiểm tra thất bại")
+        return 1
+    print("✅ Transport hoạt động đúng trên server giả lập")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,208 @@
+# export/batch.py
+"""Xuất báo cáo hàng loạt: render PDF/Excel trên process pool, ghi thẳng vào file ZIP"""
+
+import csv
+import io
+import multiprocessing
+import re
+import time
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import BinaryIO, Callable, Dict, Iterable, List, Optional, Tuple, Union
+
+from src.config import BATCH_MAX_WORKERS, BATCH_IN_FLIGHT_PER_WORKER
+
+KIND_PDF = 'pdf'
+KIND_EXCEL = 'excel'
+KIND_DOCX = 'docx'
+DEFAULT_KINDS = (KIND_PDF, KIND_EXCEL)
+
+MANIFEST_NAME = 'ket_qua.csv'
+
+
+@dataclass
+class DocumentResult:
+    """Kết quả render một tài liệu"""
+    case_index: int
+    customer_name: str
+    kind: str
+    filename: str = ""
+    elapsed: float = 0.0
+    size: int = 0
+    error: str = ""
+
+    @property
+    def ok(self) -> bool:
+        return not self.error
+
+
+@dataclass
+class BatchReport:
+    """Tổng hợp một lần xuất hàng loạt"""
+    documents: List[DocumentResult] = field(default_factory=list)
+    elapsed: float = 0.0
+
+    @property
+    def succeeded(self) -> List[DocumentResult]:
+        return [doc for doc in self.documents if doc.ok]
+
+    @property
+    def failed(self) -> List[DocumentResult]:
+        return [doc for doc in self.documents if not doc.ok]
+
+
+def _safe_name(name: str) -> str:
+    """Tên file an toàn từ tên khách hàng"""
+    cleaned = re.sub(r'[\\/:*?"<>|\s]+', '_', str(name)).strip('_')
+    return cleaned[:60] or 'Khach_hang'
+
+
+def document_filename(case_index: int, customer_name: str, kind: str) -> str:
+    """Tên file trong ZIP, theo cách đặt tên của tab Xuất file"""
+    name = _safe_name(customer_name)
+    if kind == KIND_PDF:
+        return f"{case_index:04d}_Bao_cao_tham_dinh_{name}.pdf"
+    if kind == KIND_DOCX:
+        return f"{case_index:04d}_Bao_cao_tham_dinh_{name}.docx"
+    return f"{case_index:04d}_Ke_hoach_tra_no_{name}.xlsx"
+
+
+def render_case(case_index: int, record: Dict,
+                kinds: Tuple[str, ...] = DEFAULT_KINDS) -> List[Tuple[DocumentResult, Optional[bytes]]]:
+    """
+    Render các tài liệu của một hồ sơ (chạy trong process con)
+
+    Lỗi của từng tài liệu được ghi vào kết quả thay vì raise, để một hồ sơ
+    lỗi không làm hỏng cả lô.
+
+    Args:
+        case_index: Số thứ tự hồ sơ trong lô (bắt đầu từ 1)
+        record: Hồ sơ (customer_info, loan_info, collateral_info, financial_info)
+        kinds: Các loại tài liệu cần render
+
+    Returns:
+        Danh sách (kết quả, nội dung file hoặc None nếu lỗi)
+    """
+    from export.docx_exporter import DocxExporter
+    from export.excel_exporter import ExcelExporter
+    from export.pdf_exporter import PDFExporter
+    from logic.case_data import normalize_case, compute_case, build_loan_info, build_report_data
+
+    customer_name = str((record.get('customer_info') or {}).get('name', ''))
+    outputs = []
+    try:
+        case = normalize_case(record)
+        customer_name = case['customer_info']['name']
+        summary, schedule = compute_case(case)
+    except Exception as e:
+        for kind in kinds:
+            outputs.append((DocumentResult(case_index, customer_name, kind,
+                                           error=f"Dữ liệu hồ sơ không hợp lệ: {e}"), None))
+        return outputs
+
+    for kind in kinds:
+        result = DocumentResult(case_index, customer_name, kind,
+                                filename=document_filename(case_index, customer_name, kind))
+        start = time.perf_counter()
+        try:
+            if kind == KIND_PDF:
+                buffer = PDFExporter().create_assessment_report(
+                    build_report_data(case, summary), schedule
+                )
+            elif kind == KIND_DOCX:
+                buffer = DocxExporter().create_assessment_report(
+                    build_report_data(case, summary), schedule
+                )
+            elif kind == KIND_EXCEL:
+                buffer = ExcelExporter().create_payment_schedule_excel(
+                    schedule, build_loan_info(case)
+                )
+            else:
+                raise ValueError(f"Loại tài liệu không hỗ trợ: {kind}")
+            content = buffer.getvalue()
+        except Exception as e:
+            result.error = str(e) or type(e).__name__
+            content = None
+        result.elapsed = time.perf_counter() - start
+        result.size = len(content) if content else 0
+        outputs.append((result, content))
+    return outputs
+
+
+def _write_manifest(zf: zipfile.ZipFile, report: BatchReport):
+    """Ghi bảng kết quả (thời gian, dung lượng, lỗi từng tài liệu) vào ZIP"""
+    text = io.StringIO()
+    writer = csv.writer(text)
+    writer.writerow(['STT hồ sơ', 'Khách hàng', 'Loại', 'File', 'Thời gian (s)', 'Dung lượng (byte)', 'Lỗi'])
+    for doc in sorted(report.documents, key=lambda d: (d.case_index, d.kind)):
+        writer.writerow([doc.case_index, doc.customer_name, doc.kind, doc.filename,
+                         f"{doc.elapsed:.3f}", doc.size, doc.error])
+    # BOM để Excel mở đúng tiếng Việt
+    zf.writestr(MANIFEST_NAME, '\ufeff' + text.getvalue())
+
+
+def generate_report_zip(cases: Iterable[Dict], output: Union[str, BinaryIO],
+                        kinds: Tuple[str, ...] = DEFAULT_KINDS,
+                        max_workers: int = BATCH_MAX_WORKERS,
+                        max_in_flight: Optional[int] = None,
+                        on_progress: Optional[Callable[[DocumentResult], None]] = None) -> BatchReport:
+    """
+    Render báo cáo cho nhiều hồ sơ song song và ghi dần vào file ZIP
+
+    Chỉ tối đa max_in_flight hồ sơ được giao cho process pool cùng lúc,
+    mỗi tài liệu được ghi vào ZIP ngay khi xong rồi bỏ khỏi bộ nhớ, nên
+    bộ nhớ không tăng theo số hồ sơ. Danh sách hồ sơ có thể là generator.
+
+    Args:
+        cases: Các hồ sơ (cùng cấu trúc với session state)
+        output: Đường dẫn hoặc stream ghi file ZIP
+        kinds: Các loại tài liệu ('pdf', 'docx', 'excel')
+        max_workers: Số process render
+        max_in_flight: Số hồ sơ đang xử lý tối đa (mặc định 2 × max_workers)
+        on_progress: Hàm được gọi sau mỗi tài liệu hoàn tất
+
+    Returns:
+        BatchReport với thời gian và lỗi từng tài liệu
+    """
+    max_in_flight = max_in_flight or max_workers * BATCH_IN_FLIGHT_PER_WORKER
+    report = BatchReport()
+    start = time.perf_counter()
+    pending: Dict[Future, Tuple[int, Dict]] = {}
+
+    def collect(done):
+        for future in done:
+            case_index, record = pending.pop(future)
+            try:
+                outputs = future.result()
+            except Exception as e:
+                # Process con chết (hết bộ nhớ, bị kill...): ghi lỗi cho cả hồ sơ
+                name = str((record.get('customer_info') or {}).get('name', ''))
+                outputs = [(DocumentResult(case_index, name, kind, error=f"Lỗi process render: {e}"), None)
+                           for kind in kinds]
+            for result, content in outputs:
+                if content is not None:
+                    # PDF/XLSX đã nén sẵn nên lưu nguyên, không nén lại
+                    zf.writestr(result.filename, content, compress_type=zipfile.ZIP_STORED)
+                report.documents.append(result)
+                if on_progress:
+                    on_progress(result)
+
+    # 'spawn': không fork process server Streamlit đang chạy nhiều thread
+    context = multiprocessing.get_context('spawn')
+    with zipfile.ZipFile(output, 'w', compression=zipfile.ZIP_DEFLATED) as zf, \
+            ProcessPoolExecutor(max_workers=max_workers, mp_context=context) as executor:
+        for case_index, record in enumerate(cases, start=1):
+            if len(pending) >= max_in_flight:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                collect(done)
+            pending[executor.submit(render_case, case_index, record, tuple(kinds))] = (case_index, record)
+
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            collect(done)
+
+        report.elapsed = time.perf_counter() - start
+        _write_manifest(zf, report)
+
+    return report
@@ -0,0 +1,357 @@
+# export/docx_exporter.py
+"""Module xuất báo cáo thẩm định dạng Word (DOCX) theo mẫu của ngân hàng"""
+
+import copy
+import io
+import os
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from docx import Document
+from docx.enum.table import WD_TABLE_ALIGNMENT
+from docx.enum.text import WD_ALIGN_PARAGRAPH
+from docx.oxml import OxmlElement
+from docx.oxml.ns import qn
+from docx.shared import Cm, Pt, RGBColor
+
+from logic.case_data import build_schedule_rows
+from src.config import DOCX_REPORT_TEMPLATE
+from src.utils import format_number
+
+# Tăng khi đổi bố cục/định dạng báo cáo để bộ nhớ đệm file xuất không trả file cũ
+TEMPLATE_VERSION = '1'
+
+# Đoạn văn đánh dấu vị trí chèn nội dung báo cáo trong file mẫu
+CONTENT_PLACEHOLDER = '{{NOI_DUNG_BAO_CAO}}'
+
+HEADER_FILL = '366092'
+SUMMARY_FILL = 'E7E6E6'
+
+
+def build_default_template() -> Document:
+    """
+    Mẫu mặc định khi chưa cấu hình file mẫu của ngân hàng
+
+    File mẫu riêng (CADAP_DOCX_TEMPLATE) có thể dùng các placeholder
+    {{customer_name}}, {{report_date}} và một đoạn {{NOI_DUNG_BAO_CAO}}
+    đánh dấu vị trí chèn các mục của báo cáo.
+    """
+    doc = Document()
+    for section in doc.sections:
+        section.page_height = Cm(29.7)
+        section.page_width = Cm(21)
+        section.top_margin = section.bottom_margin = Cm(2)
+        section.left_margin = section.right_margin = Cm(2)
+
+    normal = doc.styles['Normal']
+    normal.font.name = 'Times New Roman'
+    normal.font.size = Pt(12)
+
+    title = doc.add_paragraph()
+    title.alignment = WD_ALIGN_PARAGRAPH.CENTER
+    run = title.add_run('BÁO CÁO THẨM ĐỊNH PHƯƠNG ÁN KINH DOANH')
+    run.bold = True
+    run.font.size = Pt(16)
+    run.font.color.rgb = RGBColor(0x1F, 0x47, 0x88)
+
+    date = doc.add_paragraph('Ngày báo cáo: {{report_date}}')
+    date.alignment = WD_ALIGN_PARAGRAPH.RIGHT
+
+    doc.add_paragraph(CONTENT_PLACEHOLDER)
+
+    # Đọc lại từ bytes: Document vừa dựng giữ sẵn proxy trỏ vào cây XML cũ,
+    # deepcopy sẽ tách proxy đó khỏi bản sao (xem get_docx_template)
+    buffer = io.BytesIO()
+    doc.save(buffer)
+    buffer.seek(0)
+    return Document(buffer)
+
+
+_templates: Dict[Tuple[str, float], Document] = {}
+_templates_lock = threading.Lock()
+
+
+def get_docx_template(path: str = DOCX_REPORT_TEMPLATE) -> Document:
+    """
+    Lấy mẫu báo cáo đã parse (mỗi file mẫu chỉ đọc một lần mỗi process)
+
+    File mẫu được đọc lại khi thời điểm sửa đổi thay đổi. Không được đọc
+    hay sửa trực tiếp document trả về (kể cả doc.paragraphs): python-docx
+    lưu proxy trỏ vào phần tử con của cây XML, mà deepcopy sao chép phần tử
+    con đó thành bản riêng, nên bản sao sẽ ghi vào cây không được lưu.
+    DocxExporter chỉ deepcopy document này rồi điền vào bản sao.
+
+    Args:
+        path: Đường dẫn file mẫu (rỗng: dùng mẫu mặc định)
+
+    Returns:
+        Document mẫu dùng chung
+    """
+    key = (path, os.path.getmtime(path) if path else 0.0)
+    with _templates_lock:
+        template = _templates.get(key)
+        if template is None:
+            template = Document(path) if path else build_default_template()
+            # Bỏ các phiên bản cũ của cùng file mẫu
+            for old in [k for k in _templates if k[0] == path]:
+                del _templates[old]
+            _templates[key] = template
+        return template
+
+
+def template_fingerprint(path: str = DOCX_REPORT_TEMPLATE) -> str:
+    """
+    Định danh mẫu báo cáo cho khóa cache file xuất: phiên bản bố cục, file
+    mẫu và thời điểm sửa file mẫu (đổi file mẫu thì báo cáo cũ không dùng lại)
+    """
+    if not path:
+        return TEMPLATE_VERSION
+    return f"{TEMPLATE_VERSION}:{os.path.abspath(path)}:{os.path.getmtime(path)}"
+
+
+class DocxExporter:
+    """Class xuất báo cáo thẩm định Word"""
+
+    def __init__(self, template_path: str = DOCX_REPORT_TEMPLATE):
+        """
+        Khởi tạo DOCX exporter
+
+        Args:
+            template_path: File mẫu .docx của ngân hàng (rỗng: mẫu mặc định)
+        """
+        self.template_path = template_path
+
+    def _new_document(self) -> Document:
+        """Bản sao của mẫu đã parse (nhanh hơn đọc lại file mẫu cho mỗi báo cáo)"""
+        return copy.deepcopy(get_docx_template(self.template_path))
+
+    @staticmethod
+    def _replace_placeholders(doc: Document, values: Dict[str, str]):
+        """Thay {{key}} trong đoạn văn, bảng và header/footer của mẫu"""
+        def paragraphs():
+            yield from doc.paragraphs
+            for table in doc.tables:
+                for row in table.rows:
+                    for cell in row.cells:
+                        yield from cell.paragraphs
+            for section in doc.sections:
+                yield from section.header.paragraphs
+                yield from section.footer.paragraphs
+
+        for paragraph in paragraphs():
+            if '{{' not in paragraph.text:
+                continue
+            for run in paragraph.runs:
+                for key, value in values.items():
+                    run.text = run.text.replace('{{' + key + '}}', value)
+            text = paragraph.text
+            if '{{' in text and paragraph.runs:
+                # Placeholder bị Word tách qua nhiều run: gộp vào run đầu
+                for key, value in values.items():
+                    text = text.replace('{{' + key + '}}', value)
+                paragraph.runs[0].text = text
+                for run in paragraph.runs[1:]:
+                    run.text = ''
+
+    @staticmethod
+    def _shade(cell, fill: str):
+        """Tô nền ô bảng"""
+        shading = OxmlElement('w:shd')
+        shading.set(qn('w:val'), 'clear')
+        shading.set(qn('w:color'), 'auto')
+        shading.set(qn('w:fill'), fill)
+        cell._tc.get_or_add_tcPr().append(shading)
+
+    @staticmethod
+    def _set_cell(cell, text: str, bold: bool = False,
+                  align: Optional[int] = None, size: Optional[Pt] = None,
+                  color: Optional[RGBColor] = None):
+        """Ghi nội dung một ô (một run trong đoạn có sẵn của ô)"""
+        paragraph = cell.paragraphs[0]
+        run = paragraph.add_run(text)
+        run.bold = bold
+        if size is not None:
+            run.font.size = size
+        if color is not None:
+            run.font.color.rgb = color
+        if align is not None:
+            paragraph.alignment = align
+
+    def _table_style(self, doc: Document) -> Optional[str]:
+        """Style 'Table Grid' nếu file mẫu có"""
+        try:
+            doc.styles['Table Grid']
+            return 'Table Grid'
+        except KeyError:
+            return None
+
+    def _add_heading(self, doc: Document, text: str):
+        paragraph = doc.add_paragraph()
+        paragraph.paragraph_format.space_before = Pt(12)
+        paragraph.paragraph_format.space_after = Pt(6)
+        run = paragraph.add_run(text)
+        run.bold = True
+        run.font.size = Pt(14)
+        run.font.color.rgb = RGBColor(0x1F, 0x47, 0x88)
+
+    def _add_info_table(self, doc: Document, rows: List[List[str]]):
+        """Bảng thông tin 2 cột (nhãn đậm | giá trị)"""
+        table = doc.add_table(rows=len(rows), cols=2, style=self._table_style(doc))
+        for row, (label, value) in zip(table.rows, rows):
+            label_cell, value_cell = row.cells
+            label_cell.width = Cm(5)
+            value_cell.width = Cm(12)
+            self._set_cell(label_cell, label, bold=True)
+            self._set_cell(value_cell, str(value))
+
+    def _add_schedule_table(self, doc: Document, schedule: List[Dict],
+                            yearly_subtotals: bool = True):
+        """
+        Bảng kê lịch trả nợ, dòng tiêu đề lặp lại ở mỗi trang
+
+        Định dạng qua API python-docx cho từng ô rất chậm (mỗi thuộc tính là
+        một lần tìm/chèn phần tử XML), nên chỉ định dạng một dòng mẫu cho dòng
+        thường và một cho dòng cộng; mỗi kỳ là bản sao XML của dòng mẫu, chỉ
+        thay nội dung chữ.
+        """
+        rows, summary_rows = build_schedule_rows(schedule, yearly_subtotals)
+        summary_rows = set(summary_rows)
+        table = doc.add_table(rows=3, cols=len(rows[0]), style=self._table_style(doc))
+        table.alignment = WD_TABLE_ALIGNMENT.CENTER
+        header_row, data_row, summary_row = table.rows
+
+        small = Pt(9)
+        # Lặp lại dòng tiêu đề khi bảng sang trang
+        repeat = OxmlElement('w:tblHeader')
+        repeat.set(qn('w:val'), 'true')
+        header_row._tr.get_or_add_trPr().append(repeat)
+        for cell, text in zip(header_row.cells, rows[0]):
+            self._set_cell(cell, text, bold=True, align=WD_ALIGN_PARAGRAPH.CENTER,
+                           size=small, color=RGBColor(0xFF, 0xFF, 0xFF))
+            self._shade(cell, HEADER_FILL)
+
+        for row, is_summary in ((data_row, False), (summary_row, True)):
+            cells = row.cells
+            # Nội dung tạm để run có sẵn phần tử w:t
+            self._set_cell(cells[0], '0', bold=is_summary, align=WD_ALIGN_PARAGRAPH.CENTER, size=small)
+            for cell in cells[1:]:
+                self._set_cell(cell, '0', bold=is_summary, align=WD_ALIGN_PARAGRAPH.RIGHT, size=small)
+            if is_summary:
+                for cell in cells:
+                    self._shade(cell, SUMMARY_FILL)
+
+        tbl = table._tbl
+        data_tr, summary_tr = data_row._tr, summary_row._tr
+        tbl.remove(data_tr)
+        tbl.remove(summary_tr)
+        text_tag = qn('w:t')
+        for index, values in enumerate(rows[1:], start=1):
+            tr = copy.deepcopy(summary_tr if index in summary_rows else data_tr)
+            for text_element, text in zip(tr.iter(text_tag), values):
+                text_element.text = text
+            tbl.append(tr)
+
+    @staticmethod
+    def _move_to_placeholder(doc: Document, first_new: int):
+        """Chuyển nội dung vừa thêm (từ vị trí first_new) vào chỗ đoạn placeholder"""
+        marker = next((p for p in doc.paragraphs if p.text.strip() == CONTENT_PLACEHOLDER), None)
+        if marker is None:
+            return
+        body = doc.element.body
+        new_elements = [el for el in list(body)[first_new:] if el.tag != qn('w:sectPr')]
+        for element in new_elements:
+            marker._p.addprevious(element)
+        marker._p.getparent().remove(marker._p)
+
+    def create_assessment_report(self, data: Dict,
+                                 schedule: List[Dict] = None,
+                                 yearly_subtotals: bool = True) -> io.BytesIO:
+        """
+        Tạo báo cáo thẩm định Word (cùng nội dung với báo cáo PDF)
+
+        Args:
+            data: Dữ liệu phương án (logic.case_data.build_report_data)
+            schedule: Lịch trả nợ (optional, có thì thêm phụ lục bảng kê trả nợ)
+            yearly_subtotals: Thêm dòng cộng theo năm vào bảng kê trả nợ
+
+        Returns:
+            BytesIO object chứa file DOCX
+        """
+        doc = self._new_document()
+        self._replace_placeholders(doc, {
+            'customer_name': str(data.get('customer_name', '')),
+            'report_date': datetime.now().strftime('%d/%m/%Y'),
+        })
+        # Các mục được thêm cuối body rồi chuyển vào vị trí placeholder (nếu có)
+        first_new = len(doc.element.body) - 1
+
+        # I. THÔNG TIN KHÁCH HÀNG
+        self._add_heading(doc, "I. THÔNG TIN KHÁCH HÀNG")
+        self._add_info_table(doc, [
+            ['Họ và tên:', data.get('customer_name', 'N/A')],
+            ['CCCD/CMND:', data.get('customer_cccd', 'N/A')],
+            ['Địa chỉ:', data.get('customer_address', 'N/A')],
+            ['Số điện thoại:', data.get('customer_phone', 'N/A')],
+        ])
+
+        # II. THÔNG TIN KHOẢN VAY
+        self._add_heading(doc, "II. THÔNG TIN KHOẢN VAY")
+        self._add_info_table(doc, [
+            ['Mục đích vay:', data.get('loan_purpose', 'N/A')],
+            ['Tổng nhu cầu vốn:', f"{format_number(data.get('total_need', 0))} VND"],
+            ['Vốn đối ứng:', f"{format_number(data.get('equity', 0))} VND"],
+            ['Số tiền vay:', f"{format_number(data.get('loan_amount', 0))} VND"],
+            ['Lãi suất:', f"{data.get('interest_rate', 0)}% /năm"],
+            ['Thời hạn vay:', f"{data.get('loan_term', 0)} tháng"],
+            ['Trả nợ hàng tháng:', f"{format_number(data.get('monthly_payment', 0))} VND"],
+        ])
+
+        # III. TÀI SẢN BẢO ĐẢM
+        self._add_heading(doc, "III. TÀI SẢN BẢO ĐẢM")
+        self._add_info_table(doc, [
+            ['Loại tài sản:', data.get('collateral_type', 'N/A')],
+            ['Giá trị thị trường:', f"{format_number(data.get('collateral_value', 0))} VND"],
+            ['Địa chỉ tài sản:', data.get('asset_address', 'N/A')],
+            ['LTV:', f"{data.get('ltv', 0):.2f}%"],
+            ['Giấy tờ pháp lý:', data.get('legal_docs', 'N/A')],
+        ])
+
+        # IV. CHỈ TIÊU TÀI CHÍNH
+        self._add_heading(doc, "IV. CHỈ TIÊU TÀI CHÍNH")
+        self._add_info_table(doc, [
+            ['Thu nhập hàng tháng:', f"{format_number(data.get('monthly_income', 0))} VND"],
+            ['Chi phí hàng tháng:', f"{format_number(data.get('monthly_expense', 0))} VND"],
+            ['Nghĩa vụ nợ khác:', f"{format_number(data.get('other_debt', 0))} VND"],
+            ['Dòng tiền ròng:', f"{format_number(data.get('net_cash_flow', 0))} VND"],
+            ['Tỷ lệ DSR:', f"{data.get('dsr', 0):.2f}%"],
+            ['Biên an toàn:', f"{data.get('safety_margin', 0):.2f}%"],
+        ])
+
+        # V. ĐÁNH GIÁ
+        self._add_heading(doc, "V. ĐÁNH GIÁ NĂNG LỰC TRẢ NỢ")
+        self._add_info_table(doc, [
+            ['Kết luận:', data.get('assessment', 'N/A')],
+            ['Mức độ rủi ro:', data.get('risk_level', 'N/A')],
+            ['Khả năng trả nợ:', 'Đủ khả năng' if data.get('can_repay', False) else 'Không đủ khả năng'],
+        ])
+
+        # VI. PHÂN TÍCH AI (nếu có)
+        if data.get('ai_analysis'):
+            self._add_heading(doc, "VI. PHÂN TÍCH CHUYÊN SÂU (AI)")
+            for para in data['ai_analysis'].split('\n'):
+                if para.strip():
+                    doc.add_paragraph(para.strip())
+
+        # PHỤ LỤC: BẢNG KÊ TRẢ NỢ (nếu có)
+        if schedule:
+            doc.add_page_break()
+            self._add_heading(doc, "PHỤ LỤC: BẢNG KÊ KẾ HOẠCH TRẢ NỢ")
+            self._add_schedule_table(doc, schedule, yearly_subtotals)
+
+        self._move_to_placeholder(doc, first_new)
+
+        buffer = io.BytesIO()
+        doc.save(buffer)
+        buffer.seek(0)
+        return buffer
@@ -1,27 +1,57 @@
 # export/excel_exporter.py
 """Module xuất dữ liệu ra Excel"""
 
-import pandas as pd
 from openpyxl import Workbook
-from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
-from openpyxl.utils.dataframe import dataframe_to_rows
-from typing import List, Dict
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font, PatternFill, Alignment, Border, Side, NamedStyle
+from typing import List, Dict, Iterable, Optional, BinaryIO
 import io
+import re
+from logic.financial_calculator import FinancialCalculator
 from src.utils import format_number
 
+# Tăng khi đổi bố cục/định dạng file để bộ nhớ đệm file xuất không trả file cũ
+TEMPLATE_VERSION = '1'
+
+# Tên các named style dùng chung trong workbook (mỗi ô chỉ tham chiếu tên style)
+STYLE_TITLE = 'cadap_title'
+STYLE_LABEL = 'cadap_label'
+STYLE_HEADER = 'cadap_header'
+STYLE_PERIOD = 'cadap_period'
+STYLE_MONEY = 'cadap_money'
+STYLE_RATE = 'cadap_rate'
+STYLE_TEXT = 'cadap_text'
+STYLE_TOTAL_LABEL = 'cadap_total_label'
+STYLE_TOTAL_MONEY = 'cadap_total_money'
+
+SCHEDULE_HEADERS = ['Kỳ', 'Gốc (VND)', 'Lãi (VND)', 'Tổng trả (VND)', 'Dư nợ (VND)']
+SUMMARY_HEADERS = ['STT', 'Khách hàng', 'Số tiền vay (VND)', 'Lãi suất (%/năm)',
+                   'Thời hạn (tháng)', 'Trả kỳ đầu (VND)', 'Tổng lãi (VND)',
+                   'Tổng phải trả (VND)', 'Sheet']
+
+
+def _sheet_title(index: int, name: str, used: set) -> str:
+    """Tên sheet hợp lệ (tối đa 31 ký tự, không ký tự cấm, không trùng)"""
+    cleaned = re.sub(r'[\\/*?:\[\]]', ' ', str(name)).strip() or 'Khoan vay'
+    title = f"{index:03d} {cleaned}"[:31].strip()
+    suffix = 1
+    while title.lower() in used:
+        suffix += 1
+        title = f"{index:03d}-{suffix} {cleaned}"[:31].strip()
+    used.add(title.lower())
+    return title
+
 
 class ExcelExporter:
     """Class xuất dữ liệu ra Excel"""
     
     def __init__(self):
         """Khởi tạo exporter"""
-        self.wb = Workbook()
-        self.ws = self.wb.active
-        
         # Định nghĩa styles
         self.header_fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
         self.header_font = Font(bold=True, color="FFFFFF", size=12)
         self.title_font = Font(bold=True, size=14)
+        self.total_fill = PatternFill(start_color="E7E6E6", end_color="E7E6E6", fill_type="solid")
         self.border = Border(
             left=Side(style='thin'),
             right=Side(style='thin'),
@@ -29,107 +59,191 @@ class ExcelExporter:
             bottom=Side(style='thin')
         )
     
-    def create_payment_schedule_excel(self, schedule: List[Dict], 
-                                     loan_info: Dict) -> io.BytesIO:
+    def _named_styles(self) -> List[NamedStyle]:
+        """Các named style của bảng kê (tạo mới cho mỗi workbook)"""
+        center = Alignment(horizontal='center', vertical='center')
+        right = Alignment(horizontal='right')
+        return [
+            NamedStyle(STYLE_TITLE, font=self.title_font, alignment=center),
+            NamedStyle(STYLE_LABEL, font=Font(bold=True)),
+            NamedStyle(STYLE_HEADER, font=self.header_font, fill=self.header_fill,
+                       alignment=center, border=self.border),
+            NamedStyle(STYLE_PERIOD, alignment=Alignment(horizontal='center'), border=self.border),
+            NamedStyle(STYLE_MONEY, alignment=right, border=self.border, number_format='#,##0'),
+            NamedStyle(STYLE_RATE, alignment=right, border=self.border, number_format='0.00'),
+            NamedStyle(STYLE_TEXT, border=self.border),
+            NamedStyle(STYLE_TOTAL_LABEL, font=Font(bold=True), fill=self.total_fill,
+                       border=self.border),
+            NamedStyle(STYLE_TOTAL_MONEY, font=Font(bold=True), fill=self.total_fill,
+                       border=self.border, number_format='#,##0'),
+        ]
+    
+    def _new_workbook(self) -> Workbook:
+        """Workbook chế độ write-only: các dòng được ghi thẳng ra file tạm"""
+        wb = Workbook(write_only=True)
+        for style in self._named_styles():
+            wb.add_named_style(style)
+        return wb
+    
+    @staticmethod
+    def _row(ws, values: Iterable, style: str) -> List[WriteOnlyCell]:
+        """Tạo một dòng ô cùng named style"""
+        cells = []
+        for value in values:
+            cell = WriteOnlyCell(ws, value=value)
+            cell.style = style
+            cells.append(cell)
+        return cells
+    
+    @staticmethod
+    def _save(wb: Workbook, output: Optional[BinaryIO]) -> BinaryIO:
+        """Lưu workbook vào output (mặc định BytesIO)"""
+        if output is None:
+            output = io.BytesIO()
+            wb.save(output)
+            output.seek(0)
+            return output
+        wb.save(output)
+        return output
+    
+    def _write_schedule_sheet(self, ws, schedule: Iterable[Dict],
+                              loan_info: Dict) -> Dict[str, float]:
         """
-        Tạo file Excel bảng kê kế hoạch trả nợ
+        Ghi một sheet bảng kê, từng kỳ được ghi ngay khi sinh ra
         
         Args:
-            schedule: Lịch trả nợ
+            ws: Worksheet write-only
+            schedule: Các kỳ trả nợ (list hoặc generator)
             loan_info: Thông tin khoản vay
             
         Returns:
-            BytesIO object chứa file Excel
+            Tổng gốc/lãi/tổng trả và số tiền trả kỳ đầu
         """
-        # Tạo DataFrame
-        df_schedule = pd.DataFrame(schedule)
-        
-        # Đổi tên cột
-        df_schedule.columns = ['Kỳ', 'Gốc', 'Lãi', 'Tổng trả', 'Dư nợ']
-        
-        # Clear sheet
-        self.ws.delete_rows(1, self.ws.max_row)
+        # Độ rộng cột phải đặt trước khi ghi dòng đầu tiên
+        ws.column_dimensions['A'].width = 10
+        for col in ['B', 'C', 'D', 'E']:
+            ws.column_dimensions[col].width = 20
         
         # Tiêu đề
-        self.ws['A1'] = 'BẢNG KÊ KẾ HOẠCH TRẢ NỢ VAY'
-        self.ws['A1'].font = self.title_font
-        self.ws.merge_cells('A1:E1')
-        self.ws['A1'].alignment = Alignment(horizontal='center', vertical='center')
+        title = WriteOnlyCell(ws, value='BẢNG KÊ KẾ HOẠCH TRẢ NỢ VAY')
+        title.style = STYLE_TITLE
+        ws.append([title])
+        ws.merged_cells.add('A1:E1')
+        ws.append([])
         
         # Thông tin khoản vay
-        row = 3
         info_items = [
             ('Khách hàng:', loan_info.get('customer_name', 'N/A')),
             ('Số tiền vay:', f"{format_number(loan_info.get('loan_amount', 0))} VND"),
             ('Lãi suất:', f"{loan_info.get('interest_rate', 0)}% /năm"),
             ('Thời hạn:', f"{loan_info.get('loan_term', 0)} tháng"),
         ]
-        
         for label, value in info_items:
-            self.ws[f'A{row}'] = label
-            self.ws[f'A{row}'].font = Font(bold=True)
-            self.ws[f'B{row}'] = value
-            row += 1
-        
-        # Bảng lịch trả nợ
-        row += 1
-        header_row = row
+            ws.append(self._row(ws, [label], STYLE_LABEL) + [value])
+        ws.append([])
         
         # Header
-        headers = ['Kỳ', 'Gốc (VND)', 'Lãi (VND)', 'Tổng trả (VND)', 'Dư nợ (VND)']
-        for col, header in enumerate(headers, start=1):
-            cell = self.ws.cell(row=header_row, column=col)
-            cell.value = header
-            cell.font = self.header_font
-            cell.fill = self.header_fill
-            cell.alignment = Alignment(horizontal='center', vertical='center')
-            cell.border = self.border
+        ws.append(self._row(ws, SCHEDULE_HEADERS, STYLE_HEADER))
         
         # Data
-        for idx, period in enumerate(schedule, start=1):
-            row = header_row + idx
+        totals = {'principal': 0.0, 'interest': 0.0, 'total_payment': 0.0, 'first_payment': 0.0}
+        for period in schedule:
+            if period['month'] == 1:
+                totals['first_payment'] = period['total_payment']
+            totals['principal'] += period['principal']
+            totals['interest'] += period['interest']
+            totals['total_payment'] += period['total_payment']
             
-            self.ws.cell(row=row, column=1, value=period['month'])
-            self.ws.cell(row=row, column=2, value=period['principal'])
-            self.ws.cell(row=row, column=3, value=period['interest'])
-            self.ws.cell(row=row, column=4, value=period['total_payment'])
-            self.ws.cell(row=row, column=5, value=period['remaining_balance'])
-            
-            # Format và border
-            for col in range(1, 6):
-                cell = self.ws.cell(row=row, column=col)
-                cell.border = self.border
-                cell.alignment = Alignment(horizontal='right' if col > 1 else 'center')
-                
-                # Format số
-                if col > 1:
-                    cell.number_format = '#,##0'
+            ws.append(self._row(ws, [period['month']], STYLE_PERIOD) + self._row(ws, [
+                period['principal'], period['interest'],
+                period['total_payment'], period['remaining_balance']
+            ], STYLE_MONEY))
         
         # Tổng cộng
-        row += 1
-        self.ws.cell(row=row, column=1, value='TỔNG CỘNG').font = Font(bold=True)
-        self.ws.cell(row=row, column=2, value=sum(p['principal'] for p in schedule))
-        self.ws.cell(row=row, column=3, value=sum(p['interest'] for p in schedule))
-        self.ws.cell(row=row, column=4, value=sum(p['total_payment'] for p in schedule))
-        
-        for col in range(1, 6):
-            cell = self.ws.cell(row=row, column=col)
-            cell.font = Font(bold=True)
-            cell.border = self.border
-            cell.fill = PatternFill(start_color="E7E6E6", end_color="E7E6E6", fill_type="solid")
-            if col > 1:
-                cell.number_format = '#,##0'
+        ws.append(self._row(ws, ['TỔNG CỘNG'], STYLE_TOTAL_LABEL) + self._row(ws, [
+            totals['principal'], totals['interest'], totals['total_payment'], None
+        ], STYLE_TOTAL_MONEY))
+        return totals
+    
+    def create_payment_schedule_excel(self, schedule: Iterable[Dict],
+                                     loan_info: Dict,
+                                     output: Optional[BinaryIO] = None) -> BinaryIO:
+        """
+        Tạo file Excel bảng kê kế hoạch trả nợ
         
-        # Điều chỉnh độ rộng cột
-        self.ws.column_dimensions['A'].width = 10
-        for col in ['B', 'C', 'D', 'E']:
-            self.ws.column_dimensions[col].width = 20
+        Args:
+            schedule: Lịch trả nợ (list hoặc FinancialCalculator.iter_payment_schedule())
+            loan_info: Thông tin khoản vay
+            output: File/stream đích (mặc định: BytesIO mới)
+            
+        Returns:
+            Stream chứa file Excel
+        """
+        wb = self._new_workbook()
+        ws = wb.create_sheet('Kế hoạch trả nợ')
+        self._write_schedule_sheet(ws, schedule, loan_info)
+        return self._save(wb, output)
+    
+    def create_portfolio_excel(self, loans: Iterable[Dict],
+                               output: Optional[BinaryIO] = None) -> BinaryIO:
+        """
+        Tạo file Excel danh mục: mỗi khoản vay một sheet bảng kê + sheet tổng hợp
         
-        # Lưu vào BytesIO
-        output = io.BytesIO()
-        self.wb.save(output)
-        output.seek(0)
-        return output
+        Lịch trả nợ của từng khoản được sinh và ghi lần lượt nên bộ nhớ
+        không tăng theo số khoản vay hay số kỳ.
+        
+        Args:
+            loans: Các khoản vay (customer_name, loan_amount, interest_rate, loan_term)
+            output: File/stream đích (mặc định: BytesIO mới)
+            
+        Returns:
+            Stream chứa file Excel
+        """
+        wb = self._new_workbook()
+        summary = wb.create_sheet('Tổng hợp')
+        summary.column_dimensions['A'].width = 6
+        summary.column_dimensions['B'].width = 30
+        for col in ['C', 'D', 'E', 'F', 'G', 'H']:
+            summary.column_dimensions[col].width = 18
+        summary.column_dimensions['I'].width = 32
+        
+        title = WriteOnlyCell(summary, value='TỔNG HỢP DANH MỤC KHOẢN VAY')
+        title.style = STYLE_TITLE
+        summary.append([title])
+        summary.merged_cells.add('A1:I1')
+        summary.append([])
+        summary.append(self._row(summary, SUMMARY_HEADERS, STYLE_HEADER))
+        
+        used_titles = {'tổng hợp'}
+        grand = {'loan_amount': 0.0, 'interest': 0.0, 'total_payment': 0.0}
+        for index, loan in enumerate(loans, start=1):
+            calc = FinancialCalculator(loan['loan_amount'], loan['interest_rate'], int(loan['loan_term']))
+            sheet_title = _sheet_title(index, loan.get('customer_name', ''), used_titles)
+            totals = self._write_schedule_sheet(
+                wb.create_sheet(sheet_title), calc.iter_payment_schedule(), loan
+            )
+            
+            grand['loan_amount'] += loan['loan_amount']
+            grand['interest'] += totals['interest']
+            grand['total_payment'] += totals['total_payment']
+            summary.append(
+                self._row(summary, [index], STYLE_PERIOD)
+                + self._row(summary, [loan.get('customer_name', '')], STYLE_TEXT)
+                + self._row(summary, [loan['loan_amount']], STYLE_MONEY)
+                + self._row(summary, [loan['interest_rate']], STYLE_RATE)
+                + self._row(summary, [int(loan['loan_term'])], STYLE_PERIOD)
+                + self._row(summary, [totals['first_payment'], totals['interest'],
+                                      totals['total_payment']], STYLE_MONEY)
+                + self._row(summary, [sheet_title], STYLE_TEXT)
+            )
+        
+        summary.append(
+            self._row(summary, ['', 'TỔNG CỘNG'], STYLE_TOTAL_LABEL)
+            + self._row(summary, [grand['loan_amount'], None, None, None,
+                                  grand['interest'], grand['total_payment']], STYLE_TOTAL_MONEY)
+            + self._row(summary, [''], STYLE_TOTAL_LABEL)
+        )
+        return self._save(wb, output)
     
     def create_financial_summary_excel(self, data: Dict) -> io.BytesIO:
         """
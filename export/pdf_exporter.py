@@ -2,67 +2,98 @@
 """Module xuất báo cáo PDF"""
 
 from reportlab.lib.pagesizes import A4
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.units import cm
 from reportlab.lib import colors
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, PageBreak
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, PageBreak, LongTable
 from reportlab.platypus import Image as RLImage
-from reportlab.pdfbase import pdfmetrics
-from reportlab.pdfbase.ttfonts import TTFont
-from reportlab.lib.enums import TA_CENTER, TA_LEFT, TA_JUSTIFY
+from reportlab.graphics.shapes import Drawing
 import io
 from typing import Dict, List
 from src.utils import format_number
-import matplotlib.pyplot as plt
+from export.pdf_resources import get_pdf_resources
+from logic.case_data import build_schedule_rows
 from datetime import datetime
 
+# Tăng khi đổi bố cục/định dạng báo cáo để bộ nhớ đệm file xuất không trả file cũ
+TEMPLATE_VERSION = '1'
+
 
 class PDFExporter:
     """Class xuất báo cáo PDF"""
     
     def __init__(self):
-        """Khởi tạo PDF exporter"""
-        self.styles = getSampleStyleSheet()
-        
-        # Custom styles
-        self.title_style = ParagraphStyle(
-            'CustomTitle',
-            parent=self.styles['Heading1'],
-            fontSize=18,
-            textColor=colors.HexColor('#1f4788'),
-            spaceAfter=30,
-            alignment=TA_CENTER,
-            fontName='Helvetica-Bold'
-        )
+        """Khởi tạo PDF exporter (font và style dùng chung, chỉ dựng một lần mỗi process)"""
+        resources = get_pdf_resources()
+        self.font = resources.font
+        self.font_bold = resources.font_bold
+        self.styles = resources.styles
+        self.title_style = resources.title_style
+        self.heading_style = resources.heading_style
+        self.normal_style = resources.normal_style
+        self.info_table_style = resources.info_table_style
+    
+    @staticmethod
+    def _fit_drawing(drawing: Drawing, max_width: float, max_height: float) -> Drawing:
+        """Thu phóng Drawing vừa khung, giữ nguyên tỷ lệ"""
+        scale = min(max_width / drawing.width, max_height / drawing.height)
+        drawing.scale(scale, scale)
+        drawing.width *= scale
+        drawing.height *= scale
+        drawing.hAlign = 'CENTER'
+        return drawing
+    
+    def _build_schedule_table(self, schedule: List[Dict],
+                              yearly_subtotals: bool = True) -> LongTable:
+        """
+        Bảng kê lịch trả nợ nhiều trang, lặp lại dòng tiêu đề ở mỗi trang
         
-        self.heading_style = ParagraphStyle(
-            'CustomHeading',
-            parent=self.styles['Heading2'],
-            fontSize=14,
-            textColor=colors.HexColor('#1f4788'),
-            spaceAfter=12,
-            spaceBefore=12,
-            fontName='Helvetica-Bold'
-        )
+        Số lệnh style cố định cho các dòng dữ liệu (tô màu xen kẽ bằng một lệnh
+        ROWBACKGROUNDS), chỉ dòng cộng năm/tổng cộng có lệnh riêng, nên thời
+        gian dựng bảng tăng gần tuyến tính theo số kỳ.
         
-        self.normal_style = ParagraphStyle(
-            'CustomNormal',
-            parent=self.styles['Normal'],
-            fontSize=11,
-            spaceAfter=6,
-            alignment=TA_JUSTIFY
-        )
+        Args:
+            schedule: Lịch trả nợ
+            yearly_subtotals: Thêm dòng cộng sau mỗi 12 kỳ
+            
+        Returns:
+            LongTable
+        """
+        rows, summary_rows = build_schedule_rows(schedule, yearly_subtotals)
+        
+        commands = [
+            ('FONTNAME', (0, 1), (-1, -1), self.font),
+            ('FONTNAME', (0, 0), (-1, 0), self.font_bold),
+            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#366092')),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
+            ('FONTSIZE', (0, 0), (-1, -1), 9),
+            ('ALIGN', (0, 0), (0, -1), 'CENTER'),
+            ('ALIGN', (1, 1), (-1, -1), 'RIGHT'),
+            ('ALIGN', (1, 0), (-1, 0), 'CENTER'),
+            ('GRID', (0, 0), (-1, -1), 0.25, colors.grey),
+            ('TOPPADDING', (0, 0), (-1, -1), 2),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 2),
+            ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor('#F2F2F2')]),
+        ]
+        for row in summary_rows:
+            commands.append(('BACKGROUND', (0, row), (-1, row), colors.HexColor('#E7E6E6')))
+            commands.append(('FONTNAME', (0, row), (-1, row), self.font_bold))
+        
+        return LongTable(rows, colWidths=[2.2*cm, 3.7*cm, 3.7*cm, 3.7*cm, 3.7*cm],
+                         repeatRows=1, style=TableStyle(commands))
     
     def create_assessment_report(self, data: Dict, 
                                  schedule: List[Dict] = None,
-                                 chart_images: Dict = None) -> io.BytesIO:
+                                 chart_images: Dict = None,
+                                 yearly_subtotals: bool = True) -> io.BytesIO:
         """
         Tạo báo cáo thẩm định PDF
         
         Args:
             data: Dữ liệu phương án
-            schedule: Lịch trả nợ (optional)
-            chart_images: Dictionary chứa các biểu đồ dạng BytesIO (optional)
+            schedule: Lịch trả nợ (optional, có thì thêm phụ lục bảng kê trả nợ)
+            chart_images: Dictionary chứa các biểu đồ dạng BytesIO (PNG) hoặc
+                reportlab Drawing (vector) (optional)
+            yearly_subtotals: Thêm dòng cộng theo năm vào bảng kê trả nợ
             
         Returns:
             BytesIO object chứa file PDF
@@ -101,15 +132,7 @@ class PDFExporter:
         ]
         
         customer_table = Table(customer_data, colWidths=[5*cm, 12*cm])
-        customer_table.setStyle(TableStyle([
-            ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, -1), 11),
-            ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-            ('LEFTPADDING', (0, 0), (-1, -1), 6),
-            ('RIGHTPADDING', (0, 0), (-1, -1), 6),
-            ('TOPPADDING', (0, 0), (-1, -1), 6),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
-        ]))
+        customer_table.setStyle(self.info_table_style)
         story.append(customer_table)
         story.append(Spacer(1, 0.5*cm))
         
@@ -127,15 +150,7 @@ class PDFExporter:
         ]
         
         loan_table = Table(loan_data, colWidths=[5*cm, 12*cm])
-        loan_table.setStyle(TableStyle([
-            ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, -1), 11),
-            ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-            ('LEFTPADDING', (0, 0), (-1, -1), 6),
-            ('RIGHTPADDING', (0, 0), (-1, -1), 6),
-            ('TOPPADDING', (0, 0), (-1, -1), 6),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
-        ]))
+        loan_table.setStyle(self.info_table_style)
         story.append(loan_table)
         story.append(Spacer(1, 0.5*cm))
         
@@ -151,15 +166,7 @@ class PDFExporter:
         ]
         
         collateral_table = Table(collateral_data, colWidths=[5*cm, 12*cm])
-        collateral_table.setStyle(TableStyle([
-            ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, -1), 11),
-            ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-            ('LEFTPADDING', (0, 0), (-1, -1), 6),
-            ('RIGHTPADDING', (0, 0), (-1, -1), 6),
-            ('TOPPADDING', (0, 0), (-1, -1), 6),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
-        ]))
+        collateral_table.setStyle(self.info_table_style)
         story.append(collateral_table)
         story.append(Spacer(1, 0.5*cm))
         
@@ -176,15 +183,7 @@ class PDFExporter:
         ]
         
         financial_table = Table(financial_data, colWidths=[5*cm, 12*cm])
-        financial_table.setStyle(TableStyle([
-            ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, -1), 11),
-            ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-            ('LEFTPADDING', (0, 0), (-1, -1), 6),
-            ('RIGHTPADDING', (0, 0), (-1, -1), 6),
-            ('TOPPADDING', (0, 0), (-1, -1), 6),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
-        ]))
+        financial_table.setStyle(self.info_table_style)
         story.append(financial_table)
         story.append(Spacer(1, 0.5*cm))
         
@@ -216,12 +215,22 @@ class PDFExporter:
             story.append(Paragraph("VII. BIỂU ĐỒ PHÂN TÍCH", self.heading_style))
             
             for chart_name, chart_buffer in chart_images.items():
-                if chart_buffer:
+                if isinstance(chart_buffer, Drawing):
+                    # Biểu đồ vector: co giãn giữ tỷ lệ trong khung 15 x 10 cm
+                    story.append(self._fit_drawing(chart_buffer, 15*cm, 10*cm))
+                    story.append(Spacer(1, 0.5*cm))
+                elif chart_buffer:
                     chart_buffer.seek(0)
                     img = RLImage(chart_buffer, width=15*cm, height=10*cm)
                     story.append(img)
                     story.append(Spacer(1, 0.5*cm))
         
+        # PHỤ LỤC: BẢNG KÊ TRẢ NỢ (nếu có)
+        if schedule:
+            story.append(PageBreak())
+            story.append(Paragraph("PHỤ LỤC: BẢNG KÊ KẾ HOẠCH TRẢ NỢ", self.heading_style))
+            story.append(self._build_schedule_table(schedule, yearly_subtotals))
+        
         # Build PDF
         doc.build(story)
         buffer.seek(0)
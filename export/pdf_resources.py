@@ -0,0 +1,172 @@
+# export/pdf_resources.py
+"""Tài nguyên PDF dùng chung trong process: font Unicode tiếng Việt và các style"""
+
+import os
+import threading
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+from reportlab.lib import colors
+from reportlab.lib.enums import TA_CENTER, TA_JUSTIFY
+from reportlab.lib.styles import ParagraphStyle, StyleSheet1, getSampleStyleSheet
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.platypus import TableStyle
+
+from src.config import PDF_FONT_DIR
+
+FONT_FAMILY = 'DejaVuSans'
+
+# Tên file TTF của từng kiểu chữ trong họ DejaVu Sans
+FONT_FILES = {
+    'normal': 'DejaVuSans.ttf',
+    'bold': 'DejaVuSans-Bold.ttf',
+    'italic': 'DejaVuSans-Oblique.ttf',
+    'boldItalic': 'DejaVuSans-BoldOblique.ttf',
+}
+
+# Font chuẩn của PDF (không hiển thị đúng dấu tiếng Việt), chỉ dùng khi không tìm thấy TTF
+FALLBACK_FONTS = {
+    'normal': 'Helvetica',
+    'bold': 'Helvetica-Bold',
+    'italic': 'Helvetica-Oblique',
+    'boldItalic': 'Helvetica-BoldOblique',
+}
+
+
+@dataclass(frozen=True)
+class PDFResources:
+    """Font đã đăng ký và các style dựng sẵn cho báo cáo"""
+    font: str
+    font_bold: str
+    unicode: bool
+    styles: StyleSheet1
+    title_style: ParagraphStyle
+    heading_style: ParagraphStyle
+    normal_style: ParagraphStyle
+    info_table_style: TableStyle
+
+
+def _font_dirs():
+    """Các thư mục tìm font, theo thứ tự ưu tiên"""
+    if PDF_FONT_DIR:
+        yield PDF_FONT_DIR
+    yield '/usr/share/fonts/truetype/dejavu'
+    yield '/usr/share/fonts/dejavu'
+    try:
+        # matplotlib (đã là phụ thuộc của ứng dụng) kèm sẵn DejaVu Sans
+        import matplotlib
+        yield os.path.join(os.path.dirname(matplotlib.__file__), 'mpl-data', 'fonts', 'ttf')
+    except ImportError:
+        pass
+
+
+def find_font_files() -> Optional[Dict[str, str]]:
+    """Tìm bộ file DejaVu Sans đầy đủ 4 kiểu chữ, None nếu không có"""
+    for directory in _font_dirs():
+        paths = {style: os.path.join(directory, name) for style, name in FONT_FILES.items()}
+        if all(os.path.isfile(path) for path in paths.values()):
+            return paths
+    return None
+
+
+def register_fonts() -> Dict[str, str]:
+    """
+    Đăng ký họ font Unicode với reportlab
+
+    TTFont mặc định chỉ nhúng tập con các ký tự thực sự dùng trong file PDF.
+
+    Returns:
+        Tên font đã đăng ký theo kiểu chữ (hoặc font chuẩn nếu không tìm thấy TTF)
+    """
+    paths = find_font_files()
+    if paths is None:
+        print("Warning: Không tìm thấy font DejaVu Sans, PDF dùng Helvetica (không hiển thị đủ dấu tiếng Việt)")
+        return dict(FALLBACK_FONTS)
+
+    names = {style: FONT_FAMILY if style == 'normal' else f"{FONT_FAMILY}-{style}"
+             for style in FONT_FILES}
+    registered = set(pdfmetrics.getRegisteredFontNames())
+    for style, name in names.items():
+        if name not in registered:
+            pdfmetrics.registerFont(TTFont(name, paths[style]))
+    # Cho phép <b>, <i> trong Paragraph chọn đúng kiểu chữ
+    pdfmetrics.registerFontFamily(FONT_FAMILY, normal=names['normal'], bold=names['bold'],
+                                  italic=names['italic'], boldItalic=names['boldItalic'])
+    return names
+
+
+def _build_resources() -> PDFResources:
+    fonts = register_fonts()
+    styles = getSampleStyleSheet()
+    # Đổi font cho toàn bộ style mẫu (kể cả style con kế thừa)
+    for style in styles.byName.values():
+        if not isinstance(style, ParagraphStyle):
+            continue
+        bold = 'Bold' in style.fontName
+        style.fontName = fonts['bold'] if bold else fonts['normal']
+
+    title_style = ParagraphStyle(
+        'CustomTitle',
+        parent=styles['Heading1'],
+        fontSize=18,
+        textColor=colors.HexColor('#1f4788'),
+        spaceAfter=30,
+        alignment=TA_CENTER,
+        fontName=fonts['bold']
+    )
+
+    heading_style = ParagraphStyle(
+        'CustomHeading',
+        parent=styles['Heading2'],
+        fontSize=14,
+        textColor=colors.HexColor('#1f4788'),
+        spaceAfter=12,
+        spaceBefore=12,
+        fontName=fonts['bold']
+    )
+
+    normal_style = ParagraphStyle(
+        'CustomNormal',
+        parent=styles['Normal'],
+        fontSize=11,
+        spaceAfter=6,
+        alignment=TA_JUSTIFY,
+        fontName=fonts['normal']
+    )
+
+    # Bảng thông tin 2 cột (nhãn đậm | giá trị)
+    info_table_style = TableStyle([
+        ('FONTNAME', (0, 0), (-1, -1), fonts['normal']),
+        ('FONTNAME', (0, 0), (0, -1), fonts['bold']),
+        ('FONTSIZE', (0, 0), (-1, -1), 11),
+        ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+        ('LEFTPADDING', (0, 0), (-1, -1), 6),
+        ('RIGHTPADDING', (0, 0), (-1, -1), 6),
+        ('TOPPADDING', (0, 0), (-1, -1), 6),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
+    ])
+
+    return PDFResources(
+        font=fonts['normal'],
+        font_bold=fonts['bold'],
+        unicode=fonts['normal'] == FONT_FAMILY,
+        styles=styles,
+        title_style=title_style,
+        heading_style=heading_style,
+        normal_style=normal_style,
+        info_table_style=info_table_style,
+    )
+
+
+_resources: Optional[PDFResources] = None
+_resources_lock = threading.Lock()
+
+
+def get_pdf_resources() -> PDFResources:
+    """Lấy tài nguyên PDF dùng chung (đăng ký font và dựng style ở lần gọi đầu tiên)"""
+    global _resources
+    with _resources_lock:
+        if _resources is None:
+            _resources = _build_resources()
+        return _resources
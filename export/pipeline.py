@@ -0,0 +1,443 @@
+# export/pipeline.py
+"""Dây chuyền xử lý hàng loạt file phương án: đọc DOCX → tính chỉ tiêu → xuất file, có checkpoint để chạy tiếp"""
+
+import csv
+import json
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from export.batch import DEFAULT_KINDS, DocumentResult, _safe_name, render_case
+from logic.case_data import CASE_DEFAULTS, compute_case, normalize_case
+from src.config import BATCH_IN_FLIGHT_PER_WORKER, BATCH_MAX_WORKERS
+
+CHECKPOINT_NAME = 'checkpoint.jsonl'
+PORTFOLIO_NAME = 'danh_muc.csv'
+FILES_DIR = 'ho_so'
+
+STATUS_OK = 'ok'
+STATUS_ERROR = 'error'
+
+# Cột bảng tổng hợp danh mục: (khóa trong dòng checkpoint, tiêu đề)
+PORTFOLIO_COLUMNS = (
+    ('index', 'STT'),
+    ('source', 'File phương án'),
+    ('customer_name', 'Khách hàng'),
+    ('cccd', 'CCCD'),
+    ('purpose', 'Mục đích vay'),
+    ('loan_amount', 'Số tiền vay'),
+    ('interest_rate', 'Lãi suất (%/năm)'),
+    ('loan_term', 'Thời hạn (tháng)'),
+    ('monthly_payment', 'Trả nợ tháng đầu'),
+    ('monthly_income', 'Thu nhập tháng'),
+    ('net_cash_flow', 'Dòng tiền ròng'),
+    ('dsr', 'DSR (%)'),
+    ('ltv', 'LTV (%)'),
+    ('risk_level', 'Mức rủi ro'),
+    ('assessment', 'Đánh giá'),
+    ('status', 'Trạng thái'),
+    ('error', 'Lỗi'),
+)
+
+# Đánh dấu hết dữ liệu trong hàng đợi giữa các công đoạn
+_DONE = object()
+
+
+@dataclass
+class CaseItem:
+    """Một file phương án đi qua các công đoạn"""
+    index: int
+    path: str
+    source: str
+    fingerprint: Tuple[int, int]
+    record: Optional[Dict[str, Any]] = None
+    summary: Optional[Dict[str, Any]] = None
+    documents: List[DocumentResult] = field(default_factory=list)
+    files: List[str] = field(default_factory=list)
+    timings: Dict[str, float] = field(default_factory=dict)
+    error: str = ""
+
+    @property
+    def ok(self) -> bool:
+        return not self.error
+
+
+@dataclass
+class PipelineReport:
+    """Tổng hợp một lần chạy"""
+    processed: List[CaseItem] = field(default_factory=list)
+    skipped: int = 0
+    elapsed: float = 0.0
+
+    @property
+    def failed(self) -> List[CaseItem]:
+        return [item for item in self.processed if not item.ok]
+
+
+def list_inputs(folder: Optional[str] = None, manifest: Optional[str] = None) -> List[Tuple[str, str]]:
+    """
+    Danh sách file phương án cần xử lý (thứ tự cố định)
+
+    Tên của mỗi file (khóa checkpoint, cột "File phương án") là đường dẫn
+    tương đối theo thư mục --input hoặc thư mục của manifest, nên không đổi
+    khi thêm/bớt file khác giữa các lần chạy.
+
+    Args:
+        folder: Thư mục chứa file .docx (tìm cả thư mục con)
+        manifest: File văn bản, mỗi dòng một đường dẫn .docx (tương đối theo
+            thư mục của manifest; dòng trống và dòng bắt đầu bằng # bị bỏ qua)
+
+    Returns:
+        Danh sách (đường dẫn tuyệt đối, tên file)
+    """
+    found = []  # (đường dẫn, thư mục gốc để đặt tên)
+    if folder:
+        folder_paths = []
+        for root, _, names in os.walk(folder):
+            folder_paths.extend(os.path.join(root, name) for name in names
+                                if name.lower().endswith('.docx') and not name.startswith('~$'))
+        found.extend((path, folder) for path in sorted(folder_paths))
+    if manifest:
+        base = os.path.dirname(os.path.abspath(manifest))
+        with open(manifest, encoding='utf-8-sig') as f:
+            for line in f:
+                line = line.strip()
+                if line and not line.startswith('#'):
+                    found.append((os.path.join(base, line), base))
+
+    inputs = []
+    seen_paths = set()
+    seen_sources = set()
+    for path, base in found:
+        path = os.path.abspath(path)
+        if path in seen_paths:
+            continue
+        source = os.path.relpath(path, os.path.abspath(base)).replace(os.sep, '/')
+        if source in seen_sources:
+            # Trùng tên tương đối giữa --input và manifest: dùng đường dẫn tuyệt đối
+            source = path
+        seen_paths.add(path)
+        seen_sources.add(source)
+        inputs.append((path, source))
+    return inputs
+
+
+def parse_plan(path: str) -> Dict[str, Any]:
+    """
+    Đọc một file phương án (chạy trong process con)
+
+    Returns:
+        Hồ sơ gồm customer_info, loan_info, collateral_info, financial_info
+    """
+    from src.docx_parser_v2 import DocxParserV2
+
+    parsed = DocxParserV2(path).parse_full_document()
+    return {section: parsed[section] for section in CASE_DEFAULTS}
+
+
+def load_checkpoint(path: str) -> Dict[str, Dict[str, Any]]:
+    """
+    Đọc checkpoint: dòng cuối cùng của mỗi file phương án
+
+    Dòng ghi dở (process bị dừng giữa chừng) bị bỏ qua.
+
+    Returns:
+        {đường dẫn tương đối của file: dòng checkpoint}
+    """
+    entries = {}
+    if not os.path.exists(path):
+        return entries
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            entries[entry['source']] = entry
+    return entries
+
+
+def _atomic_write(path: str, content: bytes):
+    """Ghi file qua file tạm rồi đổi tên, không để lại file dở nếu bị dừng"""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(content)
+    os.replace(tmp_path, path)
+
+
+def _checkpoint_entry(item: CaseItem) -> Dict[str, Any]:
+    """Dòng checkpoint của một hồ sơ (cũng là một dòng của bảng tổng hợp)"""
+    record = item.record or {}
+    customer_info = record.get('customer_info') or {}
+    loan_info = record.get('loan_info') or {}
+    summary = item.summary or {}
+    return {
+        'source': item.source,
+        'fingerprint': list(item.fingerprint),
+        'files': item.files,
+        'timings': {stage: round(seconds, 3) for stage, seconds in item.timings.items()},
+        'row': {
+            'index': item.index,
+            'source': item.source,
+            'customer_name': customer_info.get('name', ''),
+            'cccd': customer_info.get('cccd', ''),
+            'purpose': loan_info.get('purpose', ''),
+            'loan_amount': loan_info.get('loan_amount', ''),
+            'interest_rate': loan_info.get('interest_rate', ''),
+            'loan_term': loan_info.get('loan_term', ''),
+            'monthly_payment': summary.get('monthly_payment', ''),
+            'monthly_income': summary.get('monthly_income', ''),
+            'net_cash_flow': summary.get('net_cash_flow', ''),
+            'dsr': summary.get('dsr', ''),
+            'ltv': summary.get('ltv', ''),
+            'risk_level': summary.get('risk_level', ''),
+            'assessment': summary.get('assessment', ''),
+            'status': STATUS_OK if item.ok else STATUS_ERROR,
+            'error': item.error,
+        },
+    }
+
+
+def write_portfolio(path: str, entries: Iterable[Dict[str, Any]]):
+    """Ghi bảng tổng hợp danh mục (CSV, mỗi hồ sơ một dòng theo STT)"""
+    rows = sorted((entry['row'] for entry in entries), key=lambda row: row['index'])
+    with open(f"{path}.tmp", 'w', encoding='utf-8-sig', newline='') as f:
+        # BOM để Excel mở đúng tiếng Việt
+        writer = csv.writer(f)
+        writer.writerow([title for _, title in PORTFOLIO_COLUMNS])
+        for row in rows:
+            writer.writerow([row.get(key, '') for key, _ in PORTFOLIO_COLUMNS])
+    os.replace(f"{path}.tmp", path)
+
+
+class BatchPipeline:
+    """
+    Dây chuyền đọc → tính → xuất cho nhiều file phương án
+
+    Ba công đoạn nối với nhau bằng hàng đợi có giới hạn: đọc DOCX và xuất
+    file chạy trên cùng một process pool (nhiều hồ sơ ở các công đoạn khác
+    nhau chạy đồng thời trên các CPU), tính chỉ tiêu chạy ngay trong process
+    chính vì rất nhanh. Hàng đợi đầy thì công đoạn trước dừng chờ, nên bộ
+    nhớ không tăng theo số file. Mỗi hồ sơ xong được ghi ngay một dòng vào
+    checkpoint; chạy lại trên cùng thư mục kết quả sẽ bỏ qua các file đã
+    xử lý (và chưa bị sửa).
+    """
+
+    def __init__(self, output_dir: str, kinds: Sequence[str] = DEFAULT_KINDS,
+                 max_workers: int = BATCH_MAX_WORKERS,
+                 queue_size: Optional[int] = None,
+                 retry_failed: bool = False,
+                 on_progress: Optional[Callable[[CaseItem, int, int], None]] = None):
+        """
+        Khởi tạo
+
+        Args:
+            output_dir: Thư mục kết quả (file từng hồ sơ, checkpoint, bảng tổng hợp)
+            kinds: Các loại file xuất cho mỗi hồ sơ ('pdf', 'docx', 'excel'); rỗng để chỉ tính chỉ tiêu
+            max_workers: Số process đọc DOCX/xuất file
+            queue_size: Sức chứa mỗi hàng đợi giữa các công đoạn (mặc định 2 × max_workers)
+            retry_failed: Xử lý lại cả các file lần trước bị lỗi
+            on_progress: Hàm được gọi sau mỗi hồ sơ (hồ sơ, số đã xong, tổng số cần xử lý)
+        """
+        self.output_dir = output_dir
+        self.kinds = tuple(kinds)
+        self.max_workers = max_workers
+        self.queue_size = queue_size or max_workers * BATCH_IN_FLIGHT_PER_WORKER
+        self.retry_failed = retry_failed
+        self.on_progress = on_progress
+        self.checkpoint_path = os.path.join(output_dir, CHECKPOINT_NAME)
+        self.portfolio_path = os.path.join(output_dir, PORTFOLIO_NAME)
+        self.files_dir = os.path.join(output_dir, FILES_DIR)
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    # ----- Công đoạn -----
+
+    def _parse(self, item: CaseItem) -> CaseItem:
+        started = time.perf_counter()
+        try:
+            item.record = self._executor.submit(parse_plan, item.path).result()
+        except Exception as e:
+            item.error = f"Không đọc được file: {e}"
+        item.timings['parse'] = time.perf_counter() - started
+        return item
+
+    def _compute(self, item: CaseItem) -> CaseItem:
+        if not item.ok:
+            return item
+        started = time.perf_counter()
+        try:
+            case = normalize_case(item.record)
+            if case['loan_info']['loan_amount'] <= 0:
+                raise ValueError("không tìm thấy số tiền vay")
+            item.summary, _ = compute_case(case)
+            item.record = {section: case[section] for section in CASE_DEFAULTS}
+        except Exception as e:
+            item.error = f"Dữ liệu hồ sơ không hợp lệ: {e}"
+        item.timings['compute'] = time.perf_counter() - started
+        return item
+
+    def _render(self, item: CaseItem) -> CaseItem:
+        if not item.ok:
+            return item
+        started = time.perf_counter()
+        name = item.record['customer_info']['name']
+        # Dữ liệu hồ sơ và chỉ tiêu, để nạp lại hoặc đối chiếu sau này
+        data_name = f"{item.index:04d}_Ho_so_{_safe_name(name)}.json"
+        _atomic_write(os.path.join(self.files_dir, data_name), json.dumps(
+            {'source': item.source, **item.record, 'summary': item.summary},
+            ensure_ascii=False, indent=2
+        ).encode('utf-8'))
+        item.files.append(data_name)
+        if self.kinds:
+            try:
+                outputs = self._executor.submit(render_case, item.index, item.record, self.kinds).result()
+            except Exception as e:
+                # Process con chết (hết bộ nhớ, bị kill...)
+                outputs = [(DocumentResult(item.index, name, kind, error=f"Lỗi process render: {e}"), None)
+                           for kind in self.kinds]
+            for result, content in outputs:
+                if content is not None:
+                    _atomic_write(os.path.join(self.files_dir, result.filename), content)
+                    item.files.append(result.filename)
+                item.documents.append(result)
+            errors = [f"{doc.kind}: {doc.error}" for doc in item.documents if not doc.ok]
+            if errors:
+                item.error = '; '.join(errors)
+        item.timings['render'] = time.perf_counter() - started
+        return item
+
+    def _start_stage(self, fn: Callable[[CaseItem], CaseItem], inbox: queue.Queue,
+                     outbox: queue.Queue, threads: int) -> List[threading.Thread]:
+        """
+        Chạy một công đoạn trên nhiều thread: lấy từ inbox, xử lý, đẩy sang outbox
+
+        Khi gặp _DONE, thread trả lại _DONE cho các thread cùng công đoạn;
+        thread cuối cùng kết thúc thì báo _DONE cho công đoạn sau. Lỗi của fn
+        được ghi vào item.error và hồ sơ vẫn đi tiếp, để run() không bị treo.
+        """
+        remaining = [threads]
+        lock = threading.Lock()
+
+        def work():
+            try:
+                while True:
+                    item = inbox.get()
+                    if item is _DONE:
+                        inbox.put(_DONE)
+                        break
+                    try:
+                        item = fn(item)
+                    except Exception as e:
+                        # Lỗi ngoài dự kiến (ghi file thất bại...) chỉ làm hỏng hồ sơ này
+                        item.error = f"Lỗi công đoạn {fn.__name__.strip('_')}: {e}"
+                    outbox.put(item)
+            finally:
+                with lock:
+                    remaining[0] -= 1
+                    if remaining[0] == 0:
+                        outbox.put(_DONE)
+
+        workers = [threading.Thread(target=work, name=f'cadap-pipeline-{fn.__name__.strip("_")}-{i}',
+                                    daemon=True) for i in range(threads)]
+        for worker in workers:
+            worker.start()
+        return workers
+
+    # ----- Chạy -----
+
+    def pending_items(self, inputs: Sequence[Tuple[str, str]],
+                      checkpoint: Dict[str, Dict[str, Any]]) -> Tuple[List[CaseItem], int]:
+        """
+        Các file cần xử lý trong lần chạy này
+
+        STT của hồ sơ được ghi trong checkpoint và giữ nguyên giữa các lần
+        chạy tiếp; file mới nhận STT tiếp theo STT lớn nhất đã cấp. File đã có
+        trong checkpoint với cùng kích thước và thời điểm sửa được bỏ qua
+        (trừ khi lỗi và retry_failed).
+
+        Returns:
+            (các hồ sơ cần xử lý, số file bỏ qua)
+        """
+        items = []
+        skipped = 0
+        next_index = max((entry['row']['index'] for entry in checkpoint.values()), default=0) + 1
+        for path, source in inputs:
+            try:
+                stat = os.stat(path)
+                fingerprint = (stat.st_size, stat.st_mtime_ns)
+            except OSError:
+                fingerprint = (0, 0)
+            entry = checkpoint.get(source)
+            if entry and tuple(entry['fingerprint']) == fingerprint and (
+                    entry['row']['status'] == STATUS_OK or not self.retry_failed):
+                skipped += 1
+                continue
+            if entry:
+                index = entry['row']['index']
+            else:
+                index = next_index
+                next_index += 1
+            items.append(CaseItem(index, path, source, fingerprint))
+        return items, skipped
+
+    def run(self, inputs: Sequence[Tuple[str, str]]) -> PipelineReport:
+        """
+        Xử lý các file phương án, ghi file từng hồ sơ, checkpoint và bảng tổng hợp
+
+        Args:
+            inputs: Các cặp (đường dẫn .docx, tên file) (xem list_inputs)
+
+        Returns:
+            PipelineReport của lần chạy này (bảng tổng hợp gồm cả các lần trước)
+        """
+        os.makedirs(self.files_dir, exist_ok=True)
+        checkpoint = load_checkpoint(self.checkpoint_path)
+        items, skipped = self.pending_items(inputs, checkpoint)
+        report = PipelineReport(skipped=skipped)
+        start = time.perf_counter()
+
+        parse_queue: queue.Queue = queue.Queue(self.queue_size)
+        compute_queue: queue.Queue = queue.Queue(self.queue_size)
+        render_queue: queue.Queue = queue.Queue(self.queue_size)
+        done_queue: queue.Queue = queue.Queue(self.queue_size)
+
+        def feed():
+            for item in items:
+                parse_queue.put(item)
+            parse_queue.put(_DONE)
+
+        # 'spawn': không fork process (có thể là server Streamlit) đang chạy nhiều thread
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=self.max_workers, mp_context=context) as executor, \
+                open(self.checkpoint_path, 'a', encoding='utf-8') as checkpoint_file:
+            self._executor = executor
+            threading.Thread(target=feed, name='cadap-pipeline-feed', daemon=True).start()
+            # Mỗi công đoạn dùng process pool giữ đủ việc cho mọi process
+            self._start_stage(self._parse, parse_queue, compute_queue, self.max_workers)
+            self._start_stage(self._compute, compute_queue, render_queue, 1)
+            self._start_stage(self._render, render_queue, done_queue, self.max_workers)
+
+            while True:
+                item = done_queue.get()
+                if item is _DONE:
+                    break
+                entry = _checkpoint_entry(item)
+                checkpoint_file.write(json.dumps(entry, ensure_ascii=False) + '\n')
+                checkpoint_file.flush()
+                checkpoint[item.source] = entry
+                report.processed.append(item)
+                if self.on_progress:
+                    self.on_progress(item, len(report.processed), len(items))
+            self._executor = None
+
+        report.elapsed = time.perf_counter() - start
+        # Chỉ các file trong danh sách đầu vào lần này
+        sources = {source for _, source in inputs}
+        write_portfolio(self.portfolio_path, (entry for source, entry in checkpoint.items()
+                                              if source in sources))
+        return report
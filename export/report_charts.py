@@ -0,0 +1,115 @@
+# export/report_charts.py
+"""Vẽ biểu đồ cho báo cáo PDF: song song trên process pool, nhúng dạng vector nếu có svglib"""
+
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+from src.config import REPORT_CHART_WORKERS
+
+try:
+    from svglib.svglib import svg2rlg
+    HAS_SVGLIB = True
+except ImportError:  # svglib là phụ thuộc tùy chọn, thiếu thì nhúng ảnh PNG
+    HAS_SVGLIB = False
+
+# (tên biểu đồ, phương thức ChartGenerator, tham số)
+ChartSpec = Tuple[str, str, tuple]
+
+
+def build_report_chart_specs(data: Dict, schedule: List[Dict]) -> List[ChartSpec]:
+    """
+    Danh sách biểu đồ cần đưa vào báo cáo
+
+    Args:
+        data: Dữ liệu báo cáo (logic.case_data.build_report_data)
+        schedule: Lịch trả nợ
+
+    Returns:
+        Danh sách (tên, phương thức ChartGenerator, tham số)
+    """
+    specs = []
+    if schedule:
+        specs.append(('Lịch trả nợ hàng tháng', 'plot_payment_schedule', (schedule,)))
+        specs.append(('Phân tích dòng tiền', 'plot_cash_flow',
+                      (schedule, data.get('monthly_income', 0), data.get('monthly_expense', 0))))
+    if data.get('total_need', 0) > 0:
+        specs.append(('Cơ cấu nguồn vốn', 'plot_capital_allocation',
+                      (data['total_need'], data.get('equity', 0), data.get('loan_amount', 0))))
+    if data.get('monthly_income', 0) > 0:
+        specs.append(('So sánh thu nhập và nghĩa vụ', 'plot_debt_ratio',
+                      (data['monthly_income'], data.get('monthly_payment', 0),
+                       data.get('monthly_expense', 0), data.get('other_debt', 0))))
+    if schedule:
+        specs.append(('Dư nợ giảm dần', 'plot_remaining_balance', (schedule,)))
+    return specs
+
+
+def render_report_image(method: str, args: tuple, image_format: str) -> Any:
+    """
+    Vẽ một biểu đồ cho báo cáo (chạy trong process con)
+
+    Việc chuyển SVG sang Drawing cũng tốn thời gian tương đương vẽ nên được
+    làm luôn trong process con; Drawing pickle về process chính rất nhanh.
+
+    Args:
+        method: Tên phương thức ChartGenerator
+        args: Tham số của phương thức
+        image_format: 'svg' hoặc 'png'
+
+    Returns:
+        reportlab Drawing (svg) hoặc BytesIO PNG
+    """
+    from ui.chart_generator import ChartGenerator
+
+    buf = getattr(ChartGenerator(image_format), method)(*args)
+    if image_format == 'svg':
+        return svg2rlg(buf)
+    return buf
+
+
+_executor: Optional[ProcessPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def get_chart_executor() -> ProcessPoolExecutor:
+    """Process pool vẽ biểu đồ dùng chung trong process (giữ ấm giữa các lần xuất)"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            # 'spawn': không fork process server Streamlit đang chạy nhiều thread
+            _executor = ProcessPoolExecutor(max_workers=REPORT_CHART_WORKERS,
+                                            mp_context=multiprocessing.get_context('spawn'))
+        return _executor
+
+
+def render_report_charts(data: Dict, schedule: List[Dict],
+                         parallel: bool = True) -> Dict[str, Any]:
+    """
+    Vẽ các biểu đồ của báo cáo
+
+    Mỗi biểu đồ được vẽ trong một process riêng; khi có svglib, biểu đồ được
+    xuất SVG và nhúng vào PDF dạng vector thay vì ảnh PNG raster.
+
+    Args:
+        data: Dữ liệu báo cáo
+        schedule: Lịch trả nợ
+        parallel: Vẽ song song trên process pool (False khi đã chạy trong process con)
+
+    Returns:
+        Dictionary {tên biểu đồ: Drawing hoặc BytesIO PNG} theo thứ tự báo cáo
+    """
+    image_format = 'svg' if HAS_SVGLIB else 'png'
+    specs = build_report_chart_specs(data, schedule)
+
+    # Máy một CPU: process pool chỉ thêm chi phí, vẽ luôn trong process hiện tại
+    if parallel and REPORT_CHART_WORKERS > 1 and len(specs) > 1:
+        executor = get_chart_executor()
+        futures = [executor.submit(render_report_image, method, args, image_format)
+                   for _, method, args in specs]
+        images = [future.result() for future in futures]
+    else:
+        images = [render_report_image(method, args, image_format) for _, method, args in specs]
+
+    return {name: image for (name, _, _), image in zip(specs, images)}
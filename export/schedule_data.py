@@ -0,0 +1,187 @@
+# export/schedule_data.py
+"""Xuất lịch trả nợ dạng dữ liệu (CSV, JSON Lines, Parquet) cho hệ thống core banking/kho dữ liệu"""
+
+import io
+import json
+from typing import BinaryIO, Dict, Iterable, List, Optional
+
+import numpy as np
+
+from logic.financial_calculator import FinancialCalculator
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    HAS_PYARROW = True
+except ImportError:  # pyarrow là phụ thuộc tùy chọn, chỉ cần cho Parquet
+    HAS_PYARROW = False
+
+FORMAT_CSV = 'csv'
+FORMAT_JSONL = 'jsonl'
+FORMAT_PARQUET = 'parquet'
+
+# Phần mở rộng và MIME type của từng định dạng
+FORMATS = {
+    FORMAT_CSV: ('.csv', 'text/csv'),
+    FORMAT_JSONL: ('.jsonl', 'application/x-ndjson'),
+    FORMAT_PARQUET: ('.parquet', 'application/vnd.apache.parquet'),
+}
+
+SCHEDULE_COLUMNS = ['month', 'principal', 'interest', 'total_payment', 'remaining_balance']
+LOAN_ID_COLUMN = 'loan_id'
+
+# Số dòng tối đa gom vào một row group Parquet
+PARQUET_ROW_GROUP_ROWS = 65536
+
+
+def available_formats() -> List[str]:
+    """Các định dạng dùng được trong môi trường hiện tại"""
+    return [fmt for fmt in FORMATS if fmt != FORMAT_PARQUET or HAS_PYARROW]
+
+
+class ScheduleDataExporter:
+    """
+    Ghi lịch trả nợ dạng cột (FinancialCalculator.calculate_schedule_arrays)
+
+    Dữ liệu được ghi thẳng từ các mảng numpy của từng khoản vay, không qua
+    dictionary từng kỳ hay DataFrame; danh mục được ghi lần lượt từng khoản
+    nên bộ nhớ không tăng theo số khoản vay.
+    """
+
+    def __init__(self, fmt: str = FORMAT_CSV):
+        """
+        Khởi tạo exporter
+
+        Args:
+            fmt: Định dạng ('csv', 'jsonl', 'parquet')
+
+        Raises:
+            ValueError: Định dạng không hỗ trợ hoặc thiếu pyarrow cho Parquet
+        """
+        if fmt not in FORMATS:
+            raise ValueError(f"Định dạng không hỗ trợ: {fmt}")
+        if fmt == FORMAT_PARQUET and not HAS_PYARROW:
+            raise ValueError("Xuất Parquet cần cài đặt pyarrow")
+        self.fmt = fmt
+
+    # ----- Định dạng dòng văn bản -----
+
+    @staticmethod
+    def _text_row_format(fmt: str, loan_id: Optional[str]) -> str:
+        """Mẫu % cho một dòng CSV/JSONL (mã khoản vay được nhúng sẵn)"""
+        if fmt == FORMAT_CSV:
+            prefix = ''
+            if loan_id is not None:
+                prefix = '"' + loan_id.replace('"', '""').replace('%', '%%') + '",'
+            return prefix + '%d,%.2f,%.2f,%.2f,%.2f\n'
+
+        prefix = '{'
+        if loan_id is not None:
+            prefix += f'"{LOAN_ID_COLUMN}": ' + json.dumps(loan_id, ensure_ascii=False).replace('%', '%%') + ', '
+        return (prefix + '"month": %d, "principal": %.2f, "interest": %.2f, '
+                '"total_payment": %.2f, "remaining_balance": %.2f}\n')
+
+    @staticmethod
+    def _write_text_rows(output: BinaryIO, row_format: str, arrays: Dict[str, np.ndarray]):
+        """Ghi các kỳ của một khoản vay theo mẫu dòng"""
+        rows = zip(*(arrays[column].tolist() for column in SCHEDULE_COLUMNS))
+        output.write(''.join(row_format % row for row in rows).encode('utf-8'))
+
+    # ----- Parquet -----
+
+    @staticmethod
+    def _parquet_schema(with_loan_id: bool) -> 'pa.Schema':
+        fields = [pa.field(LOAN_ID_COLUMN, pa.string())] if with_loan_id else []
+        fields.append(pa.field('month', pa.int64()))
+        fields.extend(pa.field(column, pa.float64()) for column in SCHEDULE_COLUMNS[1:])
+        return pa.schema(fields)
+
+    @staticmethod
+    def _record_batch(arrays: Dict[str, np.ndarray], schema: 'pa.Schema',
+                      loan_id: Optional[str]) -> 'pa.RecordBatch':
+        """RecordBatch tham chiếu thẳng bộ nhớ các mảng numpy (không sao chép cột số)"""
+        columns = []
+        if loan_id is not None:
+            columns.append(pa.repeat(pa.scalar(loan_id, pa.string()), len(arrays['month'])))
+        columns.extend(pa.array(arrays[column]) for column in SCHEDULE_COLUMNS)
+        return pa.RecordBatch.from_arrays(columns, schema=schema)
+
+    # ----- Xuất -----
+
+    def export_schedule(self, arrays: Dict[str, np.ndarray],
+                        output: Optional[BinaryIO] = None,
+                        loan_id: Optional[str] = None) -> BinaryIO:
+        """
+        Xuất lịch trả nợ của một khoản vay
+
+        Args:
+            arrays: Lịch trả nợ dạng cột (calculate_schedule_arrays)
+            output: File/stream nhị phân đích (mặc định: BytesIO mới)
+            loan_id: Mã khoản vay (tùy chọn, thêm cột loan_id)
+
+        Returns:
+            Stream chứa dữ liệu
+        """
+        created = output is None
+        output = io.BytesIO() if created else output
+        loan_id = None if loan_id is None else str(loan_id)
+
+        if self.fmt == FORMAT_PARQUET:
+            schema = self._parquet_schema(loan_id is not None)
+            with pq.ParquetWriter(output, schema) as writer:
+                writer.write_batch(self._record_batch(arrays, schema, loan_id))
+        else:
+            if self.fmt == FORMAT_CSV:
+                header = ([LOAN_ID_COLUMN] if loan_id is not None else []) + SCHEDULE_COLUMNS
+                output.write((','.join(header) + '\n').encode('utf-8'))
+            self._write_text_rows(output, self._text_row_format(self.fmt, loan_id), arrays)
+
+        if created:
+            output.seek(0)
+        return output
+
+    def export_portfolio(self, loans: Iterable[Dict],
+                         output: Optional[BinaryIO] = None) -> BinaryIO:
+        """
+        Xuất lịch trả nợ của cả danh mục vào một file (cột loan_id phân biệt khoản vay)
+
+        Args:
+            loans: Các khoản vay (loan_amount, interest_rate, loan_term,
+                loan_id tùy chọn - mặc định là số thứ tự)
+            output: File/stream nhị phân đích (mặc định: BytesIO mới)
+
+        Returns:
+            Stream chứa dữ liệu
+        """
+        created = output is None
+        output = io.BytesIO() if created else output
+
+        def schedules():
+            for index, loan in enumerate(loans, start=1):
+                calc = FinancialCalculator(loan['loan_amount'], loan['interest_rate'], int(loan['loan_term']))
+                yield str(loan.get('loan_id', index)), calc.calculate_schedule_arrays()
+
+        if self.fmt == FORMAT_PARQUET:
+            schema = self._parquet_schema(True)
+            with pq.ParquetWriter(output, schema) as writer:
+                # Gom nhiều khoản vay vào một row group thay vì một row group mỗi khoản
+                pending, pending_rows = [], 0
+                for loan_id, arrays in schedules():
+                    pending.append(self._record_batch(arrays, schema, loan_id))
+                    pending_rows += len(arrays['month'])
+                    if pending_rows >= PARQUET_ROW_GROUP_ROWS:
+                        writer.write_table(pa.Table.from_batches(pending, schema),
+                                           row_group_size=pending_rows)
+                        pending, pending_rows = [], 0
+                if pending:
+                    writer.write_table(pa.Table.from_batches(pending, schema),
+                                       row_group_size=pending_rows)
+        else:
+            if self.fmt == FORMAT_CSV:
+                output.write((','.join([LOAN_ID_COLUMN] + SCHEDULE_COLUMNS) + '\n').encode('utf-8'))
+            for loan_id, arrays in schedules():
+                self._write_text_rows(output, self._text_row_format(self.fmt, loan_id), arrays)
+
+        if created:
+            output.seek(0)
+        return output
@@ -0,0 +1,221 @@
+# logic/case_data.py
+"""Chuẩn hóa hồ sơ vay và dựng dữ liệu báo cáo dùng chung cho giao diện và xuất hàng loạt"""
+
+from typing import Any, Dict, List, Tuple
+
+from logic.financial_calculator import FinancialCalculator
+from src.config import DEFAULT_INTEREST_RATE, DEFAULT_LOAN_TERM, DEFAULT_LTV
+from src.utils import format_number
+
+
+# Giá trị mặc định của một hồ sơ, cùng cấu trúc với session state và DocxParserV2
+CASE_DEFAULTS: Dict[str, Dict[str, Any]] = {
+    'customer_info': {
+        'name': 'Khách hàng', 'cccd': '', 'address': '', 'phone': ''
+    },
+    'loan_info': {
+        'purpose': 'Kinh doanh',
+        'total_need': 0.0,
+        'equity': 0.0,
+        'loan_amount': 0.0,
+        'interest_rate': DEFAULT_INTEREST_RATE,
+        'loan_term': DEFAULT_LOAN_TERM,
+    },
+    'collateral_info': {
+        'asset_type': 'Bất động sản',
+        'market_value': 0.0,
+        'asset_address': '',
+        'ltv': float(DEFAULT_LTV),
+        'legal_docs': 'Sổ đỏ'
+    },
+    'financial_info': {
+        'monthly_income': 0.0,
+        'monthly_expense': 0.0,
+        'other_debt': 0.0
+    },
+}
+
+
+def normalize_case(record: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Bổ sung các trường còn thiếu của hồ sơ bằng giá trị mặc định
+
+    Args:
+        record: Hồ sơ gồm customer_info, loan_info, collateral_info,
+            financial_info (có thể thiếu trường) và ai_analysis (tùy chọn)
+
+    Returns:
+        Hồ sơ đầy đủ (bản sao, không sửa record gốc)
+    """
+    case = {section: {**defaults, **(record.get(section) or {})}
+            for section, defaults in CASE_DEFAULTS.items()}
+    case['loan_info']['loan_term'] = int(case['loan_info']['loan_term'])
+    case['ai_analysis'] = record.get('ai_analysis', '')
+    return case
+
+
+def build_calculator(case: Dict[str, Any]) -> FinancialCalculator:
+    """Tạo FinancialCalculator từ hồ sơ"""
+    loan_info = case['loan_info']
+    financial_info = case['financial_info']
+    return FinancialCalculator(
+        loan_amount=loan_info['loan_amount'],
+        interest_rate=loan_info['interest_rate'],
+        loan_term=loan_info['loan_term'],
+        monthly_income=financial_info['monthly_income'],
+        monthly_expense=financial_info['monthly_expense'],
+        other_debt=financial_info['other_debt']
+    )
+
+
+def compute_case(case: Dict[str, Any]) -> Tuple[Dict[str, Any], List[Dict[str, float]]]:
+    """
+    Tính các chỉ tiêu và lịch trả nợ của hồ sơ
+
+    Args:
+        case: Hồ sơ đã chuẩn hóa
+
+    Returns:
+        (tóm tắt chỉ tiêu, lịch trả nợ)
+    """
+    calc = build_calculator(case)
+    summary = calc.get_summary(case['collateral_info']['market_value'])
+    return summary, calc.calculate_payment_schedule()
+
+
+def build_loan_info(case: Dict[str, Any]) -> Dict[str, Any]:
+    """Thông tin khoản vay cho bảng kê Excel"""
+    return {
+        'customer_name': case['customer_info']['name'],
+        'loan_amount': case['loan_info']['loan_amount'],
+        'interest_rate': case['loan_info']['interest_rate'],
+        'loan_term': case['loan_info']['loan_term']
+    }
+
+
+def build_report_data(case: Dict[str, Any], summary: Dict[str, Any],
+                      ai_analysis: str = '') -> Dict[str, Any]:
+    """
+    Dữ liệu cho báo cáo thẩm định PDF
+
+    Args:
+        case: Hồ sơ đã chuẩn hóa
+        summary: Kết quả FinancialCalculator.get_summary()
+        ai_analysis: Nội dung phân tích AI (tùy chọn)
+
+    Returns:
+        Dictionary theo định dạng của PDFExporter.create_assessment_report
+    """
+    customer_info = case['customer_info']
+    loan_info = case['loan_info']
+    collateral_info = case['collateral_info']
+    financial_info = case['financial_info']
+    return {
+        'customer_name': customer_info['name'],
+        'customer_cccd': customer_info['cccd'],
+        'customer_address': customer_info['address'],
+        'customer_phone': customer_info['phone'],
+        'loan_purpose': loan_info['purpose'],
+        'total_need': loan_info['total_need'],
+        'equity': loan_info['equity'],
+        'loan_amount': loan_info['loan_amount'],
+        'interest_rate': loan_info['interest_rate'],
+        'loan_term': loan_info['loan_term'],
+        'monthly_payment': summary['monthly_payment'],
+        'collateral_type': collateral_info['asset_type'],
+        'collateral_value': collateral_info['market_value'],
+        'asset_address': collateral_info['asset_address'],
+        'ltv': summary.get('ltv', 0),
+        'legal_docs': collateral_info['legal_docs'],
+        'monthly_income': financial_info['monthly_income'],
+        'monthly_expense': financial_info['monthly_expense'],
+        'other_debt': financial_info['other_debt'],
+        'net_cash_flow': summary['net_cash_flow'],
+        'dsr': summary['dsr'],
+        'safety_margin': summary['safety_margin'],
+        'assessment': summary['assessment'],
+        'risk_level': summary['risk_level'],
+        'can_repay': summary['can_repay'],
+        'ai_analysis': ai_analysis or case.get('ai_analysis', '')
+    }
+
+
+def build_analysis_data(case: Dict[str, Any], summary: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Số liệu gửi AI phân tích (GeminiClient.analyze_from_data)
+
+    Args:
+        case: Hồ sơ đã chuẩn hóa
+        summary: Kết quả FinancialCalculator.get_summary()
+
+    Returns:
+        Dictionary số liệu hồ sơ và chỉ tiêu
+    """
+    customer_info = case['customer_info']
+    loan_info = case['loan_info']
+    collateral_info = case['collateral_info']
+    financial_info = case['financial_info']
+    return {
+        'customer_name': customer_info['name'],
+        'customer_cccd': customer_info['cccd'],
+        'customer_address': customer_info['address'],
+        'loan_purpose': loan_info['purpose'],
+        'loan_amount': loan_info['loan_amount'],
+        'interest_rate': loan_info['interest_rate'],
+        'loan_term': loan_info['loan_term'],
+        'monthly_payment': summary['monthly_payment'],
+        'monthly_income': financial_info['monthly_income'],
+        'monthly_expense': financial_info['monthly_expense'],
+        'net_cash_flow': summary['net_cash_flow'],
+        'dsr': summary['dsr'],
+        'safety_margin': summary['safety_margin'],
+        'collateral_type': collateral_info['asset_type'],
+        'collateral_value': collateral_info['market_value'],
+        'ltv': summary.get('ltv', 0)
+    }
+
+
+def build_schedule_rows(schedule: List[Dict[str, float]],
+                        yearly_subtotals: bool = True) -> Tuple[List[List[str]], List[int]]:
+    """
+    Các dòng bảng kê trả nợ trong báo cáo (PDF, Word), đã định dạng số
+
+    Args:
+        schedule: Lịch trả nợ
+        yearly_subtotals: Thêm dòng cộng sau mỗi 12 kỳ
+
+    Returns:
+        (các dòng gồm dòng tiêu đề, chỉ số các dòng cộng năm/tổng cộng)
+    """
+    rows = [['Kỳ', 'Gốc (VND)', 'Lãi (VND)', 'Tổng trả (VND)', 'Dư nợ (VND)']]
+    summary_rows = []
+    year = {'principal': 0.0, 'interest': 0.0, 'total_payment': 0.0}
+    total = dict(year)
+
+    for index, period in enumerate(schedule, start=1):
+        rows.append([
+            str(period['month']),
+            format_number(period['principal']),
+            format_number(period['interest']),
+            format_number(period['total_payment']),
+            format_number(period['remaining_balance'])
+        ])
+        for key in year:
+            year[key] += period[key]
+            total[key] += period[key]
+
+        if yearly_subtotals and (index % 12 == 0 or index == len(schedule)):
+            summary_rows.append(len(rows))
+            rows.append([
+                f"Năm {(index - 1) // 12 + 1}",
+                format_number(year['principal']),
+                format_number(year['interest']),
+                format_number(year['total_payment']),
+                format_number(period['remaining_balance'])
+            ])
+            year = dict.fromkeys(year, 0.0)
+
+    summary_rows.append(len(rows))
+    rows.append(['TỔNG CỘNG', format_number(total['principal']),
+                 format_number(total['interest']), format_number(total['total_payment']), ''])
+    return rows, summary_rows
@@ -0,0 +1,277 @@
+# logic/case_model.py
+"""Mô hình hồ sơ phản ứng: đồ thị phụ thuộc từ dữ liệu nhập đến chỉ tiêu, lịch trả nợ, biểu đồ, báo cáo, AI"""
+
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from logic.case_data import (
+    CASE_DEFAULTS, build_analysis_data, build_calculator, build_loan_info, build_report_data
+)
+
+# Nhóm dữ liệu văn bản gốc của file phương án (nguồn của phân tích AI từ file)
+DOCUMENT_SECTION = 'document'
+DOCUMENT_DEFAULTS = {'raw_text': ''}
+
+
+def _inputs(section: str, *fields: str) -> Tuple[str, ...]:
+    """Khóa đầu vào dạng 'nhóm.trường'"""
+    return tuple(f'{section}.{field}' for field in fields)
+
+
+SCHEDULE_INPUTS = _inputs('loan_info', 'loan_amount', 'interest_rate', 'loan_term')
+SUMMARY_INPUTS = (
+    SCHEDULE_INPUTS
+    + _inputs('financial_info', 'monthly_income', 'monthly_expense', 'other_debt')
+    + _inputs('collateral_info', 'market_value')
+)
+
+
+@dataclass(frozen=True)
+class Node:
+    """
+    Giá trị dẫn xuất trong đồ thị
+
+    compute(model) chỉ được đọc các đầu vào/nút khai báo trong deps; kết quả
+    được ghi nhớ cho đến khi một phụ thuộc thực sự đổi giá trị.
+    """
+    name: str
+    deps: Tuple[str, ...]
+    compute: Callable[['CaseModel'], Any]
+
+
+def _summary(model: 'CaseModel') -> Optional[Dict[str, Any]]:
+    case = model.sections
+    if case['loan_info']['loan_amount'] <= 0:
+        return None
+    return build_calculator(case).get_summary(case['collateral_info']['market_value'])
+
+
+def _schedule(model: 'CaseModel') -> Optional[List[Dict[str, float]]]:
+    case = model.sections
+    if case['loan_info']['loan_amount'] <= 0:
+        return None
+    return build_calculator(case).calculate_payment_schedule()
+
+
+def _chart_data(model: 'CaseModel') -> Optional[Dict[str, tuple]]:
+    """Tham số của từng biểu đồ, theo tên phương thức ChartGenerator/InteractiveChartGenerator"""
+    summary = model.get('summary')
+    if summary is None:
+        return None
+    schedule = model.get('schedule')
+    loan_info = model.sections['loan_info']
+    financial_info = model.sections['financial_info']
+    return {
+        'plot_payment_schedule': (schedule,),
+        'plot_cash_flow': (schedule, financial_info['monthly_income'], financial_info['monthly_expense']),
+        'plot_capital_allocation': (loan_info['total_need'], loan_info['equity'], loan_info['loan_amount']),
+        'plot_debt_ratio': (financial_info['monthly_income'], summary['monthly_payment'],
+                            financial_info['monthly_expense'], financial_info['other_debt']),
+        'plot_remaining_balance': (schedule,),
+    }
+
+
+def _excel_loan_info(model: 'CaseModel') -> Dict[str, Any]:
+    return build_loan_info(model.sections)
+
+
+def _report_data(model: 'CaseModel') -> Optional[Dict[str, Any]]:
+    """Dữ liệu báo cáo PDF/Word (chưa gồm phân tích AI)"""
+    summary = model.get('summary')
+    if summary is None:
+        return None
+    return build_report_data(model.sections, summary)
+
+
+def _analysis_data(model: 'CaseModel') -> Optional[Dict[str, Any]]:
+    summary = model.get('summary')
+    if summary is None:
+        return None
+    return build_analysis_data(model.sections, summary)
+
+
+CASE_NODES = (
+    Node('summary', SUMMARY_INPUTS, _summary),
+    Node('schedule', SCHEDULE_INPUTS, _schedule),
+    Node('chart_data', (
+        'summary', 'schedule',
+        *_inputs('loan_info', 'total_need', 'equity', 'loan_amount'),
+        *_inputs('financial_info', 'monthly_income', 'monthly_expense', 'other_debt'),
+    ), _chart_data),
+    Node('excel_loan_info', (
+        'customer_info.name', *SCHEDULE_INPUTS
+    ), _excel_loan_info),
+    Node('report_data', (
+        'summary',
+        *_inputs('customer_info', 'name', 'cccd', 'address', 'phone'),
+        *_inputs('loan_info', 'purpose', 'total_need', 'equity', 'loan_amount', 'interest_rate', 'loan_term'),
+        *_inputs('collateral_info', 'asset_type', 'market_value', 'asset_address', 'legal_docs'),
+        *_inputs('financial_info', 'monthly_income', 'monthly_expense', 'other_debt'),
+    ), _report_data),
+    Node('analysis_data', (
+        'summary',
+        *_inputs('customer_info', 'name', 'cccd', 'address'),
+        *_inputs('loan_info', 'purpose', 'loan_amount', 'interest_rate', 'loan_term'),
+        *_inputs('collateral_info', 'asset_type', 'market_value'),
+        *_inputs('financial_info', 'monthly_income', 'monthly_expense'),
+    ), _analysis_data),
+)
+
+
+class _NodeState:
+    """Giá trị ghi nhớ của một nút"""
+    __slots__ = ('value', 'revision', 'dep_revisions', 'dirty')
+
+    def __init__(self):
+        self.value = None
+        self.revision = 0
+        self.dep_revisions: Optional[Tuple[int, ...]] = None
+        self.dirty = True
+
+
+class CaseModel:
+    """
+    Hồ sơ đang thẩm định cùng các giá trị dẫn xuất từ nó
+
+    Sửa một trường chỉ đánh dấu các nút phía sau trường đó (theo deps); nút
+    được tính lại khi có người đọc, và chỉ khi revision của một phụ thuộc đã
+    đổi. Revision của nút chỉ tăng khi giá trị tính lại khác giá trị cũ, nên
+    một thay đổi không làm đổi kết quả trung gian sẽ dừng lan truyền tại đó.
+    Revision cũng dùng để biết một kết quả (VD: phân tích AI) được tạo từ
+    dữ liệu nay đã cũ hay chưa.
+    """
+
+    def __init__(self, case: Optional[Dict[str, Dict[str, Any]]] = None,
+                 nodes: Iterable[Node] = CASE_NODES):
+        """
+        Khởi tạo
+
+        Args:
+            case: Dữ liệu hồ sơ theo nhóm (thiếu nhóm/trường dùng giá trị mặc định)
+            nodes: Các nút dẫn xuất
+        """
+        self._sections: Dict[str, Dict[str, Any]] = {
+            section: dict(defaults) for section, defaults in CASE_DEFAULTS.items()
+        }
+        self._sections[DOCUMENT_SECTION] = dict(DOCUMENT_DEFAULTS)
+        self._input_revisions: Dict[str, int] = {}
+        self._nodes: Dict[str, Node] = {node.name: node for node in nodes}
+        self._states: Dict[str, _NodeState] = {name: _NodeState() for name in self._nodes}
+        self._dependents: Dict[str, Set[str]] = {}
+        for node in self._nodes.values():
+            for dep in node.deps:
+                self._dependents.setdefault(dep, set()).add(node.name)
+        self.compute_counts: Dict[str, int] = dict.fromkeys(self._nodes, 0)
+        if case:
+            self.load(case)
+
+    @property
+    def sections(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Dữ liệu hồ sơ theo nhóm (customer_info, loan_info, ..., document)
+
+        Chỉ đọc: mọi thay đổi phải qua set()/load() để các nút được đánh dấu.
+        Các dictionary được giữ nguyên đối tượng suốt vòng đời mô hình.
+        """
+        return self._sections
+
+    # ----- Đầu vào -----
+
+    def set(self, section: str, field: str, value: Any) -> Set[str]:
+        """
+        Sửa một trường
+
+        Args:
+            section: Nhóm dữ liệu (VD: 'loan_info')
+            field: Tên trường
+            value: Giá trị mới
+
+        Returns:
+            Các nút bị đánh dấu cần tính lại (rỗng nếu giá trị không đổi)
+        """
+        values = self._sections[section]
+        if field in values and values[field] == value:
+            return set()
+        values[field] = value
+        return self._touch(f'{section}.{field}')
+
+    def load(self, case: Dict[str, Dict[str, Any]]) -> Set[str]:
+        """
+        Thay dữ liệu các nhóm có trong case (VD: hồ sơ vừa trích xuất từ file)
+
+        Args:
+            case: Dữ liệu theo nhóm; trường thiếu dùng giá trị mặc định
+
+        Returns:
+            Các nút bị đánh dấu cần tính lại
+        """
+        invalidated = set()
+        for section, values in case.items():
+            if section not in self._sections:
+                continue
+            defaults = DOCUMENT_DEFAULTS if section == DOCUMENT_SECTION else CASE_DEFAULTS[section]
+            new_values = {**defaults, **(values or {})}
+            current = self._sections[section]
+            changed = [field for field in set(current) | set(new_values)
+                       if field not in current or field not in new_values
+                       or current[field] != new_values[field]]
+            # Sửa tại chỗ để các tham chiếu tới dictionary của nhóm vẫn đúng
+            current.clear()
+            current.update(new_values)
+            for field in changed:
+                invalidated |= self._touch(f'{section}.{field}')
+        return invalidated
+
+    def _touch(self, key: str) -> Set[str]:
+        """Tăng revision của đầu vào và đánh dấu mọi nút phía sau"""
+        self._input_revisions[key] = self._input_revisions.get(key, 0) + 1
+        invalidated = set()
+        stack = [key]
+        while stack:
+            for name in self._dependents.get(stack.pop(), ()):
+                if name not in invalidated:
+                    invalidated.add(name)
+                    self._states[name].dirty = True
+                    stack.append(name)
+        return invalidated
+
+    # ----- Giá trị dẫn xuất -----
+
+    def revision(self, name: str) -> int:
+        """
+        Revision hiện tại của một nút hoặc đầu vào ('nhóm.trường'), tính lại nút nếu cần
+
+        Hai lần đọc cùng revision nghĩa là cùng giá trị.
+        """
+        state = self._states.get(name)
+        if state is None:
+            return self._input_revisions.get(name, 0)
+
+        if state.dirty:
+            node = self._nodes[name]
+            dep_revisions = tuple(self.revision(dep) for dep in node.deps)
+            if dep_revisions != state.dep_revisions:
+                value = node.compute(self)
+                self.compute_counts[name] += 1
+                if state.dep_revisions is None or value != state.value:
+                    state.value = value
+                    state.revision += 1
+                state.dep_revisions = dep_revisions
+            state.dirty = False
+        return state.revision
+
+    def get(self, name: str) -> Any:
+        """Giá trị của một nút (tính lại nếu phụ thuộc đã đổi)"""
+        self.revision(name)
+        return self._states[name].value
+
+    def value(self, name: str) -> Any:
+        """Giá trị của một nút hoặc đầu vào ('nhóm.trường')"""
+        if name in self._nodes:
+            return self.get(name)
+        section, field = name.split('.', 1)
+        return self._sections[section].get(field)
+
+    def is_dirty(self, name: str) -> bool:
+        """Nút đang chờ kiểm tra/tính lại"""
+        return self._states[name].dirty
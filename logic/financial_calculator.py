@@ -2,7 +2,8 @@
 """Module tính toán các chỉ tiêu tài chính"""
 
 import math
-from typing import Dict, List, Tuple
+from typing import Dict, Iterator, List, Tuple
+import numpy as np
 from src.utils import safe_divide
 
 
@@ -52,15 +53,14 @@ class FinancialCalculator:
         # Tổng trả tháng đầu
         return principal_payment + interest_payment
     
-    def calculate_payment_schedule(self) -> List[Dict[str, float]]:
+    def iter_payment_schedule(self) -> Iterator[Dict[str, float]]:
         """
-        Tính toán lịch trả nợ chi tiết theo từng tháng
+        Sinh lần lượt từng kỳ trả nợ (không giữ cả lịch trong bộ nhớ)
         Phương thức: Dư nợ giảm dần (trả gốc đều)
         
-        Returns:
-            Danh sách các kỳ trả nợ
+        Yields:
+            Kỳ trả nợ: month, principal, interest, total_payment, remaining_balance
         """
-        schedule = []
         remaining_balance = self.loan_amount
         monthly_principal = self.loan_amount / self.loan_term
         
@@ -81,20 +81,63 @@ class FinancialCalculator:
             if remaining_balance < 1:
                 remaining_balance = 0
             
-            schedule.append({
+            yield {
                 'month': month,
                 'principal': principal,
                 'interest': interest,
                 'total_payment': total_payment,
                 'remaining_balance': remaining_balance
-            })
+            }
+    
+    def calculate_payment_schedule(self) -> List[Dict[str, float]]:
+        """
+        Tính toán lịch trả nợ chi tiết theo từng tháng
+        Phương thức: Dư nợ giảm dần (trả gốc đều)
+        
+        Returns:
+            Danh sách các kỳ trả nợ
+        """
+        return list(self.iter_payment_schedule())
+    
+    def calculate_schedule_arrays(self) -> Dict[str, np.ndarray]:
+        """
+        Lịch trả nợ dạng cột (mỗi chỉ tiêu một mảng numpy), tính vector hóa
+        Cùng kết quả với iter_payment_schedule(), dùng cho xuất dữ liệu số lượng lớn
+        
+        Returns:
+            Dictionary {month, principal, interest, total_payment, remaining_balance: mảng}
+        """
+        term = max(int(self.loan_term), 0)
+        month = np.arange(1, term + 1, dtype=np.int64)
+        if term == 0:
+            empty = np.zeros(0)
+            return {'month': month, 'principal': empty, 'interest': empty.copy(),
+                    'total_payment': empty.copy(), 'remaining_balance': empty.copy()}
         
-        return schedule
+        monthly_principal = self.loan_amount / term
+        principal = np.full(term, monthly_principal)
+        
+        # Dư nợ cuối kỳ; làm tròn về 0 khi còn dưới 1 đồng (như iter_payment_schedule)
+        remaining_balance = self.loan_amount - np.cumsum(principal)
+        remaining_balance[remaining_balance < 1] = 0
+        
+        # Lãi tính trên dư nợ đầu kỳ
+        opening_balance = np.empty(term)
+        opening_balance[0] = self.loan_amount
+        opening_balance[1:] = remaining_balance[:-1]
+        interest = opening_balance * self.monthly_rate
+        
+        return {
+            'month': month,
+            'principal': principal,
+            'interest': interest,
+            'total_payment': principal + interest,
+            'remaining_balance': remaining_balance
+        }
     
     def calculate_total_interest(self) -> float:
         """Tính tổng lãi phải trả"""
-        schedule = self.calculate_payment_schedule()
-        return sum(period['interest'] for period in schedule)
+        return sum(period['interest'] for period in self.iter_payment_schedule())
     
     def calculate_total_payment(self) -> float:
         """Tính tổng số tiền phải trả (gốc + lãi)"""
@@ -191,6 +234,34 @@ class FinancialCalculator:
         ltv = (self.loan_amount / collateral_value) * 100
         return ltv
     
+    def calculate_max_loan_amount(self, max_dsr: float = 60.0,
+                                  collateral_value: float = 0,
+                                  max_ltv: float = 70.0) -> float:
+        """
+        Tính số tiền vay tối đa với lãi suất, thời hạn và thu nhập hiện tại
+        
+        Trả nợ tháng đầu (cao nhất) = Vay / Số tháng + Vay × Lãi suất tháng,
+        nên Vay tối đa = (Thu nhập × DSR tối đa - Nợ khác) / (1 / Số tháng + Lãi suất tháng)
+        
+        Args:
+            max_dsr: DSR tối đa cho phép (%)
+            collateral_value: Giá trị tài sản bảo đảm (0 = không giới hạn theo LTV)
+            max_ltv: LTV tối đa cho phép (%)
+            
+        Returns:
+            Số tiền vay tối đa (VND)
+        """
+        if self.monthly_income <= 0 or self.loan_term <= 0:
+            return 0.0
+        
+        available = self.monthly_income * max_dsr / 100 - self.other_debt
+        max_loan = max(0.0, available / (1 / self.loan_term + self.monthly_rate))
+        
+        if collateral_value > 0:
+            max_loan = min(max_loan, collateral_value * max_ltv / 100)
+        
+        return max_loan
+    
     def get_summary(self, collateral_value: float = 0) -> Dict[str, any]:
         """
         Lấy tóm tắt tất cả các chỉ tiêu
@@ -0,0 +1,165 @@
+# logic/portfolio.py
+"""Tổng hợp danh mục hồ sơ đã lưu: dư nợ, phân bố DSR/LTV, cơ cấu rủi ro, dòng tiền thu nợ theo tháng"""
+
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+
+from src.case_store import PORTFOLIO_FIELDS, RISK_LEVELS
+
+RISK_UNRATED = 'Chưa đánh giá'
+PORTFOLIO_RISK_LEVELS = RISK_LEVELS + (RISK_UNRATED,)
+
+TEXT_FIELDS = ('branch', 'purpose', 'risk_level')
+
+# Ngưỡng chia nhóm phân bố (%), nhóm cuối không giới hạn trên
+DSR_BINS = (0, 30, 40, 50, 60, 70)
+LTV_BINS = (0, 50, 60, 70, 80, 90)
+
+
+def columns_from_rows(rows: Sequence[Tuple]) -> Dict[str, np.ndarray]:
+    """
+    Chuyển các dòng CaseStore.portfolio_rows() thành dữ liệu dạng cột
+
+    Chỉ tiêu chưa tính được (None) thành NaN; chi nhánh/mục đích trống thành '—'.
+
+    Returns:
+        {tên cột (PORTFOLIO_FIELDS): mảng numpy}
+    """
+    values = list(zip(*rows)) if rows else [()] * len(PORTFOLIO_FIELDS)
+    columns = {}
+    for name, column in zip(PORTFOLIO_FIELDS, values):
+        if name in TEXT_FIELDS:
+            columns[name] = np.array([value or '' for value in column], dtype=object)
+        elif name in ('loan_term', 'start_month'):
+            columns[name] = np.array(column, dtype=np.int64)
+        else:
+            columns[name] = np.array(column, dtype=float)
+    for name in ('branch', 'purpose'):
+        columns[name][columns[name] == ''] = '—'
+    return columns
+
+
+def filter_columns(columns: Dict[str, np.ndarray], mask: np.ndarray) -> Dict[str, np.ndarray]:
+    """Các hồ sơ thỏa mask (mảng bool)"""
+    return {name: column[mask] for name, column in columns.items()}
+
+
+def exposure_summary(columns: Dict[str, np.ndarray]) -> Dict[str, float]:
+    """
+    Chỉ tiêu tổng của danh mục
+
+    Returns:
+        Dictionary: count, total_exposure, average_loan, weighted_rate (lãi suất
+        bình quân gia quyền theo dư nợ), median_dsr, median_ltv, high_risk_share
+        (tỷ trọng dư nợ rủi ro cao)
+    """
+    amount = columns['loan_amount']
+    total = float(amount.sum())
+    count = len(amount)
+    dsr = columns['dsr'][np.isfinite(columns['dsr'])]
+    ltv = columns['ltv'][np.isfinite(columns['ltv'])]
+    high_risk = columns['risk_level'] == RISK_LEVELS[-1]
+    return {
+        'count': count,
+        'total_exposure': total,
+        'average_loan': total / count if count else 0.0,
+        'weighted_rate': float(amount @ columns['interest_rate']) / total if total else 0.0,
+        'median_dsr': float(np.median(dsr)) if len(dsr) else float('nan'),
+        'median_ltv': float(np.median(ltv)) if len(ltv) else float('nan'),
+        'high_risk_share': float(amount[high_risk].sum()) / total if total else 0.0,
+    }
+
+
+def distribution(values: np.ndarray, bins: Sequence[float] = DSR_BINS) -> Tuple[List[str], np.ndarray]:
+    """
+    Số hồ sơ theo từng khoảng giá trị (bỏ qua chỉ tiêu chưa tính được)
+
+    Args:
+        values: Giá trị (%) của từng hồ sơ
+        bins: Các ngưỡng tăng dần; nhóm cuối gồm mọi giá trị từ ngưỡng cuối trở lên
+
+    Returns:
+        (nhãn từng nhóm, số hồ sơ từng nhóm)
+    """
+    edges = np.append(np.asarray(bins, dtype=float), np.inf)
+    counts, _ = np.histogram(values[np.isfinite(values)], bins=edges)
+    labels = [f"{low:g}-{high:g}%" for low, high in zip(bins[:-1], bins[1:])]
+    labels.append(f"≥{bins[-1]:g}%")
+    if bins[0] == 0:
+        labels[0] = f"<{bins[1]:g}%"
+    return labels, counts
+
+
+def risk_mix(columns: Dict[str, np.ndarray], by: str) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Cơ cấu mức rủi ro theo nhóm (chi nhánh, mục đích vay...)
+
+    Mỗi hồ sơ được gán một ô (nhóm, mức rủi ro) rồi đếm/cộng dư nợ cho mọi
+    ô trong một lần np.bincount.
+
+    Args:
+        columns: Dữ liệu dạng cột
+        by: Cột nhóm ('branch' hoặc 'purpose')
+
+    Returns:
+        (tên nhóm, ma trận số hồ sơ [nhóm × PORTFOLIO_RISK_LEVELS], ma trận dư nợ cùng kích thước)
+    """
+    groups, group_index = np.unique(columns[by].astype(str), return_inverse=True)
+    levels = len(PORTFOLIO_RISK_LEVELS)
+    risk_index = np.full(len(group_index), levels - 1)
+    for i, level in enumerate(RISK_LEVELS):
+        risk_index[columns['risk_level'] == level] = i
+    cell = group_index * levels + risk_index
+    size = len(groups) * levels
+    counts = np.bincount(cell, minlength=size).reshape(len(groups), levels)
+    exposure = np.bincount(cell, weights=columns['loan_amount'], minlength=size).reshape(len(groups), levels)
+    return groups, counts, exposure
+
+
+def repayment_inflow(columns: Dict[str, np.ndarray]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Dòng tiền thu nợ (gốc, lãi) của cả danh mục theo tháng
+
+    Mỗi khoản vay trả gốc đều (như FinancialCalculator), kỳ đầu là tháng
+    sau tháng tạo hồ sơ. Gốc của một khoản là hằng số và lãi là hàm bậc nhất
+    theo tháng trong thời hạn vay, nên lịch của mọi khoản được cộng dồn vào
+    một trục thời gian bằng mảng sai phân: mỗi khoản chỉ cộng (np.bincount)
+    hệ số của nó vào tháng bắt đầu và trừ đi ở tháng kết thúc, sau đó một
+    lần np.cumsum cho ra tổng từng tháng. Không có vòng lặp theo khoản vay
+    và bộ nhớ chỉ tăng theo số khoản + số tháng.
+
+    Returns:
+        (tháng dạng năm * 12 + tháng - 1, tổng gốc, tổng lãi) theo từng tháng
+    """
+    term = columns['loan_term']
+    if not len(term):
+        empty = np.zeros(0)
+        return np.zeros(0, dtype=np.int64), empty, empty.copy()
+
+    amount = columns['loan_amount']
+    first_month = columns['start_month'] + 1
+    origin = int(first_month.min())
+    start = first_month - origin
+    end = start + term
+    length = int(end.max())
+
+    def scatter(weights: np.ndarray) -> np.ndarray:
+        """Tổng theo tháng của hệ số có hiệu lực trong [start, end) mỗi khoản"""
+        delta = (np.bincount(start, weights=weights, minlength=length + 1)
+                 - np.bincount(end, weights=weights, minlength=length + 1))
+        return np.cumsum(delta)[:length]
+
+    # Gốc kỳ k (0..n-1): L/n; lãi: L * r * (1 - k/n), với k = t - start
+    # => lãi(t) = L*r*(1 + start/n) - (L*r/n) * t, tổng theo từng hệ số rồi ghép lại
+    monthly_rate = columns['interest_rate'] / 100 / 12
+    principal = scatter(amount / term)
+    slope = amount * monthly_rate / term
+    t = np.arange(length)
+    interest = scatter(amount * monthly_rate + slope * start) - scatter(slope) * t
+    return origin + t, principal, interest
+
+
+def month_dates(months: np.ndarray) -> np.ndarray:
+    """Tháng dạng năm * 12 + tháng - 1 thành datetime64[M] (trục thời gian của biểu đồ)"""
+    return (np.asarray(months) - 1970 * 12).astype('datetime64[M]')
@@ -0,0 +1,144 @@
+# src/artifact_cache.py
+"""Bộ nhớ đệm kết quả render (file xuất, ảnh biểu đồ) theo hash đầu vào, dùng chung cho mọi session"""
+
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Optional, Tuple
+
+from src.config import ARTIFACT_CACHE_MAX_BYTES, CHART_CACHE_MAX_BYTES
+
+
+def make_cache_key(kind: str, version: str, *inputs: Any) -> str:
+    """
+    Khóa cache từ hash các đầu vào tạo nên file
+
+    Cùng đầu vào (không phân biệt thứ tự key trong dictionary) cho cùng khóa;
+    đổi bất kỳ giá trị nào, hoặc đổi phiên bản mẫu, cho khóa khác.
+
+    Args:
+        kind: Loại kết quả (VD: 'excel_schedule', 'pdf_report', 'chart')
+        version: Phiên bản mẫu của exporter/biểu đồ
+        *inputs: Dữ liệu đầu vào (dictionary, list, chuỗi, số...)
+
+    Returns:
+        Khóa dạng '<kind>:<sha256>'
+    """
+    payload = json.dumps([version, inputs], sort_keys=True, ensure_ascii=False,
+                         separators=(',', ':'), default=str)
+    return f"{kind}:{hashlib.sha256(payload.encode('utf-8')).hexdigest()}"
+
+
+@dataclass
+class CacheStats:
+    """Thống kê bộ nhớ đệm"""
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    entries: int = 0
+    size: int = 0
+
+
+class ArtifactCache:
+    """
+    Cache LRU giới hạn theo tổng dung lượng (byte)
+
+    Khi thêm file làm tổng dung lượng vượt giới hạn, các file lâu chưa
+    dùng nhất bị loại trước. File lớn hơn cả giới hạn không được lưu.
+    """
+
+    def __init__(self, max_bytes: int = ARTIFACT_CACHE_MAX_BYTES):
+        """
+        Khởi tạo cache
+
+        Args:
+            max_bytes: Tổng dung lượng tối đa (byte)
+        """
+        self.max_bytes = max_bytes
+        self._items: "OrderedDict[str, bytes]" = OrderedDict()
+        self._size = 0
+        self._stats = CacheStats()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[bytes]:
+        """Lấy nội dung theo khóa (None nếu chưa có hoặc đã bị loại)"""
+        with self._lock:
+            data = self._items.get(key)
+            if data is None:
+                self._stats.misses += 1
+                return None
+            self._items.move_to_end(key)
+            self._stats.hits += 1
+            return data
+
+    def put(self, key: str, data: bytes):
+        """Lưu nội dung, loại các mục ít dùng nhất nếu vượt dung lượng"""
+        if len(data) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                self._size -= len(old)
+            self._items[key] = data
+            self._size += len(data)
+            while self._size > self.max_bytes:
+                _, evicted = self._items.popitem(last=False)
+                self._size -= len(evicted)
+                self._stats.evictions += 1
+
+    def get_or_create(self, key: str, factory: Callable[[], bytes]) -> Tuple[bytes, bool]:
+        """
+        Lấy nội dung từ cache, hoặc tạo mới bằng factory rồi lưu lại
+
+        Args:
+            key: Khóa cache (make_cache_key)
+            factory: Hàm tạo nội dung file
+
+        Returns:
+            (nội dung, True nếu lấy từ cache)
+        """
+        data = self.get(key)
+        if data is not None:
+            return data, True
+        data = factory()
+        self.put(key, data)
+        return data, False
+
+    def clear(self):
+        """Xóa toàn bộ cache"""
+        with self._lock:
+            self._items.clear()
+            self._size = 0
+
+    def stats(self) -> CacheStats:
+        """Thống kê hiện tại"""
+        with self._lock:
+            return CacheStats(self._stats.hits, self._stats.misses, self._stats.evictions,
+                              len(self._items), self._size)
+
+
+_cache: Optional[ArtifactCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_artifact_cache() -> ArtifactCache:
+    """Lấy cache file xuất dùng chung trong process (mọi session)"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ArtifactCache()
+        return _cache
+
+
+_chart_cache: Optional[ArtifactCache] = None
+
+
+def get_chart_cache() -> ArtifactCache:
+    """Lấy cache ảnh biểu đồ dùng chung trong process (tách khỏi cache file xuất)"""
+    global _chart_cache
+    with _cache_lock:
+        if _chart_cache is None:
+            _chart_cache = ArtifactCache(CHART_CACHE_MAX_BYTES)
+        return _chart_cache
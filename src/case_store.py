@@ -0,0 +1,435 @@
+# src/case_store.py
+"""Lưu trữ hồ sơ thẩm định (SQLite): dữ liệu trích xuất/đã sửa, chỉ tiêu, phân tích AI; tìm kiếm theo chỉ mục"""
+
+import json
+import os
+import sqlite3
+import threading
+import unicodedata
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from src.config import CASE_SEARCH_LIMIT, CASE_STORE_PATH
+
+SCHEMA_VERSION = 1
+
+
+def _has_fts5() -> bool:
+    """SQLite của Python có module FTS5 (tìm theo từ trong tên khách hàng)"""
+    try:
+        sqlite3.connect(':memory:').execute('CREATE VIRTUAL TABLE t USING fts5(x)')
+        return True
+    except sqlite3.OperationalError:
+        return False
+
+
+HAS_FTS5 = _has_fts5()
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS cases (
+    id INTEGER PRIMARY KEY,
+    customer_name TEXT NOT NULL DEFAULT '',
+    name_key TEXT NOT NULL DEFAULT '',
+    cccd TEXT NOT NULL DEFAULT '',
+    branch TEXT NOT NULL DEFAULT '',
+    purpose TEXT NOT NULL DEFAULT '',
+    source_file TEXT NOT NULL DEFAULT '',
+    loan_amount REAL NOT NULL DEFAULT 0,
+    interest_rate REAL NOT NULL DEFAULT 0,
+    loan_term INTEGER NOT NULL DEFAULT 0,
+    collateral_value REAL NOT NULL DEFAULT 0,
+    monthly_income REAL NOT NULL DEFAULT 0,
+    monthly_payment REAL,
+    net_cash_flow REAL,
+    dsr REAL,
+    ltv REAL,
+    risk_level TEXT NOT NULL DEFAULT '',
+    created_at TEXT NOT NULL,
+    updated_at TEXT NOT NULL,
+    data TEXT NOT NULL,
+    summary TEXT,
+    field_meta TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_cases_cccd ON cases(cccd);
+CREATE INDEX IF NOT EXISTS idx_cases_updated_at ON cases(updated_at);
+CREATE INDEX IF NOT EXISTS idx_cases_risk_level ON cases(risk_level, updated_at);
+CREATE INDEX IF NOT EXISTS idx_cases_loan_amount ON cases(loan_amount);
+
+CREATE TABLE IF NOT EXISTS case_analyses (
+    case_id INTEGER NOT NULL REFERENCES cases(id) ON DELETE CASCADE,
+    kind TEXT NOT NULL,
+    text TEXT NOT NULL,
+    basis TEXT NOT NULL DEFAULT '',
+    created_at TEXT NOT NULL,
+    PRIMARY KEY (case_id, kind)
+);
+"""
+
+# Chỉ mục tên khách hàng (theo từ, đã bỏ dấu); rowid trùng id của hồ sơ
+FTS_SCHEMA = "CREATE VIRTUAL TABLE IF NOT EXISTS cases_fts USING fts5(name_key)"
+
+# Cột dùng cho tổng hợp danh mục (logic/portfolio.py); start_month = năm * 12 + tháng - 1 của ngày tạo hồ sơ
+PORTFOLIO_FIELDS = ('branch', 'purpose', 'loan_amount', 'interest_rate', 'loan_term',
+                    'dsr', 'ltv', 'risk_level', 'start_month')
+
+# Các mức rủi ro của FinancialCalculator.get_summary() (bộ lọc tìm kiếm)
+RISK_LEVELS = ('Thấp', 'Trung bình', 'Cao')
+
+# Cột của kết quả tìm kiếm (không đọc dữ liệu JSON của hồ sơ)
+LIST_COLUMNS = ('id', 'customer_name', 'cccd', 'branch', 'purpose', 'loan_amount',
+                'risk_level', 'dsr', 'updated_at', 'source_file')
+
+
+def search_key(text: str) -> str:
+    """Chuỗi tìm kiếm: chữ thường, bỏ dấu tiếng Việt (kể cả đ), gộp khoảng trắng"""
+    text = unicodedata.normalize('NFD', str(text).lower().replace('đ', 'd'))
+    text = ''.join(ch for ch in text if not unicodedata.combining(ch))
+    return ' '.join(text.split())
+
+
+def _now() -> str:
+    return datetime.now().isoformat(sep=' ', timespec='seconds')
+
+
+@dataclass
+class CaseListItem:
+    """Một dòng kết quả tìm kiếm"""
+    id: int
+    customer_name: str
+    cccd: str
+    branch: str
+    purpose: str
+    loan_amount: float
+    risk_level: str
+    dsr: Optional[float]
+    updated_at: str
+    source_file: str
+
+
+@dataclass
+class StoredAnalysis:
+    """Phân tích AI đã lưu của hồ sơ"""
+    text: str
+    # Hash dữ liệu nguồn của phân tích ('' nếu phân tích đã cũ khi lưu)
+    basis: str
+    created_at: str
+
+
+@dataclass
+class StoredCase:
+    """Hồ sơ đã lưu, đủ để mở lại như lúc đóng"""
+    id: int
+    sections: Dict[str, Dict[str, Any]]
+    summary: Optional[Dict[str, Any]]
+    field_meta: Dict[str, Any]
+    branch: str
+    source_file: str
+    created_at: str
+    updated_at: str
+    analyses: Dict[str, StoredAnalysis] = field(default_factory=dict)
+
+
+class CaseStore:
+    """
+    Kho hồ sơ trên một file SQLite
+
+    Các trường dùng để lọc/tìm (CCCD, tên, ngày, mức rủi ro, số tiền vay,
+    chỉ tiêu chính) là cột có chỉ mục; dữ liệu đầy đủ của hồ sơ lưu dạng
+    JSON và chỉ được đọc khi mở hồ sơ. Một kết nối dùng chung cho mọi
+    session, các thao tác được tuần tự hóa bằng lock.
+    """
+
+    def __init__(self, path: str = CASE_STORE_PATH):
+        """
+        Khởi tạo (tạo file và bảng nếu chưa có)
+
+        Args:
+            path: Đường dẫn file SQLite (':memory:' để dùng tạm trong bộ nhớ)
+        """
+        if path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._writes = 0
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock, self._conn:
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute('PRAGMA synchronous=NORMAL')
+            self._conn.execute('PRAGMA foreign_keys=ON')
+            self._conn.executescript(SCHEMA)
+            if HAS_FTS5:
+                self._conn.execute(FTS_SCHEMA)
+            self._conn.execute(f'PRAGMA user_version={SCHEMA_VERSION}')
+
+    # ----- Ghi -----
+
+    def save(self, sections: Dict[str, Dict[str, Any]],
+             summary: Optional[Dict[str, Any]] = None,
+             case_id: Optional[int] = None,
+             field_meta: Optional[Dict[str, Any]] = None,
+             branch: Optional[str] = None,
+             source_file: Optional[str] = None) -> int:
+        """
+        Lưu hồ sơ mới hoặc cập nhật hồ sơ đã có
+
+        Args:
+            sections: Dữ liệu theo nhóm (customer_info, loan_info, collateral_info,
+                financial_info, document)
+            summary: Kết quả FinancialCalculator.get_summary() (None nếu chưa tính được)
+            case_id: ID hồ sơ cần cập nhật (None để tạo mới)
+            field_meta: Nguồn gốc/độ tin cậy từng trường trích xuất
+            branch: Chi nhánh (None: giữ nguyên khi cập nhật)
+            source_file: Tên file phương án gốc (None: giữ nguyên khi cập nhật)
+
+        Returns:
+            ID hồ sơ
+        """
+        customer_info = sections.get('customer_info', {})
+        loan_info = sections.get('loan_info', {})
+        collateral_info = sections.get('collateral_info', {})
+        financial_info = sections.get('financial_info', {})
+        summary = summary or {}
+        values = {
+            'customer_name': str(customer_info.get('name', '')),
+            'name_key': search_key(customer_info.get('name', '')),
+            'cccd': str(customer_info.get('cccd', '')).strip(),
+            'purpose': str(loan_info.get('purpose', '')),
+            'loan_amount': float(loan_info.get('loan_amount', 0) or 0),
+            'interest_rate': float(loan_info.get('interest_rate', 0) or 0),
+            'loan_term': int(loan_info.get('loan_term', 0) or 0),
+            'collateral_value': float(collateral_info.get('market_value', 0) or 0),
+            'monthly_income': float(financial_info.get('monthly_income', 0) or 0),
+            'monthly_payment': summary.get('monthly_payment'),
+            'net_cash_flow': summary.get('net_cash_flow'),
+            'dsr': summary.get('dsr'),
+            'ltv': summary.get('ltv'),
+            'risk_level': summary.get('risk_level', ''),
+            'updated_at': _now(),
+            'data': json.dumps(sections, ensure_ascii=False),
+            'summary': json.dumps(summary, ensure_ascii=False) if summary else None,
+        }
+        if field_meta is not None:
+            values['field_meta'] = json.dumps(field_meta, ensure_ascii=False)
+        if branch is not None:
+            values['branch'] = branch
+        if source_file is not None:
+            values['source_file'] = source_file
+
+        with self._lock, self._conn:
+            if case_id is None:
+                values['created_at'] = values['updated_at']
+                columns = ', '.join(values)
+                placeholders = ', '.join(f':{name}' for name in values)
+                case_id = self._conn.execute(
+                    f'INSERT INTO cases ({columns}) VALUES ({placeholders})', values
+                ).lastrowid
+            else:
+                assignments = ', '.join(f'{name} = :{name}' for name in values)
+                updated = self._conn.execute(
+                    f'UPDATE cases SET {assignments} WHERE id = :id', {**values, 'id': case_id}
+                ).rowcount
+                if not updated:
+                    raise KeyError(f"Không tìm thấy hồ sơ #{case_id}")
+            if HAS_FTS5:
+                self._conn.execute('DELETE FROM cases_fts WHERE rowid = ?', (case_id,))
+                self._conn.execute('INSERT INTO cases_fts (rowid, name_key) VALUES (?, ?)',
+                                   (case_id, values['name_key']))
+            self._writes += 1
+        return case_id
+
+    def save_analysis(self, case_id: int, kind: str, text: str, basis: str = ''):
+        """
+        Lưu (thay) một phân tích AI của hồ sơ
+
+        Args:
+            case_id: ID hồ sơ
+            kind: Loại phân tích ('file_analysis', 'data_analysis')
+            text: Nội dung
+            basis: Hash dữ liệu nguồn của phân tích (xem analysis_basis), '' nếu đã cũ
+        """
+        with self._lock, self._conn:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO case_analyses (case_id, kind, text, basis, created_at) '
+                'VALUES (?, ?, ?, ?, ?)', (case_id, kind, text, basis, _now())
+            )
+            self._writes += 1
+
+    def delete(self, case_id: int):
+        """Xóa hồ sơ cùng các phân tích AI của nó"""
+        with self._lock, self._conn:
+            self._conn.execute('DELETE FROM cases WHERE id = ?', (case_id,))
+            if HAS_FTS5:
+                self._conn.execute('DELETE FROM cases_fts WHERE rowid = ?', (case_id,))
+            self._writes += 1
+
+    # ----- Đọc -----
+
+    def load(self, case_id: int) -> Optional[StoredCase]:
+        """
+        Đọc đầy đủ một hồ sơ
+
+        Returns:
+            StoredCase, hoặc None nếu không có
+        """
+        with self._lock:
+            row = self._conn.execute('SELECT * FROM cases WHERE id = ?', (case_id,)).fetchone()
+            if row is None:
+                return None
+            analyses = self._conn.execute(
+                'SELECT kind, text, basis, created_at FROM case_analyses WHERE case_id = ?', (case_id,)
+            ).fetchall()
+        return StoredCase(
+            id=row['id'],
+            sections=json.loads(row['data']),
+            summary=json.loads(row['summary']) if row['summary'] else None,
+            field_meta=json.loads(row['field_meta']) if row['field_meta'] else {},
+            branch=row['branch'],
+            source_file=row['source_file'],
+            created_at=row['created_at'],
+            updated_at=row['updated_at'],
+            analyses={a['kind']: StoredAnalysis(a['text'], a['basis'], a['created_at']) for a in analyses},
+        )
+
+    def search(self, query: str = '',
+               risk_level: Optional[str] = None,
+               branch: Optional[str] = None,
+               min_amount: Optional[float] = None,
+               max_amount: Optional[float] = None,
+               date_from: Optional[str] = None,
+               date_to: Optional[str] = None,
+               limit: int = CASE_SEARCH_LIMIT) -> List[CaseListItem]:
+        """
+        Tìm hồ sơ, mới cập nhật trước
+
+        Args:
+            query: Số CCCD (tìm theo đầu số) hoặc tên khách hàng (không phân biệt
+                dấu/hoa thường; mỗi từ khớp phần đầu một từ trong tên)
+            risk_level: Mức rủi ro ('Thấp', 'Trung bình', 'Cao')
+            branch: Chi nhánh
+            min_amount: Số tiền vay tối thiểu
+            max_amount: Số tiền vay tối đa
+            date_from: Cập nhật từ ngày (YYYY-MM-DD)
+            date_to: Cập nhật đến hết ngày (YYYY-MM-DD)
+            limit: Số kết quả tối đa
+
+        Returns:
+            Danh sách CaseListItem
+        """
+        conditions, params = self._search_conditions(query, risk_level, branch, min_amount,
+                                                     max_amount, date_from, date_to)
+        sql = f"SELECT {', '.join(LIST_COLUMNS)} FROM cases"
+        if conditions:
+            sql += ' WHERE ' + ' AND '.join(conditions)
+        sql += ' ORDER BY updated_at DESC, id DESC LIMIT ?'
+        with self._lock:
+            rows = self._conn.execute(sql, (*params, limit)).fetchall()
+        return [CaseListItem(*row) for row in rows]
+
+    @staticmethod
+    def _search_conditions(query, risk_level, branch, min_amount, max_amount,
+                           date_from, date_to) -> Tuple[List[str], List[Any]]:
+        """Điều kiện WHERE (mỗi điều kiện dùng được một chỉ mục)"""
+        conditions: List[str] = []
+        params: List[Any] = []
+        query = (query or '').strip()
+        if query.isdigit():
+            # Tìm theo đầu số bằng khoảng giá trị để dùng chỉ mục cccd
+            conditions.append('cccd >= ? AND cccd < ?')
+            params += [query, query + '\uffff']
+        elif query:
+            words = search_key(query).split()
+            if HAS_FTS5:
+                conditions.append('id IN (SELECT rowid FROM cases_fts WHERE cases_fts MATCH ?)')
+                params.append(' AND '.join('"{}"*'.format(word.replace('"', '""')) for word in words))
+            else:
+                for word in words:
+                    conditions.append("(' ' || name_key) LIKE ?")
+                    params.append(f'% {word}%')
+        if risk_level:
+            conditions.append('risk_level = ?')
+            params.append(risk_level)
+        if branch:
+            conditions.append('branch = ?')
+            params.append(branch)
+        if min_amount is not None:
+            conditions.append('loan_amount >= ?')
+            params.append(min_amount)
+        if max_amount is not None:
+            conditions.append('loan_amount <= ?')
+            params.append(max_amount)
+        if date_from:
+            conditions.append('updated_at >= ?')
+            params.append(date_from)
+        if date_to:
+            conditions.append('updated_at < ?')
+            params.append(date_to + '\uffff')
+        return conditions, params
+
+    def portfolio_rows(self) -> List[Tuple]:
+        """
+        Số liệu danh mục của mọi hồ sơ có khoản vay (một truy vấn, không đọc dữ liệu JSON)
+
+        Returns:
+            Các dòng theo thứ tự cột PORTFOLIO_FIELDS
+        """
+        sql = (
+            "SELECT branch, purpose, loan_amount, interest_rate, loan_term, dsr, ltv, risk_level, "
+            "CAST(strftime('%Y', created_at) AS INTEGER) * 12 + CAST(strftime('%m', created_at) AS INTEGER) - 1 "
+            "FROM cases WHERE loan_amount > 0 AND loan_term > 0"
+        )
+        with self._lock:
+            return self._conn.execute(sql).fetchall()
+
+    def revision(self) -> Tuple[int, int]:
+        """
+        Phiên bản dữ liệu của kho: đổi sau mỗi lần ghi (kể cả từ process khác)
+
+        Dùng làm khóa cache cho dữ liệu tổng hợp từ kho.
+        """
+        with self._lock:
+            data_version = self._conn.execute('PRAGMA data_version').fetchone()[0]
+            return self._writes, data_version
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute('SELECT COUNT(*) FROM cases').fetchone()[0]
+
+    def explain(self, **filters: Any) -> List[str]:
+        """Kế hoạch truy vấn SQLite của search() với các bộ lọc (để kiểm tra chỉ mục được dùng)"""
+        conditions, params = self._search_conditions(
+            filters.get('query', ''), filters.get('risk_level'), filters.get('branch'),
+            filters.get('min_amount'), filters.get('max_amount'),
+            filters.get('date_from'), filters.get('date_to')
+        )
+        sql = f"EXPLAIN QUERY PLAN SELECT {', '.join(LIST_COLUMNS)} FROM cases"
+        if conditions:
+            sql += ' WHERE ' + ' AND '.join(conditions)
+        sql += ' ORDER BY updated_at DESC, id DESC LIMIT ?'
+        with self._lock:
+            return [row['detail'] for row in self._conn.execute(sql, (*params, CASE_SEARCH_LIMIT))]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def analysis_basis(value: Any) -> str:
+    """Hash dữ liệu nguồn của một phân tích AI (số liệu hồ sơ hoặc văn bản file)"""
+    from src.artifact_cache import make_cache_key
+
+    return make_cache_key('ai_basis', str(SCHEMA_VERSION), value)
+
+
+_case_store: Optional[CaseStore] = None
+_case_store_lock = threading.Lock()
+
+
+def get_case_store() -> CaseStore:
+    """Kho hồ sơ dùng chung trong process (mở file khi cần lần đầu)"""
+    global _case_store
+    with _case_store_lock:
+        if _case_store is None:
+            _case_store = CaseStore()
+        return _case_store
@@ -1,8 +1,89 @@
 # src/config.py
 """Cấu hình hệ thống"""
 
+import os
+
+# Backend AI: 'gemini' hoặc 'local' (giả lập tất định, không cần mạng)
+AI_BACKEND = os.environ.get("CADAP_AI_BACKEND", "gemini")
+LOCAL_AI_LATENCY = float(os.environ.get("CADAP_LOCAL_AI_LATENCY", "0.5"))  # giây
+LOCAL_AI_JITTER = float(os.environ.get("CADAP_LOCAL_AI_JITTER", "0"))  # giây
+# File JSON {từ khóa: câu trả lời} cho backend local (tùy chọn)
+LOCAL_AI_RESPONSES_FILE = os.environ.get("CADAP_LOCAL_AI_RESPONSES", "")
+# Cassette ghi/phát lại lời gọi AI (tùy chọn): đường dẫn .jsonl.gz, chế độ record/replay
+AI_CASSETTE_PATH = os.environ.get("CADAP_AI_CASSETTE", "")
+AI_CASSETTE_MODE = os.environ.get("CADAP_AI_CASSETTE_MODE", "replay")
+AI_CASSETTE_LATENCY_SCALE = float(os.environ.get("CADAP_AI_CASSETTE_LATENCY_SCALE", "1.0"))
+
 # Cấu hình Gemini
 GEMINI_MODEL = "gemini-2.0-flash-exp"
+# Endpoint tùy chỉnh (VD: http://127.0.0.1:8080 cho server giả lập khi test)
+GEMINI_API_ENDPOINT = os.environ.get("GEMINI_API_ENDPOINT", "")
+GEMINI_REQUEST_TIMEOUT = 60  # giây
+AI_MAX_TOOL_ROUNDS = 4  # số vòng gọi công cụ tối đa trong một câu trả lời chatbot
+
+# Trích xuất bổ sung bằng AI: chỉ cho trường parser bỏ sót hoặc độ tin cậy thấp
+AI_EXTRACTION_MIN_CONFIDENCE = 0.6  # dưới ngưỡng này thì nhờ AI trích xuất lại
+AI_EXTRACTION_FIELD_CONFIDENCE = 0.8  # độ tin cậy gán cho giá trị do AI trích xuất
+AI_EXTRACTION_CONTEXT_PARAGRAPHS = 1  # số đoạn lân cận gửi kèm đoạn chứa từ khóa
+AI_EXTRACTION_MAX_CHARS = 4000  # giới hạn độ dài trích đoạn gửi đi
+
+# Cấu hình transport AI (dùng chung cho mọi session trong process)
+AI_RATE_LIMIT_PER_MINUTE = 15  # yêu cầu/phút
+AI_RATE_LIMIT_BURST = 5
+AI_RATE_LIMIT_TIMEOUT = 30  # giây chờ tối đa để lấy lượt gọi
+AI_MAX_ATTEMPTS = 4
+AI_RETRY_BASE_DELAY = 1.0  # giây
+AI_RETRY_MAX_DELAY = 20.0  # giây
+AI_CIRCUIT_FAILURE_THRESHOLD = 5
+AI_CIRCUIT_RECOVERY_SECONDS = 30
+
+# Cấu hình tác vụ AI chạy nền (giới hạn cho toàn server)
+AI_MAX_CONCURRENT_JOBS = 4
+AI_MAX_PENDING_JOBS = 50
+AI_JOB_POLL_SECONDS = 2
+JOB_RETENTION_SECONDS = 3600  # giữ kết quả 1 giờ sau khi xong
+
+# Cấu hình xuất báo cáo hàng loạt
+BATCH_MAX_WORKERS = int(os.environ.get("CADAP_BATCH_WORKERS", "0")) or os.cpu_count() or 1
+BATCH_IN_FLIGHT_PER_WORKER = 2  # số hồ sơ được giao trước cho mỗi process
+
+# Số process vẽ biểu đồ cho báo cáo PDF (dùng chung, khởi tạo khi cần)
+REPORT_CHART_WORKERS = min(5, os.cpu_count() or 1)
+
+# Thư mục chứa bộ font DejaVu Sans cho PDF (mặc định: font hệ thống hoặc bản kèm matplotlib)
+PDF_FONT_DIR = os.environ.get("CADAP_PDF_FONT_DIR", "")
+
+# File mẫu .docx của ngân hàng cho báo cáo Word (mặc định: mẫu dựng sẵn)
+DOCX_REPORT_TEMPLATE = os.environ.get("CADAP_DOCX_TEMPLATE", "")
+
+# Dung lượng tối đa bộ nhớ đệm file xuất (Excel/PDF), dùng chung cho mọi session
+ARTIFACT_CACHE_MAX_BYTES = int(os.environ.get("CADAP_ARTIFACT_CACHE_MB", "256")) * 1024 * 1024
+# Dung lượng tối đa bộ nhớ đệm ảnh biểu đồ (tab Biểu đồ), dùng chung cho mọi session
+CHART_CACHE_MAX_BYTES = int(os.environ.get("CADAP_CHART_CACHE_MB", "64")) * 1024 * 1024
+
+# Giảm điểm chuỗi lịch trả nợ khi vẽ: tối đa một điểm mỗi N pixel chiều rộng biểu đồ
+CHART_PIXELS_PER_POINT = 2
+CHART_INTERACTIVE_WIDTH = 800  # pixel, độ rộng ước lượng của biểu đồ tương tác
+
+# Nạp trước thư viện nặng (biểu đồ, exporter) trong luồng nền sau lần hiển thị đầu tiên ("0" để tắt)
+WARMUP_ENABLED = os.environ.get("CADAP_WARMUP", "1") != "0"
+
+# API HTTP không giao diện (api_server.py)
+API_HOST = os.environ.get("CADAP_API_HOST", "127.0.0.1")
+API_PORT = int(os.environ.get("CADAP_API_PORT", "8502"))
+API_WORKERS = int(os.environ.get("CADAP_API_WORKERS", "0")) or os.cpu_count() or 1  # process đọc DOCX/xuất file
+API_PENDING_PER_WORKER = 4  # số yêu cầu CPU được nhận (đang chạy + chờ) cho mỗi process, vượt thì trả 503
+API_REQUEST_TIMEOUT = float(os.environ.get("CADAP_API_TIMEOUT", "60"))  # giây
+API_AI_CONCURRENCY = int(os.environ.get("CADAP_API_AI_CONCURRENCY", "16"))  # lời gọi AI đồng thời
+API_AI_MAX_PENDING = 64  # lời gọi AI chờ lượt tối đa, vượt thì trả 503
+API_AI_TIMEOUT = float(os.environ.get("CADAP_API_AI_TIMEOUT", "120"))  # giây
+API_MAX_UPLOAD_BYTES = int(os.environ.get("CADAP_API_MAX_UPLOAD_MB", "20")) * 1024 * 1024
+API_MAX_LOAN_TERM = 600  # tháng, giới hạn thời hạn vay nhận qua API (lịch trả nợ tính trên event loop)
+
+# Kho hồ sơ đã lưu (SQLite), dùng chung cho mọi session
+CASE_STORE_PATH = os.environ.get("CADAP_CASE_DB", os.path.join(os.path.expanduser("~"), ".cadap", "cases.db"))
+CASE_SEARCH_LIMIT = 50  # số kết quả tìm kiếm tối đa
+CASE_BRANCH = os.environ.get("CADAP_BRANCH", "")  # chi nhánh mặc định khi lưu hồ sơ
 
 # Cấu hình hiển thị
 THOUSAND_SEPARATOR = "."
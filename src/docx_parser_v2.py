@@ -4,6 +4,18 @@
 import re
 from typing import Dict, Any, Optional
 from docx import Document
+from src.utils import validate_cccd, validate_phone
+
+
+# Nguồn gốc giá trị của từng trường
+SOURCE_REGEX = 'regex'
+SOURCE_DEFAULT = 'default'
+SOURCE_AI = 'ai'
+
+# Độ tin cậy theo cách trích xuất
+CONFIDENCE_EXACT = 0.95      # khớp nhãn cụ thể (VD: "Thời hạn vay: 60 tháng")
+CONFIDENCE_HEURISTIC = 0.7   # khớp lỏng (VD: số đầu tiên sau dấu ":")
+CONFIDENCE_SUSPICIOUS = 0.3  # trích xuất được nhưng giá trị không hợp lệ
 
 
 def parse_number(text: str) -> float:
@@ -31,6 +43,26 @@ class DocxParserV2:
             self.text_content = "\n".join(self.paragraphs)
         except Exception as e:
             raise Exception(f"Không thể đọc file DOCX: {str(e)}")
+        
+        # Nguồn gốc và độ tin cậy từng trường, khóa dạng 'loan_info.interest_rate'
+        self.field_meta: Dict[str, Dict[str, Any]] = {}
+    
+    def _mark(self, field: str, confidence: float, snippet: str):
+        """Ghi nhận trường được trích xuất bằng regex"""
+        self.field_meta[field] = {
+            'source': SOURCE_REGEX,
+            'confidence': confidence,
+            'snippet': snippet
+        }
+    
+    def _finalize_meta(self, section: str, values: Dict[str, Any], suspicious: Dict[str, bool]):
+        """Đánh dấu trường dùng giá trị mặc định và hạ độ tin cậy giá trị bất thường"""
+        for name in values:
+            field = f"{section}.{name}"
+            if field not in self.field_meta:
+                self.field_meta[field] = {'source': SOURCE_DEFAULT, 'confidence': 0.0, 'snippet': ''}
+            elif suspicious.get(name):
+                self.field_meta[field]['confidence'] = CONFIDENCE_SUSPICIOUS
     
     def extract_customer_info(self) -> Dict[str, str]:
         """Trích xuất thông tin khách hàng"""
@@ -49,24 +81,28 @@ class DocxParserV2:
                     if match:
                         name = match.group(1).strip()
                         found_first = True
+                        self._mark('customer_info.name', CONFIDENCE_EXACT, para)
                 
                 # CCCD của người đầu tiên
                 if found_first and not cccd and "CMND/CCCD" in para:
                     match = re.search(r'(?:CMND/CCCD)[^:]*:\s*(\d{9,12})', para)
                     if match:
                         cccd = match.group(1).strip()
+                        self._mark('customer_info.cccd', CONFIDENCE_EXACT, para)
                 
                 # Địa chỉ
                 if found_first and not address and "Nơi cư trú:" in para:
                     parts = para.split("Nơi cư trú:", 1)
                     if len(parts) > 1:
                         address = parts[1].strip()
+                        self._mark('customer_info.address', CONFIDENCE_EXACT, para)
                 
                 # Số điện thoại
                 if found_first and not phone and "Số điện thoại:" in para:
                     match = re.search(r'Số điện thoại:\s*(\d{10,11})', para)
                     if match:
                         phone = match.group(1).strip()
+                        self._mark('customer_info.phone', CONFIDENCE_EXACT, para)
                 
                 # Dừng khi gặp người thứ 2
                 if found_first and "2. Họ và tên:" in para:
@@ -75,12 +111,19 @@ class DocxParserV2:
         except Exception as e:
             print(f"Warning in extract_customer_info: {e}")
         
-        return {
+        result = {
             'name': name if name else 'Khách hàng',
             'cccd': cccd,
             'address': address,
             'phone': phone
         }
+        self._finalize_meta('customer_info', result, {
+            'name': not name,
+            'cccd': not validate_cccd(cccd),
+            'address': not address,
+            'phone': not validate_phone(phone)
+        })
+        return result
     
     def extract_loan_info(self) -> Dict[str, Any]:
         """Trích xuất thông tin khoản vay"""
@@ -98,50 +141,68 @@ class DocxParserV2:
                     match = re.search(r'Tổng nhu cầu vốn:\s*([\d.,]+)', para)
                     if match:
                         total_need = parse_number(match.group(1))
+                        self._mark('loan_info.total_need', CONFIDENCE_EXACT, para)
                 
                 # Vốn đối ứng
                 if "Vốn đối ứng tham gia" in para:
                     match = re.search(r':\s*([\d.,]+)', para)
                     if match:
                         equity = parse_number(match.group(1))
+                        self._mark('loan_info.equity', CONFIDENCE_HEURISTIC, para)
                 
                 # Vốn vay
                 if "Vốn vay Agribank số tiền:" in para:
                     match = re.search(r'số tiền:\s*([\d.,]+)', para)
                     if match:
                         loan_amount = parse_number(match.group(1))
+                        self._mark('loan_info.loan_amount', CONFIDENCE_EXACT, para)
                 
                 # Mục đích vay
                 if "Mục đích vay:" in para:
                     parts = para.split("Mục đích vay:", 1)
                     if len(parts) > 1:
                         purpose = parts[1].strip()
+                        self._mark('loan_info.purpose', CONFIDENCE_EXACT, para)
                 
                 # Thời hạn
                 if "Thời hạn vay:" in para:
                     match = re.search(r'Thời hạn vay:\s*(\d+)\s*tháng', para)
                     if match:
                         loan_term = int(match.group(1))
+                        self._mark('loan_info.loan_term', CONFIDENCE_EXACT, para)
                 
                 # Lãi suất
                 if "Lãi suất:" in para and "Thời hạn vay:" in para:
                     match = re.search(r'Lãi suất:\s*(\d+[.,]?\d*)\s*%', para)
                     if match:
                         interest_rate = float(match.group(1).replace(',', '.'))
+                        self._mark('loan_info.interest_rate', CONFIDENCE_EXACT, para)
         
         except Exception as e:
             print(f"Warning in extract_loan_info: {e}")
         
         equity_ratio = (equity / total_need * 100) if total_need > 0 else 0
         
-        return {
+        result = {
             'purpose': purpose,
             'total_need': total_need,
             'equity': equity,
             'loan_amount': loan_amount,
-            'equity_ratio': equity_ratio,
             'interest_rate': interest_rate,
-            'loan_term': loan_term,
+            'loan_term': loan_term
+        }
+        self._finalize_meta('loan_info', result, {
+            'purpose': not purpose,
+            'total_need': total_need <= 0,
+            'equity': equity <= 0 or (total_need > 0 and equity > total_need),
+            'loan_amount': loan_amount <= 0 or (total_need > 0 and loan_amount > total_need),
+            'interest_rate': not 0 < interest_rate < 50,
+            'loan_term': not 0 < loan_term <= 600
+        })
+        
+        return {
+            **result,
+            'equity_ratio': equity_ratio,
             'payment_frequency': 'Tháng'
         }
     
@@ -167,27 +228,32 @@ class DocxParserV2:
                         match = re.search(r'Tài sản 1:\s*([^\.]+)', para)
                         if match:
                             asset_type = match.group(1).strip()
+                            self._mark('collateral_info.asset_type', CONFIDENCE_EXACT, para)
                         
                         if "Giá trị:" in para:
                             match = re.search(r'Giá trị:\s*([\d.,]+)', para)
                             if match:
                                 market_value = parse_number(match.group(1))
+                                self._mark('collateral_info.market_value', CONFIDENCE_EXACT, para)
                     
                     # Địa chỉ TS
                     if in_collateral and "Địa chỉ:" in para:
                         parts = para.split("Địa chỉ:", 1)
                         if len(parts) > 1:
                             asset_address = parts[1].strip()
+                            self._mark('collateral_info.asset_address', CONFIDENCE_HEURISTIC, para)
                     
                     # LTV
                     if "LTV" in para or "Tỷ lệ cho vay" in para:
                         match = re.search(r'(\d+[.,]?\d*)\s*%', para)
                         if match:
                             ltv = float(match.group(1).replace(',', '.'))
+                            self._mark('collateral_info.ltv', CONFIDENCE_HEURISTIC, para)
                     
                     # Giấy CN
                     if "Giấy chứng nhận" in para:
                         legal_docs = para
+                        self._mark('collateral_info.legal_docs', CONFIDENCE_HEURISTIC, para)
                     
                     # Dừng khi gặp phần III
                     if "III." in para:
@@ -196,13 +262,19 @@ class DocxParserV2:
         except Exception as e:
             print(f"Warning in extract_collateral_info: {e}")
         
-        return {
+        result = {
             'asset_type': asset_type,
             'market_value': market_value,
             'asset_address': asset_address,
             'ltv': ltv,
             'legal_docs': legal_docs if legal_docs else 'Sổ đỏ'
         }
+        self._finalize_meta('collateral_info', result, {
+            'market_value': market_value <= 0,
+            'asset_address': not asset_address,
+            'ltv': not 0 < ltv <= 100
+        })
+        return result
     
     def extract_financial_info(self) -> Dict[str, float]:
         """Trích xuất thông tin tài chính"""
@@ -217,28 +289,38 @@ class DocxParserV2:
                     match = re.search(r':\s*([\d.,]+)', para)
                     if match:
                         monthly_income = parse_number(match.group(1))
+                        self._mark('financial_info.monthly_income', CONFIDENCE_HEURISTIC, para)
                 
                 # Tổng chi phí
                 if "Tổng chi phí hàng tháng:" in para:
                     match = re.search(r':\s*([\d.,]+)', para)
                     if match:
                         monthly_expense = parse_number(match.group(1))
+                        self._mark('financial_info.monthly_expense', CONFIDENCE_EXACT, para)
         
         except Exception as e:
             print(f"Warning in extract_financial_info: {e}")
         
-        return {
+        result = {
             'monthly_income': monthly_income,
-            'monthly_expense': monthly_expense,
-            'other_debt': other_debt
+            'monthly_expense': monthly_expense
         }
+        self._finalize_meta('financial_info', result, {
+            'monthly_income': monthly_income <= 0,
+            'monthly_expense': monthly_expense <= 0 or monthly_expense >= monthly_income > 0
+        })
+        
+        # Nợ khác không có trong mẫu phương án, luôn nhập tay
+        return {**result, 'other_debt': other_debt}
     
     def parse_full_document(self) -> Dict[str, Any]:
-        """Parse toàn bộ document"""
+        """Parse toàn bộ document (kèm nguồn gốc/độ tin cậy từng trường)"""
+        self.field_meta = {}
         return {
             'customer_info': self.extract_customer_info(),
             'loan_info': self.extract_loan_info(),
             'collateral_info': self.extract_collateral_info(),
             'financial_info': self.extract_financial_info(),
-            'raw_text': self.text_content
+            'raw_text': self.text_content,
+            'field_meta': self.field_meta
         }
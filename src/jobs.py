@@ -0,0 +1,133 @@
+# src/jobs.py
+"""Chạy tác vụ nền (phân tích AI, chat) ngoài luồng script Streamlit"""
+
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Optional
+
+from src.config import AI_MAX_CONCURRENT_JOBS, AI_MAX_PENDING_JOBS, JOB_RETENTION_SECONDS
+
+STATUS_PENDING = 'pending'
+STATUS_RUNNING = 'running'
+STATUS_DONE = 'done'
+STATUS_FAILED = 'failed'
+
+
+class JobQueueFullError(RuntimeError):
+    """Hàng đợi tác vụ nền đã đầy"""
+
+
+@dataclass
+class Job:
+    """Trạng thái một tác vụ nền"""
+    id: str
+    kind: str
+    status: str = STATUS_PENDING
+    result: Any = None
+    error: str = ""
+    submitted_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+
+    @property
+    def finished(self) -> bool:
+        return self.status in (STATUS_DONE, STATUS_FAILED)
+
+
+class JobRunner:
+    """
+    Thread pool dùng chung cho cả server kèm registry tác vụ theo ID
+
+    Số tác vụ chạy đồng thời bị giới hạn bởi số worker; giao diện chỉ giữ
+    job ID trong session và hỏi trạng thái, nên kết quả không mất khi
+    script rerun hay khi widget khác được thao tác.
+    """
+
+    def __init__(self, max_workers: int = AI_MAX_CONCURRENT_JOBS,
+                 max_pending: int = AI_MAX_PENDING_JOBS,
+                 retention: float = JOB_RETENTION_SECONDS):
+        """
+        Khởi tạo job runner
+
+        Args:
+            max_workers: Số tác vụ chạy đồng thời tối đa
+            max_pending: Số tác vụ chưa xong tối đa (đang chờ + đang chạy)
+            retention: Thời gian (giây) giữ kết quả sau khi xong
+        """
+        self.max_pending = max_pending
+        self.retention = retention
+        self._executor = ThreadPoolExecutor(max_workers=max_workers,
+                                            thread_name_prefix='cadap-job')
+        self._jobs: Dict[str, Job] = {}
+        self._lock = threading.Lock()
+
+    def submit(self, kind: str, fn: Callable, *args, **kwargs) -> str:
+        """
+        Đưa tác vụ vào hàng đợi
+
+        Args:
+            kind: Loại tác vụ (VD: 'file_analysis')
+            fn: Hàm cần chạy
+            *args, **kwargs: Tham số của fn
+
+        Returns:
+            Job ID
+
+        Raises:
+            JobQueueFullError: Khi số tác vụ chưa xong vượt giới hạn
+        """
+        with self._lock:
+            self._prune()
+            unfinished = sum(1 for job in self._jobs.values() if not job.finished)
+            if unfinished >= self.max_pending:
+                raise JobQueueFullError("Hệ thống đang xử lý quá nhiều yêu cầu AI, vui lòng thử lại sau")
+            job = Job(id=uuid.uuid4().hex, kind=kind)
+            self._jobs[job.id] = job
+
+        self._executor.submit(self._run, job, fn, args, kwargs)
+        return job.id
+
+    def _run(self, job: Job, fn: Callable, args, kwargs):
+        job.started_at = time.time()
+        job.status = STATUS_RUNNING
+        try:
+            result = fn(*args, **kwargs)
+        except Exception as e:
+            job.error = str(e)
+            status = STATUS_FAILED
+        else:
+            job.result = result
+            status = STATUS_DONE
+        # Trạng thái kết thúc được gán sau cùng: job.finished thì finished_at
+        # và kết quả đã có (_prune/collect đọc từ thread khác)
+        job.finished_at = time.time()
+        job.status = status
+
+    def get(self, job_id: str) -> Optional[Job]:
+        """Lấy trạng thái tác vụ (None nếu không tồn tại hoặc đã hết hạn)"""
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _prune(self):
+        """Xóa kết quả đã hết hạn lưu giữ (gọi khi đang giữ lock)"""
+        cutoff = time.time() - self.retention
+        expired = [job_id for job_id, job in self._jobs.items()
+                   if job.finished and job.finished_at < cutoff]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+
+_runner: Optional[JobRunner] = None
+_runner_lock = threading.Lock()
+
+
+def get_job_runner() -> JobRunner:
+    """Lấy job runner dùng chung trong process (mọi session)"""
+    global _runner
+    with _runner_lock:
+        if _runner is None:
+            _runner = JobRunner()
+        return _runner
@@ -0,0 +1,114 @@
+# src/warmup.py
+"""Nạp trước các thư viện nặng trong luồng nền để lần đầu mở tab/bấm nút không phải chờ import"""
+
+import importlib
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from src.config import WARMUP_ENABLED
+
+# Các module app.py import trong hàm (theo thứ tự thường dùng: biểu đồ, xuất file, upload)
+LAZY_MODULES = (
+    'ui.interactive_charts',
+    'ui.chart_generator',
+    'export.excel_exporter',
+    'export.pdf_exporter',
+    'export.report_charts',
+    'export.docx_exporter',
+    'export.schedule_data',
+    'src.docx_parser_v2',
+    'ai.extraction',
+)
+
+
+def prime_matplotlib():
+    """Dựng font cache của matplotlib và vẽ thử một hình nhỏ (nạp font, backend Agg)"""
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    fig = Figure(figsize=(1, 1), dpi=10)
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot()
+    ax.plot([0, 1], [0, 1])
+    ax.set_title('Dư nợ')
+    fig.canvas.draw()
+
+
+def prime_pdf_resources():
+    """Đăng ký font DejaVu và dựng sẵn style của báo cáo PDF"""
+    from export.pdf_resources import get_pdf_resources
+    get_pdf_resources()
+
+
+class Warmup:
+    """
+    Luồng nền nạp trước các module và cache dùng chung
+
+    Các bước chạy tuần tự; bước lỗi chỉ được ghi lại, không ảnh hưởng app
+    (module sẽ được import lại bình thường khi dùng đến).
+    """
+
+    def __init__(self, modules: Sequence[str] = LAZY_MODULES):
+        """
+        Khởi tạo
+
+        Args:
+            modules: Các module cần import trước
+        """
+        self.steps: List[Tuple[str, Callable[[], object]]] = [
+            (module, lambda module=module: importlib.import_module(module)) for module in modules
+        ]
+        self.steps.append(('matplotlib_fonts', prime_matplotlib))
+        self.steps.append(('pdf_resources', prime_pdf_resources))
+        self.timings: Dict[str, float] = {}
+        self.errors: Dict[str, str] = {}
+        self._thread: Optional[threading.Thread] = None
+        self._done = threading.Event()
+
+    def start(self):
+        """Chạy trong luồng nền (daemon, không giữ process khi tắt)"""
+        self._thread = threading.Thread(target=self.run, name='cadap-warmup', daemon=True)
+        self._thread.start()
+
+    def run(self):
+        """Chạy lần lượt các bước, ghi thời gian (giây) và lỗi của từng bước"""
+        try:
+            for name, step in self.steps:
+                started = time.perf_counter()
+                try:
+                    step()
+                except Exception as e:
+                    self.errors[name] = str(e)
+                self.timings[name] = time.perf_counter() - started
+        finally:
+            self._done.set()
+
+    @property
+    def done(self) -> bool:
+        return self._done.is_set()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Chờ warmup xong, trả về True nếu đã xong"""
+        return self._done.wait(timeout)
+
+
+_warmup: Optional[Warmup] = None
+_warmup_lock = threading.Lock()
+
+
+def start_warmup() -> Optional[Warmup]:
+    """
+    Khởi động warmup một lần cho cả process (các lần gọi sau trả về warmup đã chạy)
+
+    Returns:
+        Warmup, hoặc None nếu đã tắt (CADAP_WARMUP=0)
+    """
+    global _warmup
+    if not WARMUP_ENABLED:
+        return None
+    with _warmup_lock:
+        if _warmup is None:
+            _warmup = Warmup()
+            _warmup.start()
+        return _warmup
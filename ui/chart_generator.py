@@ -1,25 +1,78 @@
 # ui/chart_generator.py
 """Module tạo biểu đồ"""
 
-import matplotlib.pyplot as plt
-import matplotlib
-matplotlib.use('Agg')  # Sử dụng backend không cần GUI
+# Chỉ dùng API hướng đối tượng (Figure + FigureCanvasAgg), không dùng pyplot:
+# pyplot giữ "figure hiện tại" và rcParams toàn cục, không an toàn khi nhiều
+# session vẽ song song trên các thread khác nhau của server
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+from matplotlib.ticker import FuncFormatter
 import io
 from typing import List, Dict
 from src.utils import format_number
+from src.artifact_cache import get_chart_cache, make_cache_key
+from ui.downsampling import downsample_schedule, target_points
 
-# Thiết lập font tiếng Việt
-plt.rcParams['font.sans-serif'] = ['DejaVu Sans']
-plt.rcParams['axes.unicode_minus'] = False
+# Tăng khi đổi cách vẽ biểu đồ để cache không trả ảnh cũ
+CHART_VERSION = '2'
+
+# Font mặc định của matplotlib (DejaVu Sans) đã có đủ dấu tiếng Việt, không
+# cần sửa rcParams; dấu âm trên trục số tiền do format_number tạo (ASCII)
+
+
+def _money_formatter() -> FuncFormatter:
+    """Định dạng trục số tiền 1.000.000 (mỗi trục một formatter riêng)"""
+    return FuncFormatter(lambda x, p: format_number(x))
 
 
 class ChartGenerator:
     """Class tạo các biểu đồ phân tích"""
     
-    def __init__(self):
-        """Khởi tạo chart generator"""
+    def __init__(self, image_format: str = 'png'):
+        """
+        Khởi tạo chart generator
+        
+        Args:
+            image_format: 'png' (ảnh raster) hoặc 'svg' (vector, dùng cho báo cáo PDF)
+        """
         self.fig_size = (10, 6)
         self.dpi = 100
+        self.image_format = image_format
+    
+    def _new_figure(self, figsize=None) -> Figure:
+        """Figure độc lập (không đăng ký với pyplot) gắn canvas Agg riêng"""
+        fig = Figure(figsize=figsize or self.fig_size, dpi=self.dpi)
+        FigureCanvasAgg(fig)
+        return fig
+    
+    def _downsample(self, schedule: List[Dict], *fields: str):
+        """Giảm số kỳ theo độ rộng ảnh (pixel), trả về (các kỳ, vị trí điểm đánh dấu theo năm)"""
+        return downsample_schedule(schedule, fields, target_points(int(self.fig_size[0] * self.dpi)))
+    
+    def _save(self, fig: Figure) -> io.BytesIO:
+        """Lưu biểu đồ vào BytesIO theo định dạng đã chọn"""
+        fig.tight_layout()
+        buf = io.BytesIO()
+        fig.savefig(buf, format=self.image_format, bbox_inches='tight')
+        buf.seek(0)
+        return buf
+    
+    def render(self, method: str, *args) -> io.BytesIO:
+        """
+        Vẽ biểu đồ có cache: cùng loại biểu đồ, dữ liệu và thiết lập hình
+        thì dùng lại ảnh đã vẽ (mọi session), không vẽ lại
+        
+        Args:
+            method: Tên phương thức vẽ (VD: 'plot_payment_schedule')
+            *args: Tham số của phương thức
+            
+        Returns:
+            BytesIO chứa hình ảnh
+        """
+        key = make_cache_key('chart', CHART_VERSION, method, args,
+                             self.fig_size, self.dpi, self.image_format)
+        data, _ = get_chart_cache().get_or_create(key, lambda: getattr(self, method)(*args).getvalue())
+        return io.BytesIO(data)
     
     def plot_payment_schedule(self, schedule: List[Dict]) -> io.BytesIO:
         """
@@ -31,14 +84,17 @@ class ChartGenerator:
         Returns:
             BytesIO chứa hình ảnh
         """
+        schedule, markers = self._downsample(schedule, 'principal', 'interest')
         months = [p['month'] for p in schedule]
         principals = [p['principal'] for p in schedule]
         interests = [p['interest'] for p in schedule]
         
-        fig, ax = plt.subplots(figsize=self.fig_size, dpi=self.dpi)
+        fig = self._new_figure()
+        ax = fig.add_subplot()
         
-        ax.plot(months, principals, label='Gốc', linewidth=2, marker='o', markersize=3)
-        ax.plot(months, interests, label='Lãi', linewidth=2, marker='s', markersize=3)
+        # Chỉ đánh dấu các kỳ tròn năm
+        ax.plot(months, principals, label='Gốc', linewidth=2, marker='o', markersize=3, markevery=markers)
+        ax.plot(months, interests, label='Lãi', linewidth=2, marker='s', markersize=3, markevery=markers)
         
         ax.set_xlabel('Tháng', fontsize=12)
         ax.set_ylabel('Số tiền (VND)', fontsize=12)
@@ -47,17 +103,9 @@ class ChartGenerator:
         ax.grid(True, alpha=0.3)
         
         # Format trục y
-        ax.yaxis.set_major_formatter(plt.FuncFormatter(lambda x, p: format_number(x)))
-        
-        plt.tight_layout()
-        
-        # Lưu vào BytesIO
-        buf = io.BytesIO()
-        plt.savefig(buf, format='png', bbox_inches='tight')
-        buf.seek(0)
-        plt.close(fig)
+        ax.yaxis.set_major_formatter(_money_formatter())
         
-        return buf
+        return self._save(fig)
     
     def plot_cash_flow(self, schedule: List[Dict], 
                        monthly_income: float,
@@ -73,11 +121,13 @@ class ChartGenerator:
         Returns:
             BytesIO chứa hình ảnh
         """
+        schedule, markers = self._downsample(schedule, 'total_payment')
         months = [p['month'] for p in schedule]
         payments = [p['total_payment'] for p in schedule]
         net_flows = [monthly_income - monthly_expense - p for p in payments]
         
-        fig, ax = plt.subplots(figsize=self.fig_size, dpi=self.dpi)
+        fig = self._new_figure()
+        ax = fig.add_subplot()
         
         # Vẽ thu nhập
         ax.axhline(y=monthly_income, color='green', linestyle='--', 
@@ -86,11 +136,11 @@ class ChartGenerator:
         # Vẽ chi phí + trả nợ
         total_outflow = [monthly_expense + p for p in payments]
         ax.plot(months, total_outflow, label='Chi phí + Trả nợ', 
-                linewidth=2, color='red', marker='o', markersize=3)
+                linewidth=2, color='red', marker='o', markersize=3, markevery=markers)
         
         # Vẽ dòng tiền ròng
         ax.plot(months, net_flows, label='Dòng tiền ròng', 
-                linewidth=2, color='blue', marker='s', markersize=3)
+                linewidth=2, color='blue', marker='s', markersize=3, markevery=markers)
         
         # Vẽ vùng dương/âm
         ax.fill_between(months, 0, net_flows, where=[nf >= 0 for nf in net_flows],
@@ -107,17 +157,9 @@ class ChartGenerator:
         ax.grid(True, alpha=0.3)
         
         # Format trục y
-        ax.yaxis.set_major_formatter(plt.FuncFormatter(lambda x, p: format_number(x)))
-        
-        plt.tight_layout()
-        
-        # Lưu vào BytesIO
-        buf = io.BytesIO()
-        plt.savefig(buf, format='png', bbox_inches='tight')
-        buf.seek(0)
-        plt.close(fig)
+        ax.yaxis.set_major_formatter(_money_formatter())
         
-        return buf
+        return self._save(fig)
     
     def plot_capital_allocation(self, total_need: float, 
                                 equity: float, 
@@ -133,7 +175,8 @@ class ChartGenerator:
         Returns:
             BytesIO chứa hình ảnh
         """
-        fig, ax = plt.subplots(figsize=(8, 8), dpi=self.dpi)
+        fig = self._new_figure(figsize=(8, 8))
+        ax = fig.add_subplot()
         
         sizes = [equity, loan_amount]
         labels = [
@@ -148,15 +191,7 @@ class ChartGenerator:
         
         ax.set_title('Cơ Cấu Nguồn Vốn', fontsize=14, fontweight='bold', pad=20)
         
-        plt.tight_layout()
-        
-        # Lưu vào BytesIO
-        buf = io.BytesIO()
-        plt.savefig(buf, format='png', bbox_inches='tight')
-        buf.seek(0)
-        plt.close(fig)
-        
-        return buf
+        return self._save(fig)
     
     def plot_debt_ratio(self, monthly_income: float,
                        monthly_payment: float,
@@ -174,7 +209,8 @@ class ChartGenerator:
         Returns:
             BytesIO chứa hình ảnh
         """
-        fig, ax = plt.subplots(figsize=self.fig_size, dpi=self.dpi)
+        fig = self._new_figure()
+        ax = fig.add_subplot()
         
         categories = ['Thu nhập', 'Chi phí', 'Trả nợ vay', 'Nợ khác', 'Còn lại']
         values = [
@@ -201,20 +237,12 @@ class ChartGenerator:
         ax.grid(True, alpha=0.3, axis='y')
         
         # Format trục y
-        ax.yaxis.set_major_formatter(plt.FuncFormatter(lambda x, p: format_number(x)))
+        ax.yaxis.set_major_formatter(_money_formatter())
         
         # Xoay nhãn trục x
-        plt.xticks(rotation=15, ha='right')
-        
-        plt.tight_layout()
-        
-        # Lưu vào BytesIO
-        buf = io.BytesIO()
-        plt.savefig(buf, format='png', bbox_inches='tight')
-        buf.seek(0)
-        plt.close(fig)
+        ax.set_xticks(range(len(categories)), labels=categories, rotation=15, ha='right')
         
-        return buf
+        return self._save(fig)
     
     def plot_remaining_balance(self, schedule: List[Dict]) -> io.BytesIO:
         """
@@ -226,18 +254,21 @@ class ChartGenerator:
         Returns:
             BytesIO chứa hình ảnh
         """
+        initial_balance = schedule[0]['remaining_balance'] + schedule[0]['principal'] if schedule else 0
+        schedule, markers = self._downsample(schedule, 'remaining_balance')
         months = [p['month'] for p in schedule]
         balances = [p['remaining_balance'] for p in schedule]
         
-        # Thêm điểm đầu (dư nợ ban đầu)
+        # Thêm điểm đầu (dư nợ ban đầu), cũng là một điểm đánh dấu
         if schedule:
             months = [0] + months
-            initial_balance = schedule[0]['remaining_balance'] + schedule[0]['principal']
             balances = [initial_balance] + balances
+            markers = [0] + [m + 1 for m in markers]
         
-        fig, ax = plt.subplots(figsize=self.fig_size, dpi=self.dpi)
+        fig = self._new_figure()
+        ax = fig.add_subplot()
         
-        ax.plot(months, balances, linewidth=2.5, color='#e74c3c', marker='o', markersize=4)
+        ax.plot(months, balances, linewidth=2.5, color='#e74c3c', marker='o', markersize=4, markevery=markers)
         ax.fill_between(months, 0, balances, alpha=0.3, color='#e74c3c')
         
         ax.set_xlabel('Tháng', fontsize=12)
@@ -246,14 +277,6 @@ class ChartGenerator:
         ax.grid(True, alpha=0.3)
         
         # Format trục y
-        ax.yaxis.set_major_formatter(plt.FuncFormatter(lambda x, p: format_number(x)))
+        ax.yaxis.set_major_formatter(_money_formatter())
         
-        plt.tight_layout()
-        
-        # Lưu vào BytesIO
-        buf = io.BytesIO()
-        plt.savefig(buf, format='png', bbox_inches='tight')
-        buf.seek(0)
-        plt.close(fig)
-        
-        return buf
+        return self._save(fig)
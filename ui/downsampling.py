@@ -0,0 +1,89 @@
+# ui/downsampling.py
+"""Giảm số điểm của chuỗi lịch trả nợ trước khi vẽ (LTTB), dùng chung cho mọi loại biểu đồ"""
+
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+
+from src.config import CHART_PIXELS_PER_POINT
+
+MONTHS_PER_YEAR = 12
+
+
+def lttb_indices(x: Sequence[float], y: Sequence[float], threshold: int) -> np.ndarray:
+    """
+    Chọn các điểm giữ hình dạng chuỗi bằng thuật toán Largest-Triangle-Three-Buckets
+
+    Điểm đầu và cuối luôn được giữ; mỗi bucket ở giữa giữ điểm tạo tam giác
+    lớn nhất với điểm đã chọn trước đó và trung bình bucket kế tiếp.
+
+    Args:
+        x: Hoành độ (tăng dần)
+        y: Tung độ
+        threshold: Số điểm tối đa sau khi giảm
+
+    Returns:
+        Chỉ số các điểm được giữ (tăng dần)
+    """
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    # Biên các bucket của n - 2 điểm giữa
+    edges = np.linspace(1, n - 1, threshold - 1).astype(int)
+
+    selected = np.empty(threshold, dtype=int)
+    selected[0] = 0
+    selected[-1] = n - 1
+    a = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        next_end = edges[i + 2] if i + 2 < len(edges) else n
+        # Trung bình bucket kế tiếp (bucket cuối: chính điểm cuối)
+        avg_x = x[end:next_end].mean()
+        avg_y = y[end:next_end].mean()
+
+        area = np.abs((x[a] - avg_x) * (y[start:end] - y[a])
+                      - (x[a] - x[start:end]) * (avg_y - y[a]))
+        a = start + int(area.argmax())
+        selected[i + 1] = a
+    return selected
+
+
+def target_points(width_px: int) -> int:
+    """Số điểm tối đa cho biểu đồ rộng width_px pixel"""
+    return max(3, width_px // CHART_PIXELS_PER_POINT)
+
+
+def downsample_schedule(schedule: List[Dict], fields: Sequence[str],
+                        max_points: int) -> Tuple[List[Dict], List[int]]:
+    """
+    Giảm số kỳ của lịch trả nợ để vẽ, giữ hình dạng của mọi chuỗi cần vẽ
+
+    Lấy hợp các điểm LTTB của từng chuỗi cùng các kỳ tròn năm (tháng 12,
+    24, ...), nên các chuỗi vẽ chung một trục tháng và luôn có điểm đánh
+    dấu theo năm.
+
+    Args:
+        schedule: Lịch trả nợ
+        fields: Các chuỗi sẽ vẽ (VD: ['principal', 'interest'])
+        max_points: Số điểm mục tiêu (theo độ rộng biểu đồ, xem target_points)
+
+    Returns:
+        (các kỳ được giữ, vị trí trong danh sách đó của các kỳ tròn năm)
+    """
+    months = np.fromiter((p['month'] for p in schedule), dtype=float, count=len(schedule))
+    keep = months % MONTHS_PER_YEAR == 0
+    if len(schedule) > max_points:
+        for field in fields:
+            values = np.fromiter((p[field] for p in schedule), dtype=float, count=len(schedule))
+            keep[lttb_indices(months, values, max_points)] = True
+    else:
+        keep[:] = True
+
+    indices = np.flatnonzero(keep)
+    rows = [schedule[i] for i in indices]
+    markers = np.flatnonzero(months[indices] % MONTHS_PER_YEAR == 0).tolist()
+    return rows, markers
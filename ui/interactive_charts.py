@@ -0,0 +1,224 @@
+# ui/interactive_charts.py
+"""Biểu đồ tương tác vẽ phía trình duyệt (Vega-Lite qua Altair)"""
+
+from typing import Dict, List
+
+import altair as alt
+
+from src.config import CHART_INTERACTIVE_WIDTH
+from ui.downsampling import MONTHS_PER_YEAR, downsample_schedule, target_points
+
+# Biểu thức Vega định dạng số kiểu Việt Nam (1.000.000), chạy phía trình duyệt
+VN_NUMBER_EXPR = "replace(format({value}, ',.0f'), /,/g, '.')"
+
+CHART_HEIGHT = 400
+
+# Chỉ đánh dấu điểm ở các kỳ tròn năm (và tháng 0)
+YEARLY_FILTER = f'datum.month % {MONTHS_PER_YEAR} == 0'
+
+
+def _money_axis(title: str) -> alt.Axis:
+    """Trục số tiền định dạng 1.000.000"""
+    return alt.Axis(title=title, labelExpr=VN_NUMBER_EXPR.format(value='datum.value'))
+
+
+def _formatted(field: str) -> Dict[str, str]:
+    """Trường hiển thị dạng chuỗi đã định dạng (tính ở trình duyệt, không gửi kèm dữ liệu)"""
+    return {f'{field}_vnd': VN_NUMBER_EXPR.format(value=f'datum.{field}')}
+
+
+class InteractiveChartGenerator:
+    """
+    Tạo biểu đồ Altair cho tab Biểu đồ
+
+    Server chỉ gửi chuỗi số liệu gọn (số nguyên VND theo tháng) và đặc tả
+    biểu đồ; việc tính các chuỗi phụ, định dạng số và vẽ đều do trình duyệt
+    làm. Cùng tên phương thức với ChartGenerator (ảnh matplotlib, vẫn dùng
+    cho báo cáo PDF).
+    """
+
+    @staticmethod
+    def _series(schedule: List[Dict], *fields: str) -> List[Dict]:
+        """Các cột cần vẽ của lịch trả nợ (đã giảm điểm theo độ rộng biểu đồ), làm tròn về đồng"""
+        schedule, _ = downsample_schedule(schedule, fields, target_points(CHART_INTERACTIVE_WIDTH))
+        return [{'month': p['month'], **{f: round(p[f]) for f in fields}} for p in schedule]
+
+    def plot_payment_schedule(self, schedule: List[Dict]) -> alt.Chart:
+        """
+        Biểu đồ lịch trả nợ (gốc, lãi theo tháng)
+
+        Args:
+            schedule: Lịch trả nợ
+
+        Returns:
+            alt.Chart
+        """
+        data = alt.Data(values=self._series(schedule, 'principal', 'interest'))
+        base = alt.Chart().transform_fold(
+            ['principal', 'interest'], as_=['key', 'amount']
+        ).transform_calculate(
+            series="datum.key == 'principal' ? 'Gốc' : 'Lãi'",
+            **_formatted('amount')
+        ).encode(
+            x=alt.X('month:Q', title='Tháng'),
+            y=alt.Y('amount:Q', axis=_money_axis('Số tiền (VND)')),
+            color=alt.Color('series:N', title=None, sort=['Gốc', 'Lãi']),
+            tooltip=[alt.Tooltip('month:Q', title='Tháng'),
+                     alt.Tooltip('series:N', title='Khoản'),
+                     alt.Tooltip('amount_vnd:N', title='Số tiền (VND)')]
+        )
+        lines = base.mark_line(strokeWidth=2)
+        points = base.mark_point(filled=True).transform_filter(YEARLY_FILTER)
+        return alt.layer(lines, points, data=data).properties(
+            title='Lịch Trả Nợ Hàng Tháng', height=CHART_HEIGHT
+        ).interactive()
+
+    def plot_cash_flow(self, schedule: List[Dict],
+                       monthly_income: float,
+                       monthly_expense: float) -> alt.Chart:
+        """
+        Biểu đồ dòng tiền (thu nhập, chi phí + trả nợ, dòng tiền ròng)
+
+        Args:
+            schedule: Lịch trả nợ
+            monthly_income: Thu nhập tháng
+            monthly_expense: Chi phí tháng
+
+        Returns:
+            alt.LayerChart
+        """
+        # Dữ liệu gắn ở lớp ngoài cùng để chỉ gửi một lần cho mọi lớp
+        data = alt.Data(values=self._series(schedule, 'total_payment'))
+        base = alt.Chart().transform_calculate(
+            outflow=f"{round(monthly_expense)} + datum.total_payment",
+            net_flow=f"{round(monthly_income - monthly_expense)} - datum.total_payment",
+        ).transform_calculate(
+            positive='max(datum.net_flow, 0)',
+            negative='min(datum.net_flow, 0)',
+            **_formatted('outflow'), **_formatted('net_flow')
+        )
+        x = alt.X('month:Q', title='Tháng')
+        tooltip = [alt.Tooltip('month:Q', title='Tháng'),
+                   alt.Tooltip('outflow_vnd:N', title='Chi phí + Trả nợ'),
+                   alt.Tooltip('net_flow_vnd:N', title='Dòng tiền ròng')]
+
+        # Vùng dương/âm của dòng tiền ròng
+        positive = base.mark_area(opacity=0.3, color='green').encode(
+            x=x, y=alt.Y('positive:Q', axis=_money_axis('Số tiền (VND)'))
+        )
+        negative = base.mark_area(opacity=0.3, color='red').encode(x=x, y='negative:Q')
+        outflow = base.mark_line(color='red').encode(x=x, y='outflow:Q', tooltip=tooltip)
+        net_flow = base.mark_line(color='blue').encode(x=x, y='net_flow:Q', tooltip=tooltip)
+        yearly = base.transform_filter(YEARLY_FILTER)
+        outflow_points = yearly.mark_point(color='red', filled=True).encode(x=x, y='outflow:Q', tooltip=tooltip)
+        net_flow_points = yearly.mark_point(color='blue', filled=True).encode(x=x, y='net_flow:Q', tooltip=tooltip)
+        income = alt.Chart(alt.Data(values=[{'income': round(monthly_income)}])).transform_calculate(
+            **_formatted('income')
+        ).mark_rule(color='green', strokeDash=[6, 4], strokeWidth=2).encode(
+            y='income:Q', tooltip=alt.Tooltip('income_vnd:N', title='Thu nhập')
+        )
+        zero = alt.Chart(alt.Data(values=[{'zero': 0}])).mark_rule(color='black', strokeWidth=0.5).encode(y='zero:Q')
+
+        return alt.layer(positive, negative, outflow, net_flow, outflow_points, net_flow_points,
+                         income, zero, data=data).properties(
+            title='Phân Tích Dòng Tiền', height=CHART_HEIGHT
+        ).interactive()
+
+    def plot_capital_allocation(self, total_need: float,
+                                equity: float,
+                                loan_amount: float) -> alt.Chart:
+        """
+        Biểu đồ cơ cấu nguồn vốn
+
+        Args:
+            total_need: Tổng nhu cầu vốn
+            equity: Vốn đối ứng
+            loan_amount: Số tiền vay
+
+        Returns:
+            alt.LayerChart
+        """
+        data = alt.Data(values=[
+            {'source': 'Vốn đối ứng', 'amount': round(equity), 'share': equity / total_need},
+            {'source': 'Vốn vay', 'amount': round(loan_amount), 'share': loan_amount / total_need},
+        ])
+        base = alt.Chart().transform_calculate(**_formatted('amount')).encode(
+            theta=alt.Theta('amount:Q', stack=True),
+            color=alt.Color('source:N', title=None,
+                            scale=alt.Scale(range=['#2ecc71', '#3498db'])),
+            tooltip=[alt.Tooltip('source:N', title='Nguồn vốn'),
+                     alt.Tooltip('amount_vnd:N', title='Số tiền (VND)'),
+                     alt.Tooltip('share:Q', title='Tỷ trọng', format='.1%')]
+        )
+        pie = base.mark_arc(outerRadius=150)
+        labels = base.mark_text(radius=175, fontSize=13).encode(text=alt.Text('share:Q', format='.1%'))
+        return alt.layer(pie, labels, data=data).properties(title='Cơ Cấu Nguồn Vốn', height=CHART_HEIGHT)
+
+    def plot_debt_ratio(self, monthly_income: float,
+                        monthly_payment: float,
+                        monthly_expense: float,
+                        other_debt: float) -> alt.Chart:
+        """
+        Biểu đồ so sánh thu nhập và nghĩa vụ tài chính
+
+        Args:
+            monthly_income: Thu nhập tháng
+            monthly_payment: Trả nợ tháng
+            monthly_expense: Chi phí tháng
+            other_debt: Nợ khác
+
+        Returns:
+            alt.LayerChart
+        """
+        categories = ['Thu nhập', 'Chi phí', 'Trả nợ vay', 'Nợ khác', 'Còn lại']
+        values = [
+            monthly_income,
+            monthly_expense,
+            monthly_payment,
+            other_debt,
+            max(0, monthly_income - monthly_expense - monthly_payment - other_debt)
+        ]
+        data = alt.Data(values=[{'category': c, 'amount': round(v)} for c, v in zip(categories, values)])
+        base = alt.Chart().transform_calculate(**_formatted('amount')).encode(
+            x=alt.X('category:N', title=None, sort=categories, axis=alt.Axis(labelAngle=-15)),
+            y=alt.Y('amount:Q', axis=_money_axis('Số tiền (VND)')),
+            tooltip=[alt.Tooltip('category:N', title='Khoản'),
+                     alt.Tooltip('amount_vnd:N', title='Số tiền (VND)')]
+        )
+        bars = base.mark_bar(stroke='black', strokeWidth=1.5).encode(
+            color=alt.Color('category:N', legend=None, sort=categories,
+                            scale=alt.Scale(range=['#2ecc71', '#e74c3c', '#3498db', '#f39c12', '#95a5a6']))
+        )
+        labels = base.mark_text(dy=-8).encode(text='amount_vnd:N')
+        return alt.layer(bars, labels, data=data).properties(
+            title='So Sánh Thu Nhập và Nghĩa Vụ Tài Chính', height=CHART_HEIGHT
+        )
+
+    def plot_remaining_balance(self, schedule: List[Dict]) -> alt.Chart:
+        """
+        Biểu đồ dư nợ giảm dần (kèm dư nợ ban đầu ở tháng 0)
+
+        Args:
+            schedule: Lịch trả nợ
+
+        Returns:
+            alt.Chart
+        """
+        values = self._series(schedule, 'remaining_balance')
+        if schedule:
+            initial_balance = schedule[0]['remaining_balance'] + schedule[0]['principal']
+            values.insert(0, {'month': 0, 'remaining_balance': round(initial_balance)})
+
+        base = alt.Chart().transform_calculate(
+            **_formatted('remaining_balance')
+        ).encode(
+            x=alt.X('month:Q', title='Tháng'),
+            y=alt.Y('remaining_balance:Q', axis=_money_axis('Dư nợ (VND)')),
+            tooltip=[alt.Tooltip('month:Q', title='Tháng'),
+                     alt.Tooltip('remaining_balance_vnd:N', title='Dư nợ (VND)')]
+        )
+        area = base.mark_area(opacity=0.3, color='#e74c3c', line={'color': '#e74c3c', 'strokeWidth': 2.5})
+        points = base.mark_point(color='#e74c3c', filled=True).transform_filter(YEARLY_FILTER)
+        return alt.layer(area, points, data=alt.Data(values=values)).properties(
+            title='Dư Nợ Giảm Dần Theo Thời Gian', height=CHART_HEIGHT
+        ).interactive()